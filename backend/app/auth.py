@@ -1,37 +1,29 @@
 # auth.py: Authentication utilities for FastAPI
 import os
 import logging
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
 from typing import Optional
 
 
-# Password hashing context
-# Use pbkdf2_sha256 for broader compatibility in minimal test environments where
-# certain bcrypt backends may not behave well (long password detection edge cases).
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Passwords are hashed by app.passwords.PasswordHasher.
+# jose is imported on first use, not when the app starts.
 
 SECRET_KEY = "CHANGE_ME_TO_A_RANDOM_SECRET"  # Should be set from env in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = int(os.getenv("ACCESS_TOKEN_EXPIRE_HOURS", 24))
+# Comma separated ids of the users allowed to use the /admin endpoints
+ADMIN_USER_IDS = frozenset(filter(None, os.getenv("ADMIN_USER_IDS", "").split(",")))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 logger = logging.getLogger(__name__)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS))
     to_encode.update({"exp": expire})
@@ -46,6 +38,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 def decode_access_token(token: str):
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         logger.debug("Decoded access token for subject=%s", payload.get("sub"))
@@ -63,3 +57,9 @@ def get_user_id(token: str = Depends(oauth2_scheme)):
             detail="Invalid authentication credentials",
         )
     return payload["sub"]
+
+
+def require_admin(user_id: str = Depends(get_user_id)) -> str:
+    if user_id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return user_id
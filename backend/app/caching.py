@@ -0,0 +1,51 @@
+"""Conditional GET support based on the per-user data version.
+
+Every write to a user's rules or transactions bumps a counter in the DB layer.
+Read endpoints tag their responses with a weak ``ETag`` derived from it, and a
+request whose ``If-None-Match`` still matches is answered with ``304`` before
+any transaction query runs.
+
+The tag also covers the path and the query string, so representations of the
+same data (``?fields=list`` and ``?fields=detail``, two search queries, ...)
+never share a tag.
+"""
+
+import hashlib
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from app.db import DB
+
+CACHE_CONTROL = "private, no-cache"  # always revalidate, never share between users
+
+
+def representation_key(request: Request) -> str:
+    """Short hash of the path and the query parameters in a canonical order."""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return hashlib.blake2b(
+        f"{request.url.path}?{query}".encode(), digest_size=8
+    ).hexdigest()
+
+
+def data_etag(request: Request, db: DB, user_id: str) -> str:
+    # user id is part of the tag so a browser cache shared by two accounts never matches across them
+    return f'W/"{user_id}:{db.get_data_version(user_id)}:{representation_key(request)}"'
+
+
+def not_modified(
+    request: Request, response: Response, db: DB, user_id: str
+) -> Response | None:
+    """Set caching headers on ``response``; return a 304 response when the client copy is current."""
+    etag = data_etag(request, db, user_id)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in candidates or etag in candidates:
+            return Response(
+                status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            )
+    return None
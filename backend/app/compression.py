@@ -0,0 +1,78 @@
+"""Negotiated response compression (brotli when available, gzip otherwise).
+
+Responses smaller than ``COMPRESSION_MINIMUM_SIZE`` bytes are sent as-is; the
+compression overhead is not worth it for the many tiny JSON payloads. Brotli is
+an optional dependency: without the ``brotli`` package only gzip is offered.
+"""
+
+import os
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Quality 4 keeps brotli's CPU cost at or below gzip level 6 (see benchmarks/bench_responses.py)
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Parse ``Accept-Encoding``, dropping codings explicitly refused with ``q=0``."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = params.strip().removeprefix("q=")
+        if params and quality.replace(".", "", 1).isdigit() and float(quality) == 0:
+            continue
+        accepted.add(coding)
+    return accepted
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self.compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self.compressor is None:
+            self.compressor = brotli.Compressor(
+                mode=brotli.MODE_TEXT, quality=self.quality
+            )
+        data = self.compressor.process(body)
+        if more_body:
+            return data + self.compressor.flush()
+        return data + self.compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip = GZipMiddleware(
+            app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and brotli is not None
+            and "br"
+            in accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        ):
+            await BrotliResponder(self.app, self.minimum_size, BROTLI_QUALITY)(
+                scope, receive, send
+            )
+            return
+        await self.gzip(scope, receive, send)
@@ -1,27 +1,31 @@
-import os
-import logging
-from bson import ObjectId
-from pymongo import MongoClient
+"""Storage interface shared by all database backends.
 
-from app.models import RuleDB, Transaction, User
+``DB.get_instance()`` picks the backend from ``MONGO_URI``:
 
-logger = logging.getLogger(__name__)
+* ``mongodb://...`` / ``mongodb+srv://...`` – MongoDB (``app.storage.mongo``)
+* ``mongomock://...`` – in-memory mongomock, used by the test suite
+* ``sqlite:///path/to/file.db`` or ``sqlite://:memory:`` – embedded SQLite
+  (``app.storage.sqlite``) for single-user deployments without a Mongo server
 
+The backend is created on the first call, never at import time: the app does
+it at startup (see the lifespan in ``app.main``) and endpoints receive it
+through the ``get_db`` dependency; scripts and jobs call ``get_instance()``
+when they need it.
+"""
+
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
 
-def get_mongo_client():
-    # Central Mongo client/DB setup. For tests we optionally allow an in-memory
-    # mongomock fallback (triggered by MONGO_URI starting with "mongomock://").
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+from bson import ObjectId
 
-    if mongo_uri.startswith("mongomock://"):
-        # Lazy import so production deployments do not require mongomock.
-        import mongomock  # type: ignore
+from app.models import ImportMark, Job, RuleDB, Transaction, User
 
-        logger.info("Using mongomock MongoDB client for testing")
-        return mongomock.MongoClient()
-    else:
-        logger.info("Connected to MongoDB at %s", mongo_uri)
-        return MongoClient(mongo_uri)
+logger = logging.getLogger(__name__)
 
 
 def to_oid(id_str: str) -> ObjectId:
@@ -30,128 +34,170 @@ def to_oid(id_str: str) -> ObjectId:
     return ObjectId(id_str)
 
 
-class DB:
+@dataclass
+class TransactionFilter:
+    """Optional constraints for bulk transaction reads; unset fields do not filter."""
+
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+    category: str | None = None
+    tags: list[str] = field(default_factory=list)  # all must be present
+    amount_min: float | None = None
+    amount_max: float | None = None
+
+
+def create_db(uri: str, db_name: str) -> "DB":
+    if uri.startswith("sqlite://"):
+        from app.storage.sqlite import SqliteDB
+
+        return SqliteDB(uri.removeprefix("sqlite://").removeprefix("/") or ":memory:")
+
+    from app.storage.mongo import MongoDB
+
+    return MongoDB(uri, db_name)
+
+
+class DB(ABC):
+    _instance: "DB | None" = None
+    _instance_lock = threading.Lock()
+
     @classmethod
     def get_instance(cls) -> "DB":
-        if not hasattr(cls, "_instance"):
-            cls._instance = DB()
-        return cls._instance
-
-    def __init__(self):
-        mongo_client = get_mongo_client()
-        self._db = mongo_client[os.getenv("MONGO_DB", "spending-frustration")]
-        # Private collections
-        self._users_collection = self._db["users"]
-        self._transactions_collection = self._db["transactions"]
-        self._rules_collection = self._db["rules"]
-        logger.info("Database initialized: %s", self._db.name)
+        if DB._instance is None:
+            # First use may come from several request threads at once
+            with DB._instance_lock:
+                if DB._instance is None:
+                    DB._instance = create_db(
+                        os.getenv("MONGO_URI", "mongodb://localhost:27017/"),
+                        os.getenv("MONGO_DB", "spending-frustration"),
+                    )
+        return DB._instance
+
+    # Per-user data version, bumped by every write to the user's rules or transactions
+
+    @abstractmethod
+    def get_data_version(self, user_id: str) -> int: ...
+
+    # Users
 
+    @abstractmethod
     def get_user(self, username: str) -> User:
-        user_doc = self._users_collection.find_one({"username": username})
-        if not user_doc:
-            raise ValueError(f"User '{username}' not found")
-        return User.model_validate(user_doc)
-
-    def create_user(self, user: User) -> str:
-        res = self._users_collection.insert_one(user.model_dump(exclude_none=True))
-        return str(res.inserted_id)
-
-    def get_rules(self, user_id: str) -> list[RuleDB]:
-        # Return all rule documents for a user
-        docs = self._rules_collection.find({"user_id": to_oid(user_id)})
-        rules = [RuleDB.model_validate(doc) for doc in docs]
-        return rules
-
-    def add_rule(self, user_id: str, rule, priority: int = 0):
-        if hasattr(rule, "model_dump"):
-            doc = rule.model_dump(exclude_none=True)
-        elif isinstance(rule, dict):
-            doc = dict(rule)
-        else:
-            raise ValueError("rule must be RuleDB or dict")
-
-        # ensure user_id stored as ObjectId
-        doc["user_id"] = to_oid(user_id)
-        res = self._rules_collection.insert_one(doc)
-        return str(res.inserted_id)
-
-    def get_rule(self, rule_id: str) -> RuleDB | None:
-        doc = self._rules_collection.find_one({"_id": to_oid(rule_id)})
-        if not doc:
-            return None
-        return RuleDB.model_validate(doc)
-
-    def update_rule(self, rule_id: str, update_data: dict) -> bool:
-        # Convert user-provided id fields if present
-        if "user_id" in update_data:
-            update_data["user_id"] = to_oid(update_data["user_id"])
-        res = self._rules_collection.update_one({"_id": to_oid(rule_id)}, {"$set": update_data})
-        return res.modified_count > 0
-
-    def delete_rule(self, rule_id: str) -> bool:
-        res = self._rules_collection.delete_one({"_id": to_oid(rule_id)})
-        return res.deleted_count > 0
-
-    def get_transaction(self, tx_id: str) -> Transaction | None:
-        doc = self._transactions_collection.find_one({"_id": to_oid(tx_id)})
-        if not doc:
-            return None
-        return Transaction.model_validate(doc)
+        """Return the user or raise ValueError when it does not exist."""
+
+    @abstractmethod
+    def create_user(self, user: User) -> str: ...
+
+    @abstractmethod
+    def update_user(self, user_id: str, update_data: dict) -> bool: ...
+
+    # Rules
+
+    @abstractmethod
+    def get_rules(self, user_id: str) -> list[RuleDB]: ...
+
+    @abstractmethod
+    def add_rule(self, user_id: str, rule, priority: int = 0) -> str:
+        """Store a rule given as ``RuleDB`` or dict and return its id."""
+
+    @abstractmethod
+    def get_rule(self, rule_id: str) -> RuleDB | None: ...
 
+    @abstractmethod
+    def update_rule(self, rule_id: str, update_data: dict) -> bool: ...
+
+    @abstractmethod
+    def delete_rule(self, rule_id: str) -> bool: ...
+
+    # Transactions
+
+    @abstractmethod
+    def get_transaction(self, tx_id: str) -> Transaction | None: ...
+
+    @abstractmethod
     def get_categories(self, user: str) -> list[str]:
         """Return distinct non-empty categories for a user."""
-        docs = self._transactions_collection.distinct("category", {"user_id": to_oid(user)})
-        # Filter out empty/null and ensure strings
-        cats: list[str] = []
-        for c in docs:
-            if c is None:
-                continue
-            s = str(c).strip()
-            if s:
-                cats.append(s)
-        return sorted(set(cats))
 
+    @abstractmethod
     def get_tags(self, user: str) -> list[str]:
         """Return distinct tags (flattened) for a user."""
-        # Use aggregation to unwind tags array and get distinct values in case of nested arrays
-        pipeline = [
-            {"$match": {"user_id": to_oid(user)}},
-            {"$unwind": {"path": "$tags", "preserveNullAndEmptyArrays": False}},
-            {"$group": {"_id": None, "tags": {"$addToSet": "$tags"}}},
-        ]
-        res = list(self._transactions_collection.aggregate(pipeline))
-        if not res:
-            return []
-        tags = res[0].get("tags", []) or []
-        # normalize to strings, strip and filter empties
-        normalized = [str(t).strip() for t in tags if t is not None and str(t).strip()]
-        return sorted(set(normalized))
 
+    @abstractmethod
     def insert_transactions(self, transactions: list[Transaction]) -> list[str]:
-        docs = []
-        for tx in transactions:
-            doc = tx.model_dump(exclude_none=True)
-            doc["user_id"] = to_oid(tx.user_id)
-            docs.append(doc)
-
-        if not docs:
-            return []
-        logger.info("Inserting %d transactions", len(docs))
-        res = self._transactions_collection.insert_many(docs)
-        inserted = [str(_id) for _id in res.inserted_ids]
-        logger.info("Inserted %d transactions", len(inserted))
-        return inserted
-
-    def update_transaction(self, tx_id: str, transaction: Transaction) -> bool:
-        logger.debug(f"Updating transaction {tx_id} with data: {transaction}")
-        tx_doc = transaction.model_dump(exclude_none=True)
-        tx_doc["user_id"] = to_oid(transaction.user_id)
-
-        res = self._transactions_collection.update_one({"_id": to_oid(tx_id)}, {"$set": tx_doc})
-        if res.modified_count:
-            logger.info("Updated transaction %s", tx_id)
-        return res.modified_count > 0
-
-    def get_transactions(self, user: str) -> list[Transaction]:
-        docs = self._transactions_collection.find({"user_id": to_oid(user)})
-        return [Transaction.model_validate(doc) for doc in docs]
+        """Insert transactions, skipping duplicate fingerprints; return ids of inserted rows."""
+
+    @abstractmethod
+    def update_transaction(self, tx_id: str, transaction: Transaction) -> bool: ...
+
+    @abstractmethod
+    def get_transactions(self, user: str) -> list[Transaction]: ...
+
+    @abstractmethod
+    def find_transactions(
+        self, user: str, fields: list[str] | None = None, skip: int = 0, limit: int | None = None
+    ) -> list[dict]:
+        """Return raw documents limited to top-level ``fields`` (all when None), ids as strings.
+
+        Documents come in insertion order; ``skip`` and ``limit`` (all when None) select a page of them.
+        """
+
+    @abstractmethod
+    def find_transaction(self, tx_id: str, fields: list[str] | None = None) -> dict | None: ...
+
+    @abstractmethod
+    def iter_transactions(
+        self, user: str, filters: TransactionFilter | None = None, batch_size: int = 1000
+    ) -> Iterator[list[dict]]:
+        """Yield full documents oldest first, ``batch_size`` at a time, without loading the whole history."""
+
+    @abstractmethod
+    def search_transactions(
+        self, user: str, tokens: list[str], fields: list[str] | None = None, skip: int = 0, limit: int = 50
+    ) -> list[dict]:
+        """Transactions whose search tokens prefix-match every query token, best matches first."""
+
+    @abstractmethod
+    def reindex_search(self) -> int:
+        """Rebuild search tokens of all transactions (e.g. after changing tokenization); return the count."""
+
+    # Import marks
+
+    @abstractmethod
+    def get_import_mark(self, user_id: str, iban: str) -> ImportMark | None: ...
+
+    @abstractmethod
+    def set_import_mark(self, mark: ImportMark) -> None:
+        """Create or replace the mark of ``(mark.user_id, mark.iban)``."""
+
+    # Jobs
+
+    @abstractmethod
+    def create_job(self, job: Job) -> str: ...
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Job | None: ...
+
+    @abstractmethod
+    def update_job(self, job_id: str, update_data: dict) -> bool: ...
+
+    @abstractmethod
+    def start_job(self, job_id: str) -> bool:
+        """Atomically move a pending job to running; False if it was cancelled meanwhile."""
+
+    @abstractmethod
+    def report_job_progress(self, job_id: str, processed: int, total: int | None = None) -> bool:
+        """Store progress and return True when cancellation has been requested."""
+
+    @abstractmethod
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a pending job right away, or flag a running one to stop at its next progress report."""
+
+    # Maintenance
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete all users and their data; lets the test suite run against any backend."""
+
+
+def get_db() -> DB:
+    """FastAPI dependency: the shared storage backend, created on first use."""
+    return DB.get_instance()
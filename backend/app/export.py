@@ -0,0 +1,144 @@
+"""Streaming CSV / Parquet export of transactions.
+
+Transactions are flattened into one row each: nested ``asset``, ``counterparty``
+and ``details`` fields become ``<parent>_<field>`` columns, lists are joined.
+Both writers consume ``DB.iter_transactions`` batches and emit bytes as soon as a
+batch is encoded, so memory stays bounded by the batch size rather than the
+length of the history. Parquet needs the optional ``pyarrow`` package; each
+batch becomes one row group. pyarrow takes ~100 ms to import, so it is only
+imported by the first Parquet export.
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from importlib.util import find_spec
+
+PARQUET_AVAILABLE = find_spec("pyarrow") is not None
+EXPORT_BATCH_SIZE = 5000
+
+# (column, path into the stored document)
+COLUMNS: list[tuple[str, tuple[str, ...]]] = [
+    ("id", ("_id",)),
+    ("date", ("date",)),
+    ("amount", ("amount",)),
+    ("currency", ("details", "currency")),
+    ("transaction_type", ("transaction_type",)),
+    ("category", ("category",)),
+    ("tags", ("tags",)),
+    ("note", ("note",)),
+    ("description", ("description",)),
+    ("goods_services", ("goods_services",)),
+    ("asset_account_name", ("asset", "bank", "account_name")),
+    ("asset_iban", ("asset", "bank", "iban")),
+    ("asset_bic", ("asset", "bank", "bic")),
+    ("asset_wallet_name", ("asset", "wallet", "wallet_name")),
+    ("counterparty_merchant", ("counterparty", "merchant", "name")),
+    ("counterparty_account_name", ("counterparty", "bank", "account_name")),
+    ("counterparty_iban", ("counterparty", "bank", "iban")),
+    ("counterparty_bic", ("counterparty", "bank", "bic")),
+    ("counterparty_wallet_name", ("counterparty", "wallet", "wallet_name")),
+    ("details_balance", ("details", "balance")),
+    ("details_operation_type", ("details", "operation_type")),
+    ("details_location", ("details", "location")),
+    ("details_message_for_recipient", ("details", "message_for_recipient")),
+    ("details_transaction_note", ("details", "transaction_note")),
+    ("details_symbols", ("details", "symbols")),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+FLOAT_COLUMNS = {"amount", "details_balance"}
+
+
+def flatten_transaction(doc: dict) -> dict:
+    """One flat row per stored transaction document; missing values are None."""
+    row = {}
+    for name, path in COLUMNS:
+        value = doc
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, list):
+            value = ",".join(str(item) for item in value)
+        elif isinstance(value, dict):
+            value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+        row[name] = value
+    return row
+
+
+def csv_chunks(batches: Iterable[list[dict]]) -> Iterator[bytes]:
+    """Header first, then one encoded chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMN_NAMES)
+    writer.writeheader()
+    for batch in batches:
+        for doc in batch:
+            row = flatten_transaction(doc)
+            if isinstance(row["date"], datetime):
+                row["date"] = row["date"].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written so far, keeping ``tell()`` absolute."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    columns = []
+    for name in COLUMN_NAMES:
+        if name == "date":
+            columns.append(pa.field(name, pa.timestamp("us")))
+        elif name in FLOAT_COLUMNS:
+            columns.append(pa.field(name, pa.float64()))
+        else:
+            columns.append(pa.field(name, pa.string()))
+    return pa.schema(columns)
+
+
+def parquet_chunks(batches: Iterable[list[dict]]) -> Iterator[bytes]:
+    """One row group per batch, streamed out as soon as it is written."""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_table(
+                pa.Table.from_pylist(
+                    [flatten_transaction(doc) for doc in batch], schema=schema
+                )
+            )
+            yield sink.drain()
+    # Closing the writer appends the footer
+    yield sink.drain()
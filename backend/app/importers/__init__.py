@@ -0,0 +1,67 @@
+"""Registry of statement formats.
+
+Every format is an ``ImporterPlugin``: a ``sniff`` function that decides from
+the first ``SNIFF_SIZE`` characters of a file whether it can handle it, and a
+streaming ``parse_lines(lines, user_id, on_error=None)`` function yielding
+transactions. Detection only ever looks at that fixed-size head, so it costs
+the same however long the statement is, and registering another format adds
+one more cheap check per upload. With an ``on_error`` callback a row that
+cannot be parsed is reported by line number and skipped instead of failing
+the whole file.
+
+A plugin registered with ``uses_marks=True`` also receives ``marks=``, an
+``app.importers.marks.ImportMarks`` to skip rows that earlier imports of the
+account stored already and to record what this statement covers. Plugins
+without it get every row deduplicated by fingerprint only.
+"""
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+from app.models import Transaction
+
+# Called with the 1-based line number of a row that could not be parsed
+ErrorCallback = Callable[[int, Exception], None]
+
+# Enough of a file to see the bank marker and the transaction table header
+SNIFF_SIZE = 8192
+
+
+@dataclass(frozen=True)
+class ImporterPlugin:
+    name: str
+    sniff: Callable[[str], bool]
+    parse_lines: Callable[..., Iterator[Transaction]]
+    uses_marks: bool = False  # parse_lines also accepts marks=
+
+
+_plugins: dict[str, ImporterPlugin] = {}
+
+
+def register(plugin: ImporterPlugin) -> None:
+    if plugin.name in _plugins:
+        raise ValueError(f"Importer '{plugin.name}' is already registered")
+    _plugins[plugin.name] = plugin
+
+
+def get_plugins() -> list[ImporterPlugin]:
+    return list(_plugins.values())
+
+
+def detect(head: str) -> ImporterPlugin | None:
+    """Return the first registered format whose sniff accepts the head of a file."""
+    head = head[:SNIFF_SIZE]
+    for plugin in _plugins.values():
+        if plugin.sniff(head):
+            return plugin
+    return None
+
+
+# Built-in formats; imported last because they import this package
+from app.importers import mbank
+
+register(
+    ImporterPlugin(
+        name="mbank", sniff=mbank.sniff, parse_lines=mbank.parse_lines, uses_marks=True
+    )
+)
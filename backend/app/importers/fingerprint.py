@@ -0,0 +1,35 @@
+"""Deterministic transaction fingerprints.
+
+A fingerprint identifies a statement row independently of the export it came
+from, so re-importing the same file (or an overlapping monthly export) does not
+create duplicate transactions. It is built from values the bank never changes
+once a row is posted: account IBAN, posting date, amount, running balance and
+the normalized description.
+"""
+
+import hashlib
+from datetime import datetime
+
+
+def normalize_description(description: str | None) -> str:
+    """Collapse whitespace and case so cosmetic export differences do not matter."""
+    if not description:
+        return ""
+    return " ".join(description.split()).casefold()
+
+
+def make_fingerprint(
+    iban: str | None,
+    posting_date: datetime,
+    amount: float,
+    balance: float | None,
+    description: str | None,
+) -> str:
+    parts = [
+        iban or "",
+        posting_date.strftime("%Y-%m-%d"),
+        f"{amount:.2f}",
+        "" if balance is None else f"{balance:.2f}",
+        normalize_description(description),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
@@ -1,37 +1,254 @@
+"""Statement import pipeline.
+
+Rows flow through three overlapping stages connected by bounded queues::
+
+    read + parse (thread) -> categorize (thread) -> insert (caller)
+
+Each stage hands over batches of ``IMPORT_BATCH_SIZE`` transactions and at most
+``IMPORT_QUEUE_DEPTH`` batches wait between two stages, so peak memory depends
+on the batch size, not on the size of the statement. Rules are loaded once per
+import and reused for every batch; every batch is one unordered
+``insert_many`` in which already imported rows (same fingerprint) are skipped.
+
+The statement format is picked by the ``app.importers`` registry from the head
+of the file only. Rows inside the account's import mark are skipped by the
+parser before they become transactions, see ``app.importers.marks``.
+"""
+
+import io
+import itertools
+import logging
+import os
+import queue
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
-from app.importers import mbank
+from typing import TextIO, TypeVar
+
+from app.db import DB
+from app.importers import SNIFF_SIZE, ErrorCallback, ImporterPlugin, detect
+from app.importers.marks import ImportMarks
+from app.metrics import Counter
 from app.models import Transaction
 from app.rules.rule_engine import RuleEngine
-from app.db import DB
+from app.timing import TimingReport
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_QUEUE_DEPTH = int(os.getenv("IMPORT_QUEUE_DEPTH", "2"))
 
-db = DB.get_instance()
+IMPORT_ROWS = Counter(
+    "import_rows_total",
+    "Statement rows by outcome: inserted, skipped (already stored) or rejected",
+    ("format", "outcome"),
+)
+IMPORT_ROWS_PARSED = Counter(
+    "import_rows_parsed_total", "Statement rows parsed into transactions", ("format",)
+)
+
+ProgressCallback = Callable[[int, int | None], None]
+T = TypeVar("T")
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    skipped: int = 0  # rows already stored for the user
+    warnings: list[str] = field(default_factory=list)
+    timings: dict = field(default_factory=dict)  # see app.timing.TimingReport
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_END = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    # Timed puts so a stage blocked on a full queue notices when the consumer gave up
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _in_background(items: Iterable[T], stop: threading.Event, name: str) -> Iterator[T]:
+    """Iterate ``items`` on a worker thread; results arrive through a bounded queue."""
+    q: queue.Queue = queue.Queue(maxsize=IMPORT_QUEUE_DEPTH)
+
+    def work():
+        try:
+            for item in items:
+                if not _put(q, item, stop):
+                    return
+        except BaseException as exc:  # noqa: BLE001 - re-raised by the consuming thread
+            _put(q, _Failure(exc), stop)
+            return
+        _put(q, _END, stop)
+
+    threading.Thread(target=work, name=name, daemon=True).start()
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _END:
+            return
+        if isinstance(item, _Failure):
+            raise item.exc
+        yield item
+
+
+def _batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
 
 
 class Importer:
-    def __init__(self, user_id: str):
+    def __init__(
+        self, user_id: str, rule_engine: RuleEngine | None = None, db: DB | None = None
+    ):
         self._user_id = user_id
+        # Callers importing many files for one user can share an already loaded engine
+        self._rule_engine = rule_engine
+        self._db = db or DB.get_instance()
 
-    def import_from_file(self, file_path: Path) -> int:
+    def import_from_file(
+        self, file_path: Path, progress: ProgressCallback | None = None
+    ) -> ImportResult:
         try:
-            with open(file_path, "r") as file:
-                data = file.read()
-                return self.import_from_data(data)
+            with open(file_path, "r", encoding="utf-8") as file:
+                return self.import_from_stream(file, progress)
         except FileNotFoundError:
-            print(f"Error: The file at {file_path} was not found.")
-            return 0
+            logger.warning("Statement file %s was not found", file_path)
+            return ImportResult()
 
-    def import_from_data(self, data: str) -> int:
-        transactions = self.parse_data(data)
-        if transactions:
-            rule_engine = RuleEngine(user_id=self._user_id)
-            rule_engine.apply_rules(transactions)
-            inserted = db.insert_transactions(transactions)
-            return len(inserted)
+    def import_from_stream(
+        self, stream: TextIO, progress: ProgressCallback | None = None
+    ) -> ImportResult:
+        plugin, lines = self.detect_stream(stream)
+        if plugin is None:
+            logger.warning("No valid transactions found")
+            return ImportResult()
+        return self.import_lines(plugin, lines, progress)
+
+    def import_from_data(
+        self, data: str, progress: ProgressCallback | None = None
+    ) -> ImportResult:
+        plugin = detect(data)
+        if plugin is None:
+            logger.warning("No valid transactions found")
+            return ImportResult()
+        return self.import_lines(plugin, data.splitlines(), progress)
+
+    @staticmethod
+    def detect_stream(stream: TextIO) -> tuple[ImporterPlugin | None, Iterator[str]]:
+        """Sniff the format of a stream; returns the plugin and all of the stream's lines."""
+        # The first few KB, completed to a whole line, are read once and replayed, so no seeking back
+        head = stream.read(SNIFF_SIZE)
+        head += stream.readline()
+        return detect(head), itertools.chain(io.StringIO(head), stream)
+
+    def import_lines(
+        self,
+        plugin: ImporterPlugin,
+        lines: Iterable[str],
+        progress: ProgressCallback | None = None,
+        on_error: ErrorCallback | None = None,
+    ) -> ImportResult:
+        """Run statement lines through the parse -> categorize -> insert pipeline.
+
+        Without ``on_error`` the first row that cannot be parsed aborts the import.
+        """
+        report = TimingReport("import")
+        with report.stage("load_rules") as timing:
+            rule_engine = self._rule_engine or RuleEngine(
+                user_id=self._user_id, db=self._db
+            )
+            timing.count = rule_engine.rule_count
+        stats = rule_engine.new_stats()
+
+        def categorize(
+            batches: Iterable[list[Transaction]],
+        ) -> Iterator[list[Transaction]]:
+            for batch in batches:
+                with report.stage("evaluate", len(batch)):
+                    rule_engine.apply_rules(batch, stats)
+                yield batch
+
+        result = ImportResult()
+        processed = 0
+        row_errors = 0
+        marks = ImportMarks(
+            self._user_id, lambda iban: self._db.get_import_mark(self._user_id, iban)
+        )
+
+        def report_error(line_no: int, exc: Exception) -> None:
+            nonlocal row_errors
+            row_errors += 1
+            on_error(line_no, exc)
+
+        stop = threading.Event()
+        try:
+            extra = {"marks": marks} if plugin.uses_marks else {}
+            transactions = plugin.parse_lines(
+                lines,
+                self._user_id,
+                on_error=report_error if on_error else None,
+                **extra,
+            )
+            # Charged to "parse": reading, parsing and validating rows until a batch is full
+            batches = report.timed("parse", _batched(transactions, IMPORT_BATCH_SIZE))
+            parsed = _in_background(batches, stop, "import-parse")
+            for batch in _in_background(categorize(parsed), stop, "import-categorize"):
+                with report.stage("write", len(batch)):
+                    inserted = len(self._db.insert_transactions(batch))
+                result.inserted += inserted
+                result.skipped += len(batch) - inserted
+                processed += len(batch)
+                # Per batch, so rows of an import that fails later are still counted
+                IMPORT_ROWS_PARSED.inc(plugin.name, amount=len(batch))
+                IMPORT_ROWS.inc(plugin.name, "inserted", amount=inserted)
+                if progress:
+                    progress(processed, None)
+        finally:
+            # Lets the worker threads exit if insertion failed or the job was cancelled
+            stop.set()
 
-        print("No valid transactions found.")
-        return 0
+        # Every row is stored now; a skipped bad row must stay importable once fixed
+        if not row_errors:
+            for mark in marks.updated():
+                self._db.set_import_mark(mark)
+        result.skipped += marks.skipped
+        result.warnings = marks.warnings
+        IMPORT_ROWS.inc(plugin.name, "skipped", amount=result.skipped)
+        IMPORT_ROWS.inc(plugin.name, "rejected", amount=row_errors)
+        report.totals.update(
+            format=plugin.name,
+            inserted=result.inserted,
+            skipped=result.skipped,
+            rejected=row_errors,
+            matched=stats.matched,
+            slowest_rules=stats.slowest(),
+        )
+        result.timings = report.finish().as_dict()
+        report.log(logger)
+        if not processed and not marks.skipped:
+            logger.warning("No valid transactions found")
+        return result
 
     def parse_data(self, data: str) -> list[Transaction]:
-        if mbank.match(data):
-            return mbank.parse(data, self._user_id)
-        return []
+        plugin = detect(data)
+        if plugin is None:
+            return []
+        return list(plugin.parse_lines(data.splitlines(), self._user_id))
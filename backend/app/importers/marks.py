@@ -0,0 +1,97 @@
+"""Per-account import high-water marks.
+
+For every account IBAN a user imports, an ``ImportMark`` records the range of
+posting dates whose rows are all stored, and the running balance after the
+newest of them. Monthly exports overlap, so the next import can skip the rows
+inside that range without building transactions (see ``mbank.parse_lines``):
+
+* rows strictly between ``first_date`` and ``last_date`` are skipped;
+* rows on ``last_date`` are held back and dropped only if the statement's
+  balance after them equals ``last_balance``. A partially exported last day
+  then still gets its new rows; those are deduplicated by fingerprint like
+  everything else;
+* everything else is parsed and deduplicated by fingerprint as usual.
+
+A statement that starts after the mark extends it when its opening balance
+continues from ``last_balance``. Otherwise rows are missing in between: the
+import reports it and the mark restarts at the new statement. The importer
+saves marks only after an import that inserted everything without row errors.
+"""
+
+from collections.abc import Callable
+from datetime import datetime
+
+from app.models import ImportMark
+
+
+def same_balance(a: float | None, b: float | None) -> bool:
+    return a is not None and b is not None and abs(a - b) < 0.005
+
+
+class ImportMarks:
+    """The marks of one user during one import.
+
+    ``load(iban)`` fetches a stored mark on first use; ``updated()`` are the marks to store
+    once the import succeeded.
+    """
+
+    def __init__(self, user_id: str, load: Callable[[str], ImportMark | None]):
+        self._user_id = user_id
+        self._load = load
+        self._stored: dict[str, ImportMark | None] = {}
+        self._updated: dict[str, ImportMark] = {}
+        self.skipped = 0  # already imported rows dropped without parsing
+        self.warnings: list[str] = []
+
+    def get(self, iban: str) -> ImportMark | None:
+        if iban not in self._stored:
+            self._stored[iban] = self._load(iban)
+        return self._stored[iban]
+
+    def warn(self, message: str) -> None:
+        self.warnings.append(message)
+
+    def record(
+        self,
+        iban: str,
+        first_date: datetime,
+        opening_balance: float,
+        last_date: datetime,
+        closing_balance: float,
+    ) -> None:
+        """Called by a parser once it has read all rows of ``iban`` in a statement."""
+        mark = self.get(iban)
+        span = ImportMark(
+            user_id=self._user_id,
+            iban=iban,
+            first_date=first_date,
+            last_date=last_date,
+            last_balance=closing_balance,
+        )
+        if mark is None:
+            self._updated[iban] = span
+        elif first_date <= mark.last_date and last_date >= mark.first_date:
+            # Overlapping ranges: the union is contiguous
+            newer = span if last_date >= mark.last_date else mark
+            self._updated[iban] = span.model_copy(
+                update={
+                    "first_date": min(first_date, mark.first_date),
+                    "last_date": newer.last_date,
+                    "last_balance": newer.last_balance,
+                }
+            )
+        elif first_date > mark.last_date:
+            if same_balance(opening_balance, mark.last_balance):
+                self._updated[iban] = span.model_copy(
+                    update={"first_date": mark.first_date}
+                )
+            else:
+                self.warn(
+                    f"{iban}: rows between {mark.last_date:%Y-%m-%d} and {first_date:%Y-%m-%d} seem to be missing, "
+                    f"the balance does not continue from {mark.last_balance} (opening {opening_balance:.2f})"
+                )
+                self._updated[iban] = span
+        # A statement entirely older than the mark with a gap before it leaves the mark alone
+
+    def updated(self) -> list[ImportMark]:
+        return list(self._updated.values())
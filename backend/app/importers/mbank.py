@@ -7,18 +7,36 @@ line beginning with::
 
     #Dátum zaúčtovania transakcie;#Dátum uskutočnenia transakcie; ...
 
+``parse_lines`` reads the statement in a single pass and yields transactions
+as rows are read, so a file object can be streamed without loading it whole;
+``parse`` is the list-returning wrapper for text already in memory.
+
 Returned objects are pydantic ``Transaction`` models with a synthetic
 ``user_id`` placeholder. The application typically inserts transactions via
 the upload router; external callers should overwrite ``user_id`` when
 persisting.
 """
 
-from dataclasses import dataclass
-from enum import Enum, auto
 import re
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
 from datetime import datetime
+
 from bson import ObjectId
-from app.models import Asset, BankAccount, Counterparty, Details, Merchant, Transaction, TransactionType
+
+from app.importers import ErrorCallback
+from app.importers.fingerprint import make_fingerprint
+from app.importers.marks import ImportMarks, same_balance
+from app.models import (
+    Asset,
+    BankAccount,
+    Counterparty,
+    Details,
+    ImportMark,
+    Merchant,
+    Transaction,
+    TransactionType,
+)
 
 
 class ParserError(Exception):
@@ -28,7 +46,16 @@ class ParserError(Exception):
 HEADER_MARKER = "#Dátum zaúčtovania transakcie"
 BANK_ID_MARKER = "mBank S.A."
 
+# Account metadata: the value is on the line following the label
+ACCOUNT_FIELDS = {
+    "#Mena účtu:": "currency",
+    "#Typ účtu:": "account_name",
+    "#IBAN:": "iban",
+    "#BIC:": "bic",
+}
+
 DATE_RE = re.compile(r"\d{2}-\d{2}-\d{4}")
+CARD_PAYMENT_RE = re.compile(r"^(.*?)\s*/(.*?)\s*DÁTUM VYKONANIA TRANSAKCIE:\s*(\d{4}-\d{2}-\d{2})$")
 
 
 def match(data: str) -> bool:
@@ -36,6 +63,12 @@ def match(data: str) -> bool:
     return HEADER_MARKER in data and BANK_ID_MARKER in data
 
 
+def sniff(head: str) -> bool:
+    """Cheap detection from the start of a file: the bank name opens the first line and
+    the transaction table header follows the short account summary."""
+    return head.lstrip("\ufeff").startswith(BANK_ID_MARKER) and HEADER_MARKER in head
+
+
 def _strip_text(value: str) -> str:
     return value.strip().strip("'\"").rstrip(";")
 
@@ -49,6 +82,13 @@ def _parse_amount(raw: str) -> float:
     return float(raw)
 
 
+def _parse_date(raw: str) -> datetime:
+    # DD-MM-YYYY; slicing is several times cheaper than strptime on every row
+    if DATE_RE.fullmatch(raw):
+        return datetime(int(raw[6:]), int(raw[3:5]), int(raw[:2]))
+    return datetime.strptime(raw, "%d-%m-%Y")
+
+
 @dataclass
 class Row:
     posting_date: str  # Dátum zaúčtovania transakcie
@@ -66,10 +106,10 @@ class Row:
 
 def _parse_card_payment(row: Row, tx: Transaction) -> Transaction:
     tx.transaction_type = TransactionType.CARD_PAYMENT
-    match = re.search(r"^(.*?)\s*/(.*?)\s*DÁTUM VYKONANIA TRANSAKCIE:\s*(\d{4}-\d{2}-\d{2})$", row.description)
+    match = CARD_PAYMENT_RE.search(row.description)
     if match:
         tx.counterparty = Counterparty(merchant=Merchant(name=match.group(1).strip()))
-        tx.date = datetime.strptime(match.group(3), "%Y-%m-%d")
+        tx.date = datetime.fromisoformat(match.group(3))
         tx.details.location = match.group(2).strip()
     else:
         raise ParserError("Unable to parse card payment description")
@@ -102,144 +142,203 @@ def _parse_withdrawal(row: Row, tx: Transaction) -> Transaction:
     return tx
 
 
-def _parse_by_operation_type(row: Row, tx: Transaction) -> Transaction:
-    tx.details.operation_type = row.operation_type
-    tx.description = " ".join(row.description.split())
-
-    if row.operation_type == "PLATBA KARTOU":
-        return _parse_card_payment(row, tx)
-    elif row.operation_type in ["POPLATOK ZA ZRÝCHLENÚ PLATBU", "POPL. ZA PREDEF. ZRÝCHLENÚ PLATBU"]:
-        return _parse_account_fee(row, tx)
-    elif row.operation_type == "STORNO DEBET.OPERÁCIE":
-        return _parse_cancel_payment(row, tx)
-    elif row.operation_type in [
-        "INKASO",
-        "MEDZIBANKOVÝ PREVOD",
-        "POS VRÁTENIE TOVARU",
-        "PRIJATÁ PLATBA MEDZIBANKOVÁ",
-        "TRVALÁ PLATBA DO MBANK",
-        "TRVALÁ PLATBA MEDZIBANKOVÁ",
-        "ZRÝCHLENÁ PLATBA TUZEMSKÁ",
-    ]:
-        return _parse_transfer(row, tx)
-    elif row.operation_type == "VÝBER V BANKOMATE":
-        return _parse_withdrawal(row, tx)
-
-
-def _parse_one_transaction(raw_line: str, user_id: ObjectId, bank_account: BankAccount) -> Transaction | None:
+OPERATION_PARSERS: dict[str, Callable[[Row, Transaction], Transaction]] = {
+    "PLATBA KARTOU": _parse_card_payment,
+    "POPLATOK ZA ZRÝCHLENÚ PLATBU": _parse_account_fee,
+    "POPL. ZA PREDEF. ZRÝCHLENÚ PLATBU": _parse_account_fee,
+    "STORNO DEBET.OPERÁCIE": _parse_cancel_payment,
+    "INKASO": _parse_transfer,
+    "MEDZIBANKOVÝ PREVOD": _parse_transfer,
+    "POS VRÁTENIE TOVARU": _parse_transfer,
+    "PRIJATÁ PLATBA MEDZIBANKOVÁ": _parse_transfer,
+    "TRVALÁ PLATBA DO MBANK": _parse_transfer,
+    "TRVALÁ PLATBA MEDZIBANKOVÁ": _parse_transfer,
+    "ZRÝCHLENÁ PLATBA TUZEMSKÁ": _parse_transfer,
+    "VÝBER V BANKOMATE": _parse_withdrawal,
+}
+
+
+def _parse_one_transaction(
+    raw_line: str, user_id: ObjectId, bank_account: BankAccount, currency: str | None = None
+) -> Transaction | None:
     parts = raw_line.split(";")
     # Expect at least 11 columns (some final empty because of trailing ;) )
     if len(parts) < 11:
         return None
+    return _parse_row(parts, user_id, bank_account, currency)
 
-    for i in range(len(parts)):
-        parts[i] = _strip_text(parts[i])
 
-    row = Row(*parts[:11])
+def _parse_row(
+    parts: list[str], user_id: ObjectId, bank_account: BankAccount, currency: str | None = None
+) -> Transaction | None:
+    row = Row(*map(_strip_text, parts[:11]))
+    # Unknown operation types are skipped
+    parse_operation = OPERATION_PARSERS.get(row.operation_type)
+    if parse_operation is None:
+        return None
+
+    posting_date = _parse_date(row.posting_date)
+    amount = _parse_amount(row.amount)
+    balance = _parse_amount(row.balance)
 
     tx = Transaction(
         user_id=user_id,
         asset=Asset(bank=bank_account),
         counterparty=None,
-        date=datetime.strptime(row.posting_date, "%d-%m-%Y"),
-        amount=_parse_amount(row.amount),
+        date=posting_date,
+        amount=amount,
         transaction_type=None,
-        details=Details(balance=_parse_amount(row.balance)),
+        description=" ".join(row.description.split()),
+        details=Details(balance=balance, currency=currency, operation_type=row.operation_type),
+        # computed from the raw row: card payments later replace ``date`` with the execution date
+        fingerprint=make_fingerprint(bank_account.iban, posting_date, amount, balance, row.description),
     )
+    return parse_operation(row, tx)
 
-    tx = _parse_by_operation_type(row, tx)
-    return tx
+
+def _bank_account(account: dict[str, str]) -> BankAccount:
+    for field, label in (("account_name", "Account name"), ("iban", "IBAN"), ("bic", "BIC")):
+        if field not in account:
+            raise ParserError(f"{label} not found during parsing")
+    return BankAccount(account_name=account["account_name"], iban=account["iban"], bic=account["bic"])
 
 
-class ParseState(Enum):
-    ITERATE = auto()
-    TRANSACTIONS = auto()
-    CURRENCY = auto()
-    ACCOUNT_TYPE = auto()
-    IBAN = auto()
-    BIC = auto()
+def _row_position(parts: list[str]) -> tuple[datetime, float, float] | None:
+    """Posting date, amount and balance after the row; None when they do not parse."""
+    try:
+        date = _parse_date(_strip_text(parts[0]))
+        return date, _parse_amount(_strip_text(parts[9])), _parse_amount(_strip_text(parts[10]))
+    except ValueError:  # ParserError for empty amounts included
+        return None
 
 
-def parse(data: str, user_id: ObjectId) -> list[Transaction]:
-    """Parse mBank statement text into a list of ``Transaction`` objects."""
+class _StatementEnds:
+    """Remembers the first and last transaction rows passing through ``track``."""
 
-    transactions: list[Transaction] = []
+    def __init__(self):
+        self.first: list[str] | None = None
+        self.last: list[str] | None = None
 
-    account_name = None
-    currency = None
-    iban = None
-    bic = None
+    def track(self, rows: Iterable[tuple[int, list[str]]]) -> Iterator[tuple[int, list[str]]]:
+        for line_no, parts in rows:
+            if self.first is None:
+                self.first = parts
+            self.last = parts
+            yield line_no, parts
 
-    bank_account: BankAccount | None = None
 
-    parser_state = ParseState.ITERATE
+def _skip_imported(
+    rows: Iterable[tuple[int, list[str]]], mark: ImportMark, marks: ImportMarks
+) -> Iterator[tuple[int, list[str]]]:
+    """Drop rows the mark says are stored, without building transactions; see ``app.importers.marks``.
 
-    for line in data.splitlines():
+    Statement rows are in posting order, oldest first.
+    """
+    held: list[tuple[int, list[str]]] = []  # rows on the mark's last date
+    closing = None  # balance after the newest row up to the mark's last date
+    rows = iter(rows)
+    for line_no, parts in rows:
+        position = _row_position(parts)
+        if position is None:
+            yield line_no, parts  # the parser reports it
+            continue
+        date, _, balance = position
+        if date > mark.last_date:
+            yield from _release_held(held, closing, mark, marks)
+            yield line_no, parts
+            yield from rows
+            return
+        closing = balance
+        if date == mark.last_date:
+            held.append((line_no, parts))
+        elif date > mark.first_date:
+            if _strip_text(parts[2]) in OPERATION_PARSERS:
+                marks.skipped += 1
+        else:
+            yield line_no, parts
+    yield from _release_held(held, closing, mark, marks)
+
+
+def _release_held(
+    held: list[tuple[int, list[str]]], closing: float | None, mark: ImportMark, marks: ImportMarks
+) -> list[tuple[int, list[str]]]:
+    """Rows of the mark's last date that still have to be parsed."""
+    if not held:
+        # The statement ends before the mark's last date; ``closing`` is an earlier day's balance
+        return []
+    if closing is None or same_balance(closing, mark.last_balance):
+        marks.skipped += sum(1 for _, parts in held if _strip_text(parts[2]) in OPERATION_PARSERS)
+        return []
+    # The last day was only partly exported last time when its stored rows are a prefix of today's.
+    # Either way the whole day is parsed again and deduplicated by fingerprint.
+    if not any(same_balance(_row_position(parts)[2], mark.last_balance) for _, parts in held):
+        marks.warn(
+            f"{mark.iban}: the balance on {mark.last_date:%Y-%m-%d} differs from the imported history "
+            f"({closing:.2f} instead of {mark.last_balance}); rows before that date were not checked again"
+        )
+    return held
+
+
+def parse_lines(
+    lines: Iterable[str],
+    user_id: ObjectId,
+    on_error: ErrorCallback | None = None,
+    marks: ImportMarks | None = None,
+) -> Iterator[Transaction]:
+    """Lazily parse statement lines (a list, a generator or an open text file) in one pass.
+
+    A transaction row that cannot be parsed raises, unless ``on_error`` is given: it is then
+    called with the 1-based line number and the error, and the row is skipped. With ``marks``
+    rows already imported are skipped and the statement's range is recorded once all rows are read.
+    """
+    numbered = enumerate(lines, start=1)
+    account: dict[str, str] = {}
+    pending_field: str | None = None
+
+    # Account metadata up to the transaction table header
+    for _, line in numbered:
         line = _strip_text(line)
         if line == "":
             continue
+        if pending_field is not None:
+            account[pending_field] = line
+            pending_field = None
+        elif line.startswith(HEADER_MARKER):
+            break
+        else:
+            pending_field = next((field for label, field in ACCOUNT_FIELDS.items() if line.startswith(label)), None)
+    else:
+        return  # no transaction table
 
-        if parser_state == ParseState.TRANSACTIONS:
-            if bank_account is None:
-                if account_name is None:
-                    raise ParserError("Account name not found during parsing")
-                if iban is None:
-                    raise ParserError("IBAN not found during parsing")
-                if bic is None:
-                    raise ParserError("BIC not found during parsing")
-
-                bank_account = BankAccount(
-                    account_name=account_name,
-                    iban=iban,
-                    bic=bic,
-                )
-
-            tx = _parse_one_transaction(line, user_id, bank_account)
-            if tx:
-                tx.details.currency = currency
-                transactions.append(tx)
-
-        elif parser_state == ParseState.ITERATE:
-            if line.startswith("#Mena účtu:"):
-                parser_state = ParseState.CURRENCY
-            elif line.startswith("#Typ účtu:"):
-                parser_state = ParseState.ACCOUNT_TYPE
-            elif line.startswith("#IBAN:"):
-                parser_state = ParseState.IBAN
-            elif line.startswith("#BIC:"):
-                parser_state = ParseState.BIC
-            elif line.startswith(HEADER_MARKER):
-                parser_state = ParseState.TRANSACTIONS
-
-        elif parser_state == ParseState.CURRENCY:
-            currency = line.strip()
-            parser_state = ParseState.ITERATE
-
-        elif parser_state == ParseState.ACCOUNT_TYPE:
-            account_name = line.strip()
-            parser_state = ParseState.ITERATE
-
-        elif parser_state == ParseState.IBAN:
-            iban = line.strip()
-            parser_state = ParseState.ITERATE
-
-        elif parser_state == ParseState.BIC:
-            bic = line.strip()
-            parser_state = ParseState.ITERATE
-
-    lines = [ln for ln in data.splitlines() if ln.strip() != ""]
-
-    # Find header index
-    try:
-        header_idx = next(i for i, ln in enumerate(lines) if ln.startswith(HEADER_MARKER))
-    except StopIteration:
-        return []
+    bank_account = _bank_account(account)
+    currency = account.get("currency")
+    # Expect at least 11 columns (some final empty because of trailing ;) )
+    rows = ((line_no, parts) for line_no, line in numbered if len(parts := line.split(";")) >= 11)
+    ends = _StatementEnds()
+    if marks is not None:
+        rows = ends.track(rows)
+        mark = marks.get(bank_account.iban)
+        if mark is not None:
+            rows = _skip_imported(rows, mark, marks)
+
+    for line_no, parts in rows:
+        try:
+            tx = _parse_row(parts, user_id, bank_account, currency)
+        except (ParserError, ValueError) as exc:
+            if on_error is None:
+                raise
+            on_error(line_no, exc)
+            continue
+        if tx is not None:
+            yield tx
 
-    transactions: list[Transaction] = []
+    if marks is not None and ends.first is not None:
+        first, last = _row_position(ends.first), _row_position(ends.last)
+        if first is not None and last is not None:
+            opening = first[2] - first[1]
+            marks.record(bank_account.iban, first[0], opening, last[0], last[2])
 
-    for raw_line in lines[header_idx + 1 :]:
-        tx = _parse_one_transaction(raw_line, user_id, bank_account)
-        if tx:
-            transactions.append(tx)
 
-    return transactions
+def parse(data: str, user_id: ObjectId) -> list[Transaction]:
+    """Parse mBank statement text into a list of ``Transaction`` objects."""
+    return list(parse_lines(data.splitlines(), user_id))
@@ -0,0 +1,255 @@
+"""In-process background job runner.
+
+Long-running work (applying all rules) is executed on a small thread pool
+instead of inside the HTTP request. Every job has a record in the ``jobs``
+collection holding its status, progress and result summary so the client can
+poll ``GET /jobs/{id}``.
+
+Statement imports are not jobs: uploads stream the request body straight into
+the importer, which a job could only do after buffering the whole file.
+
+Job functions receive a ``JobContext`` (``ctx.db`` is the storage backend) and
+should call ``ctx.progress()`` periodically; that call persists progress and
+raises ``JobCancelled`` once a cancellation was requested.
+"""
+
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import UTC, datetime
+
+from app import profiling
+from app.db import DB
+from app.metrics import CallbackGauge
+from app.models import Job, JobKind, JobStatus, Transaction
+from app.timing import TimingReport
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+APPLY_BATCH_SIZE = 500
+
+
+class JobCancelled(Exception):
+    """Raised from ``JobContext.progress`` when the job was cancelled."""
+
+
+class JobContext:
+    def __init__(self, job_id: str, db: DB):
+        self.job_id = job_id
+        self.db = db
+
+    def progress(self, processed: int, total: int | None = None) -> None:
+        if self.db.report_job_progress(self.job_id, processed, total):
+            raise JobCancelled()
+
+
+JobFunc = Callable[[JobContext], dict]
+
+
+class JobRunner:
+    _instance: "JobRunner | None" = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "JobRunner":
+        if JobRunner._instance is None:
+            # First use may come from several request threads at once
+            with JobRunner._instance_lock:
+                if JobRunner._instance is None:
+                    JobRunner._instance = JobRunner(JOB_WORKERS)
+        return JobRunner._instance
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="job"
+        )
+        self._lock = threading.Lock()
+        # (user_id, kind) -> id of a job submitted by this process that has not started yet
+        self._pending: dict[tuple[str, JobKind], str] = {}
+        self.queued = 0  # submitted, waiting for a worker
+        self.running = 0
+        self._unfinished: set[str] = (
+            set()
+        )  # ids of queued and running jobs, cancelled on shutdown
+
+    def submit(
+        self, user_id: str, kind: JobKind, func: JobFunc, coalesce: bool = False
+    ) -> str:
+        """Queue ``func`` as a job and return its id.
+
+        With ``coalesce`` a request for a (user, kind) that already has a job
+        waiting in the queue returns that job instead of queueing another run;
+        the waiting job will see all changes made before it starts.
+        """
+        with self._lock:
+            key = (user_id, kind)
+            if coalesce and key in self._pending:
+                logger.info(
+                    "Coalescing %s job for user %s into %s",
+                    kind,
+                    user_id,
+                    self._pending[key],
+                )
+                return self._pending[key]
+
+            job = Job(user_id=user_id, kind=kind, created_at=datetime.now(UTC))
+            job_id = DB.get_instance().create_job(job)
+            if coalesce:
+                self._pending[key] = job_id
+        # A profiled request's profile also covers the jobs it starts
+        profiler = profiling.current()
+        if profiler is not None:
+            profiler.hold()
+        with self._lock:
+            self.queued += 1
+            self._unfinished.add(job_id)
+        future = self._executor.submit(self._run, job_id, key, func, profiler)
+        future.add_done_callback(lambda future: self._finished(job_id, future))
+        logger.info("Submitted %s job %s for user %s", kind, job_id, user_id)
+        return job_id
+
+    def _run(
+        self,
+        job_id: str,
+        key: tuple[str, JobKind],
+        func: JobFunc,
+        profiler: profiling.SamplingProfiler | None,
+    ) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            with profiling.attached(profiler):
+                self._run_job(job_id, key, func)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _finished(self, job_id: str, future: Future) -> None:
+        with self._lock:
+            self._unfinished.discard(job_id)
+            if future.cancelled():  # dropped from the queue by shutdown
+                self.queued -= 1
+
+    def _run_job(self, job_id: str, key: tuple[str, JobKind], func: JobFunc) -> None:
+        with self._lock:
+            if self._pending.get(key) == job_id:
+                del self._pending[key]
+        db = DB.get_instance()
+        if not db.start_job(job_id):
+            logger.info("Job %s was cancelled before it started", job_id)
+            return
+
+        try:
+            result = func(JobContext(job_id, db))
+        except JobCancelled:
+            logger.info("Job %s cancelled", job_id)
+            db.update_job(
+                job_id,
+                {
+                    "status": str(JobStatus.CANCELLED),
+                    "finished_at": datetime.now(UTC),
+                },
+            )
+        except Exception as exc:
+            logger.exception("Job %s failed", job_id)
+            db.update_job(
+                job_id,
+                {
+                    "status": str(JobStatus.FAILED),
+                    "error": str(exc),
+                    "finished_at": datetime.now(UTC),
+                },
+            )
+        else:
+            logger.info("Job %s finished", job_id)
+            db.update_job(
+                job_id,
+                {
+                    "status": str(JobStatus.SUCCEEDED),
+                    "result": result,
+                    "finished_at": datetime.now(UTC),
+                },
+            )
+
+    def shutdown(self) -> None:
+        """Stop taking jobs; the records of unfinished ones end up cancelled rather than stuck.
+
+        Queued jobs are dropped and marked cancelled. Running jobs are asked to cancel and stop
+        at their next ``ctx.progress()``, before the interpreter waits for the worker threads.
+        """
+        with self._lock:
+            unfinished = list(
+                self._unfinished
+            )  # before dropping the queued ones forgets them
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if unfinished:
+            db = DB.get_instance()
+            for job_id in unfinished:
+                db.cancel_job(job_id)
+            logger.info("Cancelled %d unfinished jobs on shutdown", len(unfinished))
+
+
+def _job_count(state: str) -> int:
+    # Read at scrape time; a scrape does not start the runner
+    runner = JobRunner._instance
+    return getattr(runner, state) if runner is not None else 0
+
+
+JOBS_QUEUED = CallbackGauge(
+    "jobs_queued", "Background jobs waiting for a worker", lambda: _job_count("queued")
+)
+JOBS_RUNNING = CallbackGauge(
+    "jobs_running", "Background jobs being run", lambda: _job_count("running")
+)
+
+
+def apply_rules_job(user_id: str) -> JobFunc:
+    def run(ctx: JobContext) -> dict:
+        # Imported here to keep the rule engine out of the job runner's import graph
+        from app.rules.rule_engine import RuleEngine
+
+        report = TimingReport("apply_rules")
+        with report.stage("load_rules") as timing:
+            rule_engine = RuleEngine(user_id, ctx.db)
+            timing.count = rule_engine.rule_count
+        with report.stage("fetch") as timing:
+            docs = ctx.db.find_transactions(user_id)
+            timing.count = len(docs)
+        with report.stage("validate", len(docs)):
+            transactions = [Transaction.model_validate(doc) for doc in docs]
+        del docs
+        total = len(transactions)
+        ctx.progress(0, total)
+
+        stats = rule_engine.new_stats()
+        for name in ("evaluate", "write"):  # reported even without transactions
+            report.stage_timing(name)
+        modified = 0
+        for start in range(0, total, APPLY_BATCH_SIZE):
+            batch = transactions[start : start + APPLY_BATCH_SIZE]
+            with report.stage("evaluate", len(batch)):
+                # apply_rules lists a transaction once per matching rule
+                modified_batch = {
+                    id(tx): tx for tx in rule_engine.apply_rules(batch, stats)
+                }
+            with report.stage("write", len(modified_batch)):
+                for tx in modified_batch.values():
+                    if ctx.db.update_transaction(tx.id, tx):
+                        modified += 1
+            ctx.progress(start + len(batch))
+
+        report.totals.update(
+            matched=stats.matched, modified=modified, slowest_rules=stats.slowest()
+        )
+        report.finish().log(logger)
+        return {
+            "transactions": total,
+            "modified": modified,
+            "timings": report.as_dict(),
+        }
+
+    return run
@@ -1,59 +1,117 @@
 """Central logging setup for the backend.
 
-Creates a `.logs` directory at the project root and configures a rotating
-file handler plus a console handler. The log level is controlled by the
-`LOG_LEVEL` environment variable (defaults to INFO).
+Log records are handed to a queue by the root logger's only handler and
+written by a background thread (``QueueListener``) to a rotating file in the
+project's ``.logs`` directory and to the console, so a request thread never
+waits for disk or terminal I/O. The log level is controlled by the
+``LOG_LEVEL`` environment variable (defaults to INFO); ``LOG_FORMAT=json``
+writes one JSON object per line instead of plain text.
+
+Messages are rendered by the calling thread before they are queued, so
+arguments that change afterwards are logged as they were.
+
+Code that may log once per transaction should go through ``RateLimitedLog``.
 """
 
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
-
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
 
 # Compute project root (two parents up from this file: backend/app -> backend -> project root)
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 LOG_DIR = PROJECT_ROOT / ".logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "app.log"
 
 _FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
 _DATEFMT = "%Y-%m-%d %H:%M:%S"
-_FORMATTER = logging.Formatter(_FORMAT, _DATEFMT)
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+_handler: QueueHandler | None = None  # on the root logger while the listener runs
+_previous_level = logging.WARNING
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including the fields passed in ``extra``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _RenderingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, leave the formatting (and the traceback layout) to the
+        # writer's formatter; only render what may change once the caller moves on.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(_FORMAT, _DATEFMT)
 
 
 def setup_logging() -> None:
-    """Configure root logging handlers.
+    """Route all logging through a queue to the file and console writers.
 
-    Safe to call multiple times; it will not duplicate handlers for the
-    same file or add multiple console handlers.
+    Safe to call multiple times; only the first call (or the first after ``shutdown_logging``)
+    configures anything.
     """
-    level = getattr(logging, LOG_LEVEL, logging.INFO)
-    root = logging.getLogger()
-    root.setLevel(level)
-
-    # File handler (rotating)
-    existing_file = False
-    for h in root.handlers:
-        if isinstance(h, RotatingFileHandler) and getattr(h, "baseFilename", None) == str(LOG_FILE):
-            existing_file = True
-            break
-
-    if not existing_file:
-        fh = RotatingFileHandler(str(LOG_FILE), maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
-        fh.setLevel(level)
-        fh.setFormatter(_FORMATTER)
-        root.addHandler(fh)
+    global _listener, _handler, _previous_level
+    with _setup_lock:
+        if _listener is not None:
+            return
+        level = getattr(logging, LOG_LEVEL, logging.INFO)
+        formatter = _formatter()
 
-    # Console handler (useful during development)
-    has_stream = any(isinstance(h, logging.StreamHandler) for h in root.handlers)
-    if not has_stream:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        fh = RotatingFileHandler(str(LOG_FILE), maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
         ch = logging.StreamHandler()
-        ch.setLevel(level)
-        ch.setFormatter(_FORMATTER)
-        root.addHandler(ch)
+        for handler in (fh, ch):
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, fh, ch, respect_handler_level=True)
+        _listener.start()
+
+        root = logging.getLogger()
+        _previous_level = root.level
+        root.setLevel(level)
+        _handler = _RenderingQueueHandler(log_queue)
+        root.addHandler(_handler)
 
     # Reduce verbosity from some noisy third-party loggers
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -61,4 +119,72 @@ def setup_logging() -> None:
     logging.getLogger("pymongo").setLevel(logging.WARNING)
 
 
-__all__ = ["setup_logging", "LOG_DIR", "LOG_FILE"]
+def shutdown_logging() -> None:
+    """Write out the queued records, stop the writer thread and undo ``setup_logging``.
+
+    The queue handler leaves the root logger first, so no record is queued that nothing
+    would write; afterwards the root logger logs as it did before ``setup_logging``.
+    """
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(_handler)
+        _handler.close()
+        root.setLevel(_previous_level)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = _handler = None
+
+
+class RateLimitedLog:
+    """Logs at most ``per_second`` records on average, in bursts of up to ``burst``.
+
+    For log calls inside loops over transactions: the level check comes first, so a
+    disabled level costs one comparison. The first record let through after others
+    were dropped says how many were dropped.
+    """
+
+    def __init__(self, logger: logging.Logger, per_second: float = 1.0, burst: int = 10):
+        self.logger = logger
+        self.per_second = per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def _allow(self) -> int | None:
+        """Number of records dropped since the last one let through, or None to drop this one."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+            if self._tokens < 1:
+                self._dropped += 1
+                return None
+            self._tokens -= 1
+            dropped, self._dropped = self._dropped, 0
+            return dropped
+
+    def log(self, level: int, msg: str, *args) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        dropped = self._allow()
+        if dropped is None:
+            return
+        if dropped:
+            msg += " (%d similar messages dropped)"
+            args = (*args, dropped)
+        self.logger.log(level, msg, *args, stacklevel=3)
+
+    def debug(self, msg: str, *args) -> None:
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args) -> None:
+        self.log(logging.INFO, msg, *args)
+
+
+__all__ = ["setup_logging", "shutdown_logging", "JsonFormatter", "RateLimitedLog", "LOG_DIR", "LOG_FILE"]
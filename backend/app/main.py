@@ -1,35 +1,45 @@
-import os
 import logging
-# from app.logging import setup_logging
-
-# Configure logging early so other modules (routers, auth, db) pick up config
-# setup_logging()
-
+import os
+import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
+
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, transactions, rules, actions
-from app.routers import categories, tags
-from app.db import DB
-
-DB().get_instance()  # Initialize DB singleton
-
-app = FastAPI()
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
 
+from app.compression import CompressionMiddleware
+from app.db import DB
+from app.jobs import JobRunner
+from app.logging import setup_logging, shutdown_logging
+from app.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.passwords import PasswordHasher
+from app.profiling import PROFILING_TOKEN, ProfilingMiddleware
+from app.responses import FastJSONResponse
+from app.routers import actions, admin, auth, categories, jobs, rules, tags, transactions, upload
 
 logger = logging.getLogger(__name__)
 
 
-@app.on_event("startup")
-async def on_startup():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Here rather than at import time: importing the app must not start the log writer thread
+    setup_logging()
     logger.info("Application startup: Spending Frustration API")
+    # Connect once at startup rather than at import time or on the first request
+    await run_in_threadpool(DB.get_instance)
+    yield
+    logger.info("Application shutdown")
+    JobRunner.get_instance().shutdown()
+    PasswordHasher.get_instance().shutdown()
+    if "app.storage.slow_queries" in sys.modules:  # loaded with pymongo, by the MongoDB backend or /admin
+        sys.modules["app.storage.slow_queries"].SlowQueryLog.get_instance().shutdown()
+    shutdown_logging()
 
 
-@app.on_event("shutdown")
-async def on_shutdown():
-    logger.info("Application shutdown")
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 
 static_path = os.getenv("FRONTEND_STATIC_PATH")
@@ -47,15 +57,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)  # outermost, so timings include compression
+if PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware, token=PROFILING_TOKEN)
 
 # Routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
 app.include_router(rules.router, prefix="/rules", tags=["rules"])
-# app.include_router(upload.router, prefix="/upload-statement", tags=["upload"])
+app.include_router(upload.router, prefix="/upload-statement", tags=["upload"])
 app.include_router(actions.router, prefix="/actions", tags=["actions"])
 app.include_router(categories.router, prefix="/categories", tags=["categories"])
 app.include_router(tags.router, prefix="/tags", tags=["tags"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint; unauthenticated, restrict it at the proxy."""
+    return Response(REGISTRY.exposition(), media_type=CONTENT_TYPE)
 
 
 @app.get("/")
@@ -1,15 +1,32 @@
-from pydantic import BaseModel, EmailStr, ConfigDict, Field
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, WithJsonSchema
 from enum import StrEnum
 from datetime import datetime
+from typing import Annotated
 from pydantic import field_validator
+from pydantic.networks import validate_email
 from bson import ObjectId
 
 
-class User(BaseModel):
+# EmailStr imports email_validator (~35 ms) as soon as a model using it is defined, even in
+# scripts that never see an address; this validates the same way but imports it on first use.
+Email = Annotated[
+    str,
+    AfterValidator(lambda value: validate_email(value)[1]),
+    WithJsonSchema({"type": "string", "format": "email"}),
+]
+
+
+class _Model(BaseModel):
+    # Validators are built on first use and kept on the class, so a process only pays for the
+    # models it uses (a rule import never builds Job, an import worker never builds User)
+    model_config = ConfigDict(defer_build=True)
+
+
+class User(_Model):
     id: str | None = Field(default=None, alias="_id")
     username: str
     hashed_password: str
-    email: EmailStr | None = None
+    email: Email | None = None
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -40,32 +57,32 @@ class AccountType(StrEnum):
     WALLET = "wallet"
 
 
-class BankAccount(BaseModel):
+class BankAccount(_Model):
     account_name: str
     iban: str | None = None
     bic: str | None = None
 
 
-class Wallet(BaseModel):
+class Wallet(_Model):
     wallet_name: str
 
 
-class Merchant(BaseModel):
+class Merchant(_Model):
     name: str
 
 
-class Asset(BaseModel):
+class Asset(_Model):
     bank: BankAccount | None = None
     wallet: Wallet | None = None
 
 
-class Counterparty(BaseModel):
+class Counterparty(_Model):
     bank: BankAccount | None = None
     wallet: Wallet | None = None
     merchant: Merchant | None = None
 
 
-class Details(BaseModel):
+class Details(_Model):
     message_for_recipient: str | None = None
     transaction_note: str | None = None
     balance: float | None = None
@@ -75,7 +92,7 @@ class Details(BaseModel):
     symbols: dict[str, str] | None = None
 
 
-class Transaction(BaseModel):
+class Transaction(_Model):
     id: str | None = Field(default=None, alias="_id")
     user_id: str
     asset: Asset
@@ -89,6 +106,8 @@ class Transaction(BaseModel):
     tags: list[str] | None = None
     note: str | None = None
     details: Details | None = None
+    # Deterministic import identity, see app.importers.fingerprint
+    fingerprint: str | None = None
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -128,7 +147,7 @@ class Transaction(BaseModel):
         return v
 
 
-class RuleDB(BaseModel):
+class RuleDB(_Model):
     id: str | None = Field(default=None, alias="_id")
     user_id: str
     rule: str
@@ -149,4 +168,61 @@ class RuleDB(BaseModel):
         return v
 
 
+class ImportMark(_Model):
+    """Contiguous range of an account's statement rows already imported, see app.importers.marks."""
+
+    user_id: str
+    iban: str
+    first_date: datetime  # posting dates of the oldest and newest imported rows
+    last_date: datetime
+    last_balance: float | None = None  # running balance after the newest row
+
+    @field_validator("user_id", mode="before")
+    def validate_user_id(cls, v):
+        if isinstance(v, ObjectId):
+            return str(v)
+        return v
+
+
+class JobKind(StrEnum):
+    APPLY_RULES = "apply_rules"
+
+
+class JobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(_Model):
+    id: str | None = Field(default=None, alias="_id")
+    user_id: str
+    kind: JobKind
+    status: JobStatus = JobStatus.PENDING
+    processed: int = 0
+    total: int | None = None
+    cancel_requested: bool = False
+    result: dict | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @field_validator("id", mode="before")
+    def validate_id(cls, v):
+        if isinstance(v, ObjectId):
+            return str(v)
+        return v
+
+    @field_validator("user_id", mode="before")
+    def validate_user_id(cls, v):
+        if isinstance(v, ObjectId):
+            return str(v)
+        return v
+
+
 # Note: rules are now stored as separate documents in `rules` collection.
@@ -0,0 +1,188 @@
+"""Password hashing on a dedicated worker pool.
+
+pbkdf2_sha256 costs tens of milliseconds of CPU per hash. Computed inside the
+request handlers it holds a slot of the shared request thread pool for that
+long, so a burst of logins starves every other endpoint. ``PasswordHasher``
+runs hashes on ``PASSWORD_HASH_WORKERS`` worker processes instead (0: a single
+background thread of this process), and the endpoints simply await the result.
+
+At most ``PASSWORD_HASH_MAX_PENDING`` hashes may be queued or running; past that
+``HashingBusy`` is raised so the endpoint can answer 503 right away instead of
+queueing logins that would time out anyway. ``PasswordHasher.stats`` counts
+completed and rejected hashes and the time they waited for a worker; the same
+numbers are exported at ``/metrics``.
+
+The cost is ``PASSWORD_HASH_ROUNDS``. Stored hashes with any other round count
+still verify, and ``verify`` returns a new hash at the current cost for the
+caller to store.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import TYPE_CHECKING
+
+from app.metrics import CallbackGauge, Counter, Histogram
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1)))
+)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+PASSWORD_HASHES = Counter(
+    "password_hashes_total",
+    "Password hashes and verifications by outcome: completed or rejected (busy)",
+    ("outcome",),
+)
+PASSWORD_HASH_QUEUE = Histogram(
+    "password_hash_queue_seconds", "Time a password hash waited for a worker"
+)
+
+
+@lru_cache
+def crypt_context(rounds: int) -> "CryptContext":
+    # passlib is imported here, by the first hash, rather than by every process importing the app
+    from passlib.context import CryptContext
+
+    # Pinning min and max rounds to the default makes every other cost "needs update"
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+        pbkdf2_sha256__max_rounds=rounds,
+    )
+
+
+# Executed by the workers; module level so they can be pickled. Each returns its result
+# and the seconds the job waited between submission and start.
+
+
+def _hash(password: str, rounds: int, submitted: float) -> tuple[str, float]:
+    waited = time.time() - submitted
+    return crypt_context(rounds).hash(password), waited
+
+
+def _verify(
+    password: str, hashed: str, rounds: int, submitted: float
+) -> tuple[tuple[bool, str | None], float]:
+    waited = time.time() - submitted
+    return crypt_context(rounds).verify_and_update(password, hashed), waited
+
+
+class HashingBusy(Exception):
+    """``PASSWORD_HASH_MAX_PENDING`` hashes are queued or running already."""
+
+
+@dataclass
+class HashingStats:
+    pending: int = 0  # queued or running now
+    completed: int = 0
+    rejected: int = 0
+    queue_seconds_total: float = 0.0  # time completed hashes waited for a worker
+    queue_seconds_max: float = 0.0
+
+
+class PasswordHasher:
+    _instance: "PasswordHasher | None" = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "PasswordHasher":
+        if PasswordHasher._instance is None:
+            # First use may come from several request threads at once; each instance has its own pool
+            with PasswordHasher._instance_lock:
+                if PasswordHasher._instance is None:
+                    PasswordHasher._instance = PasswordHasher(
+                        PASSWORD_HASH_WORKERS,
+                        PASSWORD_HASH_MAX_PENDING,
+                        PASSWORD_HASH_ROUNDS,
+                    )
+        return PasswordHasher._instance
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.rounds = rounds
+        self._workers = workers
+        self._max_pending = max_pending
+        self._executor: Executor | None = None  # started on first use
+        self._lock = threading.Lock()
+        self._stats = HashingStats()
+
+    @property
+    def stats(self) -> HashingStats:
+        with self._lock:
+            return replace(self._stats)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._workers > 0:
+                # spawn: a forked copy of the server would inherit its DB client and threads
+                self._executor = ProcessPoolExecutor(
+                    self._workers, mp_context=get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _submit(self, func: Callable, *args) -> Future:
+        with self._lock:
+            if self._stats.pending >= self._max_pending:
+                self._stats.rejected += 1
+                PASSWORD_HASHES.inc("rejected")
+                raise HashingBusy()
+            self._stats.pending += 1
+            executor = self._get_executor()
+        future = executor.submit(func, *args, self.rounds, time.time())
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._stats.pending -= 1
+            if not future.cancelled() and future.exception() is None:
+                waited = future.result()[1]
+                self._stats.completed += 1
+                self._stats.queue_seconds_total += waited
+                self._stats.queue_seconds_max = max(
+                    self._stats.queue_seconds_max, waited
+                )
+                PASSWORD_HASHES.inc("completed")
+                PASSWORD_HASH_QUEUE.observe(value=waited)
+
+    async def hash(self, password: str) -> str:
+        hashed, _ = await asyncio.wrap_future(self._submit(_hash, password))
+        return hashed
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Whether ``password`` matches, and a new hash to store when ``hashed`` has another cost."""
+        result, _ = await asyncio.wrap_future(self._submit(_verify, password, hashed))
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def _pending_hashes() -> int:
+    # Read at scrape time; a scrape does not start the hasher
+    hasher = PasswordHasher._instance
+    return hasher.stats.pending if hasher is not None else 0
+
+
+PASSWORD_HASHES_PENDING = CallbackGauge(
+    "password_hashes_pending", "Password hashes queued or running", _pending_hashes
+)
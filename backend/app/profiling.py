@@ -0,0 +1,237 @@
+"""Opt-in sampling profiler for single requests and the import scripts.
+
+With ``PROFILING_TOKEN`` set, a request carrying ``X-Profile: <token>`` is
+profiled: a background thread samples the Python stack of every busy thread of
+the process every ``PROFILE_INTERVAL`` seconds until the request, and any job
+it submitted, has finished. Idle threads (waiting on a queue, a lock or the
+event loop selector) are not counted. The report is written to
+``PROFILE_DIR/<id>.collapsed`` and the id returned in the ``X-Profile-Id``
+response header.
+
+Reports use the collapsed stack format (``root;caller;callee <samples>``, one
+stack per line) read by flamegraph.pl, speedscope and inferno. Every stack
+starts with the name of its thread, so job and request threads are separated.
+Other work running at the same time in the same process is sampled as well:
+profile on an instance without much other traffic.
+
+Without ``PROFILING_TOKEN`` the middleware is not installed, and nothing else
+runs until a profile is started.
+"""
+
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_HEADER = "x-profile"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = Path(
+    os.getenv("PROFILE_DIR", Path(__file__).resolve().parents[2] / ".profiles")
+)
+
+# Innermost frames of threads that are waiting for work rather than doing it
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # concurrent.futures, blocked on its work queue
+    ("handlers.py", "dequeue"),  # the log writer thread (app.logging)
+}
+
+# Stripped from file names, so stacks read the same on every machine; longest first
+_PATH_PREFIXES = sorted(
+    {sysconfig.get_path(name) for name in ("purelib", "platlib", "stdlib")}
+    | {str(Path(__file__).parents[1])},
+    key=len,
+    reverse=True,
+)
+
+_current: ContextVar["SamplingProfiler | None"] = ContextVar("profiler", default=None)
+_active_lock = threading.Lock()  # one profile at a time; every thread is sampled
+
+
+def current() -> "SamplingProfiler | None":
+    """The profile the calling request belongs to, for handing it on to background work."""
+    return _current.get()
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix) :].lstrip("/")
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples all busy threads until every holder has released it.
+
+    ``hold()`` and ``release()`` count the pieces of work the profile waits for; the first
+    ``hold()`` starts sampling, the last ``release()`` stops it and calls ``on_done``.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILE_INTERVAL,
+        on_done: Callable[["SamplingProfiler"], None] | None = None,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._on_done = on_done
+        self._holders = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def hold(self) -> None:
+        with self._lock:
+            self._holders += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._sample, name="profiler", daemon=True
+                )
+                self._sampler.start()
+
+    def release(self) -> None:
+        with self._lock:
+            self._holders -= 1
+            if self._holders:
+                return
+        self._stop.set()
+        self._sampler.join()
+        if self._on_done:
+            self._on_done(self)
+
+    def _sample(self) -> None:
+        start = time.perf_counter()
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if (
+                    ident == own
+                    or (
+                        os.path.basename(frame.f_code.co_filename),
+                        frame.f_code.co_name,
+                    )
+                    in _IDLE_FRAMES
+                ):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread").rstrip("0123456789_-"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.seconds = time.perf_counter() - start
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def save(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.collapsed(), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def attached(profiler: "SamplingProfiler | None") -> Iterator[None]:
+    """Run a block as part of ``profiler``, from a thread the profile was handed to.
+
+    Releases the hold the submitter took, so the profile ends after the block.
+    """
+    if profiler is None:
+        yield
+        return
+    token = _current.set(profiler)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        profiler.release()
+
+
+@contextmanager
+def profile_to(path: Path) -> Iterator[SamplingProfiler]:
+    """Profile the block and write the collapsed stacks to ``path``; for the CLI scripts."""
+    profiler = SamplingProfiler()
+    profiler.hold()
+    try:
+        yield profiler
+    finally:
+        profiler.release()
+        profiler.save(path)
+        print(
+            f"Profile: {profiler.samples} samples over {profiler.seconds:.2f}s written to {path}",
+            file=sys.stderr,
+        )
+
+
+def _store(profiler: SamplingProfiler) -> None:
+    _active_lock.release()
+    path = profiler.save(PROFILE_DIR / f"{profiler.id}.collapsed")
+    logger.info(
+        "Profile %s: %d samples over %.2fs written to %s",
+        profiler.id,
+        profiler.samples,
+        profiler.seconds,
+        path,
+    )
+
+
+class ProfilingMiddleware:
+    """Profiles requests that send ``X-Profile: <PROFILING_TOKEN>``; see the module docstring."""
+
+    def __init__(self, app: ASGIApp, token: str):
+        self.app = app
+        self.token = token
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or Headers(scope=scope).get(PROFILE_HEADER) != self.token
+        ):
+            await self.app(scope, receive, send)
+            return
+        if not _active_lock.acquire(blocking=False):
+            logger.warning(
+                "Not profiling %s: another profile is running", scope["path"]
+            )
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(on_done=_store)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profiler.id)
+            await send(message)
+
+        profiler.hold()
+        token = _current.set(profiler)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            profiler.release()
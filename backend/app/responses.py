@@ -0,0 +1,48 @@
+"""Fast JSON response class used as the application default.
+
+Serializes with ``orjson`` when it is installed (falls back to the standard
+library otherwise) and knows how to encode the types that come straight out of
+the database layer: ``ObjectId``, ``datetime``, enums and pydantic models. This
+lets read endpoints return raw projected documents without a second
+validate/serialize pass through the response model.
+"""
+
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True, exclude_none=True)
+    # Only reached on the stdlib fallback; orjson handles these natively
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -3,10 +3,9 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 
 from app.auth import get_user_id
-from app.rules.rule_engine import RuleEngine
-from app.db import DB
+from app.jobs import JobRunner, apply_rules_job
+from app.models import JobKind
 
-db = DB.get_instance()
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -14,14 +13,14 @@ logger = logging.getLogger(__name__)
 class RuleOut(BaseModel):
     success: bool
     details: str
+    job_id: str | None = None
 
 
-@router.post("/apply_all_rules", response_model=RuleOut)
+@router.post("/apply_all_rules", response_model=RuleOut, status_code=202)
 def apply_rules(user_id: str = Depends(get_user_id)):
-    logger.info(f"Applying all rules for user {user_id}")
-    rule_engine = RuleEngine(user_id)
-    transactions = db.get_transactions(user_id)
-    modified_transactions = rule_engine.apply_rules(transactions)
-    for tx in modified_transactions:
-        db.update_transaction(tx.id, tx)
-    return RuleOut(success=True, details="All applicable rules have been applied.")
+    logger.info(f"Scheduling rule application for user {user_id}")
+    # Repeated clicks while a run is still queued reuse that run
+    job_id = JobRunner.get_instance().submit(
+        user_id, JobKind.APPLY_RULES, apply_rules_job(user_id), coalesce=True
+    )
+    return RuleOut(success=True, details="Rule application scheduled.", job_id=job_id)
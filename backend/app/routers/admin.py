@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+
+from app.auth import require_admin
+
+router = APIRouter()
+
+
+class SlowQueryOut(BaseModel):
+    collection: str
+    command: str
+    shape: str
+    count: int
+    total_ms: float
+    max_ms: float
+    last_seen: datetime | None = None
+    plan: list[str] | None = None
+    collscan: bool | None = None
+
+
+class SlowQueriesOut(BaseModel):
+    threshold_ms: float
+    queries: list[SlowQueryOut]
+
+
+@router.get("/slow-queries", response_model=SlowQueriesOut)
+def slow_queries(limit: int = Query(20, ge=1, le=200), _: str = Depends(require_admin)):
+    """Query shapes slower than SLOW_QUERY_MS, most total time first (MongoDB backend only)."""
+    # Imports pymongo, which SQLite deployments never load otherwise
+    from app.storage.slow_queries import SLOW_QUERY_MS, SlowQueryLog
+
+    queries = SlowQueryLog.get_instance().top(limit)
+    return SlowQueriesOut(
+        threshold_ms=SLOW_QUERY_MS,
+        queries=[SlowQueryOut(**vars(query)) for query in queries],
+    )
@@ -1,18 +1,20 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from pydantic import BaseModel, EmailStr
-from app.auth import get_password_hash, verify_password, create_access_token
-from app.db import DB
-from app.models import User
+from pydantic import BaseModel
+
+from app.auth import create_access_token
+from app.db import DB, get_db
+from app.models import Email, User
+from app.passwords import HashingBusy, PasswordHasher
 
-db = DB.get_instance()
 router = APIRouter()
 
 
 class UserRegister(BaseModel):
     username: str
     password: str
-    email: EmailStr | None = None
+    email: Email | None = None
 
 
 class Token(BaseModel):
@@ -20,28 +22,53 @@ class Token(BaseModel):
     token_type: str
 
 
-@router.post("/register", status_code=201)
-def register(user: UserRegister):
-    # Check existing user
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _find_user(db: DB, username: str) -> User | None:
     try:
-        existing = db.get_user(user.username)
-        if existing:
-            raise HTTPException(status_code=400, detail="User already registered")
+        return db.get_user(username)
     except ValueError:
-        # not found -> proceed
-        pass
+        return None
+
+
+# Async so that waiting for the password hasher does not hold a request thread;
+# the short DB calls run on the thread pool.
 
-    hashed_password = get_password_hash(user.password)
+
+@router.post("/register", status_code=201)
+async def register(user: UserRegister, db: DB = Depends(get_db)):
+    if await run_in_threadpool(_find_user, db, user.username):
+        raise HTTPException(status_code=400, detail="User already registered")
+
+    try:
+        hashed_password = await PasswordHasher.get_instance().hash(user.password)
+    except HashingBusy:
+        raise _hashing_busy()
     user_model = User(username=user.username, email=user.email, hashed_password=hashed_password)
-    inserted_id = db.create_user(user_model)
+    inserted_id = await run_in_threadpool(db.create_user, user_model)
     return {"message": "User created", "user_id": str(inserted_id)}
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    db_user = db.get_user(form_data.username)
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: DB = Depends(get_db)):
+    db_user = await run_in_threadpool(_find_user, db, form_data.username)
+    if not db_user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    try:
+        valid, new_hash = await PasswordHasher.get_instance().verify(form_data.password, db_user.hashed_password)
+    except HashingBusy:
+        raise _hashing_busy()
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Stored with an older cost: upgrade now that the plain password is at hand
+        await run_in_threadpool(db.update_user, db_user.id, {"hashed_password": new_hash})
 
     access_token = create_access_token({"sub": db_user.id})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from app.auth import get_user_id
+from app.db import DB, get_db
+from app.models import Job, JobKind, JobStatus
+
+router = APIRouter()
+
+
+class JobOut(BaseModel):
+    id: str
+    kind: JobKind
+    status: JobStatus
+    processed: int
+    total: int | None = None
+    result: dict | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+def _job_out(job: Job) -> JobOut:
+    return JobOut(
+        **job.model_dump(exclude={"id", "user_id", "cancel_requested"}), id=job.id or ""
+    )
+
+
+def _get_owned_job(db: DB, job_id: str, user_id: str) -> Job:
+    try:
+        job = db.get_job(job_id)
+    except ValueError:
+        job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return job
+
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(job_id: str, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
+    return _job_out(_get_owned_job(db, job_id, user_id))
+
+
+@router.post("/{job_id}/cancel", response_model=JobOut)
+def cancel_job(
+    job_id: str, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)
+):
+    _get_owned_job(db, job_id, user_id)
+    if not db.cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return _job_out(db.get_job(job_id))
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends
-from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from fastapi import HTTPException
+
 from app.auth import get_user_id
-from app.db import DB
+from app.caching import not_modified
+from app.db import DB, get_db
 from app.rules.parser import parse_rule
 
-db = DB.get_instance()
 router = APIRouter()
 
 
@@ -16,8 +16,8 @@ class RuleIn(BaseModel):
 
 
 class RuleUpdate(BaseModel):
-    rule: Optional[str] = None
-    active: Optional[bool] = None
+    rule: str | None = None
+    active: bool | None = None
 
 
 class RuleOut(BaseModel):
@@ -26,14 +26,16 @@ class RuleOut(BaseModel):
     active: bool
 
 
-@router.get("", response_model=List[RuleOut])
-def list_rules(user_id: str = Depends(get_user_id)):
+@router.get("", response_model=list[RuleOut])
+def list_rules(request: Request, response: Response, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
+    if cached := not_modified(request, response, db, user_id):
+        return cached
     rules = db.get_rules(user_id=user_id)
     return [RuleOut(id=r.id or "", rule=r.rule, active=r.active) for r in rules]
 
 
 @router.post("", status_code=201, response_model=RuleOut)
-def create_rule(rule_in: RuleIn, user_id: str = Depends(get_user_id)):
+def create_rule(rule_in: RuleIn, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
     parse_rule(rule_in.rule)
     # Create as a plain dict to let DB layer handle ObjectId conversion
     doc = {"rule": rule_in.rule, "active": rule_in.active}
@@ -42,14 +44,16 @@ def create_rule(rule_in: RuleIn, user_id: str = Depends(get_user_id)):
 
 
 @router.get("/export", response_model=list[str])
-def export_rules(user_id: str = Depends(get_user_id)):
+def export_rules(request: Request, response: Response, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
+    if cached := not_modified(request, response, db, user_id):
+        return cached
     rules = db.get_rules(user_id=user_id)
     # return rules as text. Every rule on its own line
     return [r.rule for r in rules]
 
 
 @router.post("/import", status_code=201)
-def import_rules(rules: list[str], user_id: str = Depends(get_user_id)):
+def import_rules(rules: list[str], user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
     for rule in rules:
         parse_rule(rule)
         db.add_rule(user_id, {"rule": rule, "active": True}, priority=0)
@@ -57,7 +61,7 @@ def import_rules(rules: list[str], user_id: str = Depends(get_user_id)):
 
 
 @router.put("/{rule_id}", response_model=RuleOut)
-def update_rule(rule_id: str, update: RuleUpdate, user_id: str = Depends(get_user_id)):
+def update_rule(rule_id: str, update: RuleUpdate, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
     # validate fields
     update_data = {k: v for k, v in update.model_dump(exclude_unset=True).items() if v is not None}
     if "rule" in update_data:
@@ -77,7 +81,15 @@ def update_rule(rule_id: str, update: RuleUpdate, user_id: str = Depends(get_use
 
 
 @router.get("/{rule_id}", response_model=RuleOut)
-def get_rule(rule_id: str, user_id: str = Depends(get_user_id)):
+def get_rule(
+    rule_id: str,
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
+):
+    if cached := not_modified(request, response, db, user_id):
+        return cached
     existing = db.get_rule(rule_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Rule not found")
@@ -87,7 +99,7 @@ def get_rule(rule_id: str, user_id: str = Depends(get_user_id)):
 
 
 @router.delete("/{rule_id}")
-def delete_rule(rule_id: str, user_id: str = Depends(get_user_id)):
+def delete_rule(rule_id: str, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
     existing = db.get_rule(rule_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Rule not found")
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, Request, Response
+
 from app.auth import get_user_id
-from app.db import DB
+from app.caching import not_modified
+from app.db import DB, get_db
 
-db = DB.get_instance()
 router = APIRouter()
 
 
-@router.get("", response_model=List[str])
-def list_tags(user_id: str = Depends(get_user_id)):
+@router.get("", response_model=list[str])
+def list_tags(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
+):
     """Return all distinct tags for the current user."""
+    if cached := not_modified(request, response, db, user_id):
+        return cached
     return db.get_tags(user_id)
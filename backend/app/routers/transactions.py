@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, Query
-from typing import Optional, List
-from pydantic import BaseModel, field_validator
 from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
 from app.auth import get_user_id
-from app.db import DB
-from app.models import Transaction
+from app.caching import not_modified
+from app.db import DB, TransactionFilter, get_db
+from app.export import EXPORT_BATCH_SIZE, PARQUET_AVAILABLE, csv_chunks, parquet_chunks
+from app.models import Asset, Counterparty, Details, Transaction, TransactionType
+from app.responses import FastJSONResponse
+from app.search import query_tokens
 
-db = DB.get_instance()
 router = APIRouter()
 
 
@@ -14,9 +19,9 @@ class TransactionBase(BaseModel):
     date: datetime
     amount: float
     merchant: str
-    category: Optional[str] = None
-    tags: Optional[List[str]] = []
-    notes: Optional[str] = None
+    category: str | None = None
+    tags: list[str] | None = []
+    notes: str | None = None
 
     @field_validator("tags", mode="before")
     @classmethod
@@ -33,9 +38,9 @@ class TransactionCreate(TransactionBase):
 
 
 class TransactionPatch(BaseModel):
-    category: Optional[str] = None
-    tags: Optional[List[str]] = None
-    notes: Optional[str] = None
+    category: str | None = None
+    tags: list[str] | None = None
+    notes: str | None = None
 
     @field_validator("tags", mode="before")
     @classmethod
@@ -47,70 +52,189 @@ class TransactionPatch(BaseModel):
         return value
 
 
-@router.get("", response_model=List[Transaction])
+class TransactionView(BaseModel):
+    """Sparse transaction: only the requested fields are present in the response."""
+
+    id: str | None = Field(default=None, alias="_id")
+    user_id: str | None = None
+    asset: Asset | None = None
+    counterparty: Counterparty | None = None
+    date: datetime | None = None
+    amount: float | None = None
+    transaction_type: TransactionType | None = None
+    description: str | None = None
+    goods_services: list[str] | None = None
+    category: str | None = None
+    tags: list[str] | None = None
+    note: str | None = None
+    details: Details | None = None
+    fingerprint: str | None = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+# Named field sets accepted by ``fields=``; anything else is a comma separated field list.
+FIELD_SETS: dict[str, list[str] | None] = {
+    # What the transactions table renders
+    "list": ["date", "amount", "transaction_type", "counterparty", "category", "tags", "note", "description"],
+    "detail": None,  # full document
+}
+TRANSACTION_FIELDS = set(Transaction.model_fields) - {"id"}
+
+
+def resolve_fields(fields: str | None, default: str) -> list[str] | None:
+    if fields is None:
+        fields = default
+    if fields in FIELD_SETS:
+        return FIELD_SETS[fields]
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(requested) - TRANSACTION_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+@router.get("", response_model=list[TransactionView], response_model_exclude_unset=True)
 def list_transactions(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
-    limit: int = Query(50, ge=1, le=500),
+    limit: int | None = Query(None, ge=1, le=500, description="Page size; without it every transaction is returned"),
+    fields: str | None = Query(None, description="'list', 'detail' or comma separated field names"),
     current_user: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
 ):
-    return db.get_transactions(current_user)
+    projection = resolve_fields(fields, default="list")
+    if cached := not_modified(request, response, db, current_user):
+        return cached
+    skip = (page - 1) * limit if limit else 0
+    # Documents come from our own DB already in TransactionView shape; skip re-validating
+    # thousands of rows through the response model and serialize them directly.
+    docs = db.find_transactions(current_user, projection, skip=skip, limit=limit)
+    return FastJSONResponse(docs, headers=response.headers)
 
 
-@router.get("/filter", response_model=List[Transaction])
+@router.get("/filter", response_model=list[Transaction])
 def filter_transactions(
-    merchant_contains: Optional[str] = None,
+    request: Request,
+    response: Response,
+    merchant_contains: str | None = None,
     current_user: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
 ):
-    # Simple filter implementation used by tests: filter by merchant substring
-    docs = db._transactions_collection.find({"user_id": __import__("bson").ObjectId(current_user)})
+    if cached := not_modified(request, response, db, current_user):
+        return cached
+    # Simple filter implementation used by tests: filter by counterparty substring
     results: list[Transaction] = []
-    for d in docs:
-        m = d.get("merchant", "")
-        if merchant_contains is None or merchant_contains.lower() in m.lower():
-            results.append(Transaction.model_validate(d))
+    for tx in db.get_transactions(current_user):
+        name = tx.counterparty_name or ""
+        if merchant_contains is None or merchant_contains.lower() in name.lower():
+            results.append(tx)
     return results
 
 
-@router.get("/{tx_id}", response_model=Transaction)
-def get_transaction(tx_id: str, current_user: str = Depends(get_user_id)):
-    tx = db.get_transaction(tx_id)
+@router.get("/search", response_model=list[TransactionView], response_model_exclude_unset=True)
+def search_transactions(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, description="Words matched by prefix; all must match"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    fields: str | None = Query(None, description="'list', 'detail' or comma separated field names"),
+    current_user: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
+):
+    projection = resolve_fields(fields, default="list")
+    if cached := not_modified(request, response, db, current_user):
+        return cached
+    docs = db.search_transactions(current_user, query_tokens(q), projection, skip=(page - 1) * limit, limit=limit)
+    return FastJSONResponse(docs, headers=response.headers)
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_transactions(
+    request: Request,
+    response: Response,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    category: str | None = None,
+    tags: str | None = Query(None, description="Comma separated; all required"),
+    amount_min: float | None = None,
+    amount_max: float | None = None,
+    current_user: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
+):
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+    if cached := not_modified(request, response, db, current_user):
+        return cached
+    filters = TransactionFilter(
+        date_from=date_from,
+        date_to=date_to,
+        category=category,
+        tags=[tag.strip() for tag in (tags or "").split(",") if tag.strip()],
+        amount_min=amount_min,
+        amount_max=amount_max,
+    )
+    batches = db.iter_transactions(current_user, filters, batch_size=EXPORT_BATCH_SIZE)
+    if format == "parquet":
+        body, media_type = parquet_chunks(batches), "application/vnd.apache.parquet"
+    else:
+        body, media_type = csv_chunks(batches), "text/csv; charset=utf-8"
+    headers = {**response.headers, "Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+@router.get("/{tx_id}", response_model=TransactionView, response_model_exclude_unset=True)
+def get_transaction(
+    tx_id: str,
+    request: Request,
+    response: Response,
+    fields: str | None = Query(None, description="'list', 'detail' or comma separated field names"),
+    current_user: str = Depends(get_user_id),
+    db: DB = Depends(get_db),
+):
+    projection = resolve_fields(fields, default="detail")
+    # Versions are per user, so a matching tag for this user means the document is unchanged too.
+    # A tag never matches another user's, so this cannot leak existence of foreign transactions.
+    if cached := not_modified(request, response, db, current_user):
+        return cached
+    # user_id is always read for the ownership check, but only returned when asked for
+    tx = db.find_transaction(tx_id, None if projection is None else [*projection, "user_id"])
     if not tx:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=404, detail="Transaction not found")
-    if tx.user_id != current_user:
-        from fastapi import HTTPException
-
+    if tx["user_id"] != current_user:
         raise HTTPException(status_code=403, detail="Not allowed")
+    if projection is not None and "user_id" not in projection:
+        del tx["user_id"]
     return tx
 
 
 @router.patch("/{tx_id}")
-def patch_transaction(tx_id: str, patch: TransactionPatch, current_user: str = Depends(get_user_id)):
+def patch_transaction(
+    tx_id: str, patch: TransactionPatch, current_user: str = Depends(get_user_id), db: DB = Depends(get_db)
+):
     update_data = {
         field_name: field_value
         for field_name, field_value in patch.model_dump(exclude_unset=True).items()
         if field_value is not None
     }
     if not update_data:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=400, detail="No fields to update")
+    # API field is "notes", the stored model field is "note"
+    if "notes" in update_data:
+        update_data["note"] = update_data.pop("notes")
 
     # Ensure transaction exists and belongs to current user
     tx = db.get_transaction(tx_id)
     if not tx:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=404, detail="Transaction not found")
     if tx.user_id != current_user:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    ok = db.update_transaction(tx_id, update_data)
+    # Goes through update_transaction so the user's data version is bumped like any other write
+    ok = db.update_transaction(tx_id, tx.model_copy(update=update_data))
     if not ok:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=404, detail="Transaction not found or not modified")
     return {"message": "Transaction updated"}
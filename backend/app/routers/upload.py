@@ -1,126 +1,225 @@
-"""CSV Upload Router.
+"""Statement upload router.
 
-Parses a CSV file and inserts transaction documents. Required columns:
-date, amount, merchant. Optional: category, tags, notes.
-Returns insertion summary + sample + per-row errors.
+``POST /upload-statement`` takes a ``multipart/form-data`` body with the
+statement in its ``file`` field. The body is parsed while it is received: bytes
+of the file part pass through a small bounded buffer straight into the import
+pipeline (format detection from the head of the file, streaming parser, the
+user's cached rules, batched inserts), so neither the request nor the statement
+is ever held in memory or spooled to disk as a whole.
+
+Rows that cannot be parsed are skipped and reported in ``errors``; rows already
+imported before are counted as ``skipped``.
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List, Optional
-from io import StringIO
-import csv
-from datetime import datetime
+import io
+
+import anyio
+import anyio.lowlevel
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
 from app.auth import get_user_id
-from app.db import DB
+from app.db import DB, get_db
+from app.importers.importer import Importer
+from app.importers.mbank import ParserError
+from app.rules.rule_engine import get_rule_engine
 
-db = DB.get_instance()
 router = APIRouter()
 
-# All transaction insertion now goes through db.insert_transaction
-
-
-REQUIRED_COLUMNS = {"date", "amount", "merchant"}
-OPTIONAL_COLUMNS = {"category", "tags", "notes"}
-ALL_COLUMNS = REQUIRED_COLUMNS.union(OPTIONAL_COLUMNS)
-
-
-def get_user_document(email: str):
-    try:
-        return db.get_user_id(email)
-    except ValueError:
-        raise HTTPException(status_code=401, detail="User not found")
-
-
-def parse_date(value: str) -> datetime:
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%Y/%m/%d"):
-        try:
-            return datetime.strptime(value.strip(), fmt)
-        except ValueError:
-            continue
-    raise ValueError(f"Unrecognized date format: {value}")
-
-
-def normalize_tags(raw_tags: Optional[str]):
-    if raw_tags is None or raw_tags.strip() == "":
-        return []
-    return [tag.strip() for tag in raw_tags.split(",") if tag.strip()]
-
-
-@router.post("")
-async def upload_statement(file: UploadFile = File(...), current_email: str = Depends(get_user_id)):
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only .csv files are supported")
-
-    user_document = get_user_document(current_email)
-
-    try:
-        raw_bytes = await file.read()
-        text = raw_bytes.decode("utf-8")
-    except Exception as exc:  # pragma: no cover
-        raise HTTPException(status_code=400, detail=f"Failed to read file: {exc}")
-
-    reader = csv.DictReader(StringIO(text))
-    header_columns = set(reader.fieldnames or [])
-    missing = REQUIRED_COLUMNS - header_columns
-    if missing:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Missing required columns: {', '.join(sorted(missing))}",
-        )
-
-    unexpected = header_columns - ALL_COLUMNS
-
-    inserted_documents: List[str] = []
-    skipped_rows: List[dict] = []
-    sample_rows: List[dict] = []
-
-    for row_index, csv_row in enumerate(reader, start=1):
-        try:
-            date_value = parse_date(csv_row.get("date", ""))
-            amount_raw = csv_row.get("amount", "").strip()
-            if amount_raw == "":
-                raise ValueError("amount empty")
-            amount_value = float(amount_raw)
-            merchant_value = csv_row.get("merchant", "").strip()
-            if merchant_value == "":
-                raise ValueError("merchant empty")
-            category_value = (csv_row.get("category") or None) or None
-            tags_value = normalize_tags(csv_row.get("tags")) if csv_row.get("tags") else []
-            notes_value = (csv_row.get("notes") or None) or None
-
-            document = {
-                "user_id": str(user_document["_id"]),
-                "date": date_value,
-                "amount": amount_value,
-                "merchant": merchant_value,
-                "category": category_value,
-                "tags": tags_value if tags_value else [],
-                "notes": notes_value,
-            }
-            inserted_id = db.insert_transaction_for_user(
-                str(user_document["_id"]), {k: v for k, v in document.items() if k != "user_id"}
-            )
-            inserted_documents.append(str(inserted_id))
-            if len(sample_rows) < 5:
-                sample_rows.append(
-                    {
-                        **{k: (str(v) if isinstance(v, datetime) else v) for k, v in document.items()},
-                        "_id": str(inserted_id),
-                    }
-                )
-        except Exception as row_exc:
-            skipped_rows.append(
-                {
-                    "row_index": row_index,
-                    "error": str(row_exc),
-                    "raw": {k: v for k, v in csv_row.items()},
-                }
-            )
-
-    return {
-        "inserted": len(inserted_documents),
-        "skipped": len(skipped_rows),
-        "unexpected_columns": sorted(list(unexpected)),
-        "sample": sample_rows,
-        "errors": skipped_rows,
-    }
+FILE_FIELD = b"file"
+UPLOAD_BUFFER_CHUNKS = 16  # received chunks waiting for the parser
+MAX_REPORTED_ERRORS = 100
+
+
+class RowError(BaseModel):
+    line: int
+    error: str
+
+
+class UploadResult(BaseModel):
+    format: str
+    inserted: int
+    skipped: int  # already imported
+    error_count: int
+    errors: list[RowError]  # the first MAX_REPORTED_ERRORS of them
+    warnings: list[str]  # e.g. rows missing between this statement and the previous import
+
+
+class UploadAborted(Exception):
+    """The request body ended before the file part was complete."""
+
+
+class UnsupportedFormat(Exception):
+    """No registered importer recognizes the file."""
+
+
+class _ErrorCollector:
+    def __init__(self):
+        self.count = 0
+        self.errors: list[RowError] = []
+
+    def __call__(self, line: int, exc: Exception) -> None:
+        self.count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line=line, error=str(exc)))
+
+
+class _ReceivedFile(io.RawIOBase):
+    """Blocking, read-only file over the chunks the request handler receives.
+
+    Read from the import pipeline's threads; every ``readinto`` that runs out of data
+    waits on the request's event loop for the next chunk.
+    """
+
+    def __init__(self, receive: MemoryObjectReceiveStream):
+        self._receive = receive
+        self._token = anyio.lowlevel.current_token()
+        self._chunk = memoryview(b"")
+        self.aborted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._chunk:
+            try:
+                self._chunk = memoryview(anyio.from_thread.run(self._receive.receive, token=self._token))
+            except anyio.EndOfStream:
+                if self.aborted:
+                    raise UploadAborted()
+                return 0
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+class _FilePartForwarder:
+    """Multipart callbacks that pick the bytes of the ``file`` field out of the body."""
+
+    def __init__(self):
+        self.headers: dict[bytes, bytes] = {}
+        self._field = self._value = b""
+        self.in_file = False
+        self.found = False
+        self.chunks: list[bytes] = []
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def on_headers_finished(self) -> None:
+        _, params = parse_options_header(self.headers.get(b"content-disposition", b""))
+        # Only the first file part is imported
+        self.in_file = not self.found and params.get(b"name") == FILE_FIELD
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.in_file:
+            self.chunks.append(bytes(data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self.in_file:
+            self.found, self.in_file = True, False
+
+
+async def _forward_file_part(request: Request, boundary: bytes, send: MemoryObjectSendStream) -> bool:
+    """Feed the ``file`` part of the body to ``send`` as it arrives; returns whether it was found."""
+    forwarder = _FilePartForwarder()
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": forwarder.on_part_begin,
+            "on_header_field": forwarder.on_header_field,
+            "on_header_value": forwarder.on_header_value,
+            "on_header_end": forwarder.on_header_end,
+            "on_headers_finished": forwarder.on_headers_finished,
+            "on_part_data": forwarder.on_part_data,
+            "on_part_end": forwarder.on_part_end,
+        },
+    )
+    async for chunk in request.stream():
+        parser.write(chunk)
+        for data in forwarder.chunks:
+            await send.send(data)  # waits while the buffer is full
+        forwarder.chunks.clear()
+    parser.finalize()
+    return forwarder.found
+
+
+def _import_file(db: DB, user_id: str, file: _ReceivedFile, errors: _ErrorCollector) -> UploadResult:
+    importer = Importer(user_id, rule_engine=get_rule_engine(user_id, db), db=db)
+    with io.TextIOWrapper(io.BufferedReader(file), encoding="utf-8") as stream:
+        plugin, lines = importer.detect_stream(stream)
+        if plugin is None:
+            raise UnsupportedFormat()
+        result = importer.import_lines(plugin, lines, on_error=errors)
+    return UploadResult(
+        format=plugin.name,
+        inserted=result.inserted,
+        skipped=result.skipped,
+        error_count=errors.count,
+        errors=errors.errors,
+        warnings=result.warnings,
+    )
+
+
+@router.post("", response_model=UploadResult)
+async def upload_statement(request: Request, user_id: str = Depends(get_user_id), db: DB = Depends(get_db)):
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body with a 'file' field")
+
+    send, receive = anyio.create_memory_object_stream[bytes](UPLOAD_BUFFER_CHUNKS)
+    file = _ReceivedFile(receive)
+    errors = _ErrorCollector()
+    outcome: dict[str, object] = {}
+
+    async def run_import():
+        # Closing ``receive`` when the import ends stops the forwarding below
+        with receive:
+            try:
+                outcome["result"] = await anyio.to_thread.run_sync(_import_file, db, user_id, file, errors)
+            except Exception as exc:
+                outcome["error"] = exc
+
+    found = False
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(run_import)
+        with send:
+            try:
+                found = await _forward_file_part(request, params[b"boundary"], send)
+            except anyio.BrokenResourceError:
+                found = True  # the import finished or failed without reading everything
+            except Exception as exc:  # malformed body or client gone
+                file.aborted = True  # keeps a truncated file from being imported as complete
+                outcome["receive_error"] = exc
+
+    receive_error = outcome.get("receive_error")
+    if isinstance(receive_error, MultipartParseError):
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {receive_error}")
+    if receive_error is not None:
+        raise receive_error
+    error = outcome.get("error")
+    if not found:
+        raise HTTPException(status_code=400, detail="No 'file' field in the upload")
+    if isinstance(error, UnsupportedFormat):
+        raise HTTPException(status_code=400, detail="Unrecognized statement format")
+    if isinstance(error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Statement is not valid UTF-8")
+    if isinstance(error, ParserError):
+        raise HTTPException(status_code=400, detail=str(error))
+    if error is not None:
+        raise error
+    return outcome["result"]
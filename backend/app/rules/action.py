@@ -1,4 +1,7 @@
-from app.models import Transaction
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.models import Transaction
 
 
 class Action:
@@ -6,7 +9,7 @@ class Action:
         self.category = category
         self.tags = tags
 
-    def apply(self, transaction: Transaction):
+    def apply(self, transaction: "Transaction"):
         if self.category:
             transaction.category = self.category
 
@@ -1,4 +1,9 @@
-from app.models import Transaction
+from typing import TYPE_CHECKING
+
+if (
+    TYPE_CHECKING
+):  # annotations only: the rule parser and its CLI do not import pydantic
+    from app.models import Transaction
 
 
 class Condition:
@@ -19,13 +24,13 @@ class Condition:
     def value(self) -> str | float | int:
         return self._value
 
-    def _field_value(self, transaction: Transaction):
+    def _field_value(self, transaction: "Transaction"):
         if hasattr(transaction, self._field):
             return getattr(transaction, self._field, None)
         else:
             raise ValueError(f"Unsupported field: {self._field}")
 
-    def evaluate(self, transaction: Transaction) -> bool:
+    def evaluate(self, transaction: "Transaction") -> bool:
         field_value = self._field_value(transaction)
         if field_value is None:
             return False
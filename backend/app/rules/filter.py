@@ -1,5 +1,8 @@
+from typing import TYPE_CHECKING
 from .condition import Condition
-from app.models import Transaction
+
+if TYPE_CHECKING:
+    from app.models import Transaction
 
 ALLOWED_FIELDS = {"merchant", "amount", "notes", "category", "tags"}
 ALLOWED_OPERATORS = {"==", "contains", ">", ">=", "<", "<="}
@@ -21,7 +24,7 @@ class Filter:
     def logical_operator(self) -> str:
         return self._logical_operator
 
-    def matches(self, transaction: Transaction) -> bool:
+    def matches(self, transaction: "Transaction") -> bool:
         if self._logical_operator == "AND":
             return all(condition.evaluate(transaction) for condition in self._conditions)
         if self._logical_operator == "OR":
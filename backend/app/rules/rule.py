@@ -1,6 +1,9 @@
+from typing import TYPE_CHECKING
 from app.rules.action import Action
 from app.rules.filter import Filter
-from app.models import Transaction
+
+if TYPE_CHECKING:
+    from app.models import Transaction
 
 
 class Rule:
@@ -17,7 +20,7 @@ class Rule:
     def action(self) -> Action:
         return self._action
 
-    def evaluate(self, transaction: Transaction):
+    def evaluate(self, transaction: "Transaction"):
         if self._filter.matches(transaction):
             self._action.apply(transaction)
             return True
@@ -1,31 +1,157 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
 from app.models import Transaction
 from app.db import DB
+from app.metrics import Counter, Histogram
 from app.rules.rule import Rule
 from app.rules.parser import parse_rule
 
-db = DB.get_instance()
 logger = logging.getLogger(__name__)
 
+RULE_ENGINE_CACHE_SIZE = 128
+# With RuleStats, every n-th transaction is timed rule by rule; the rest run untimed
+RULE_TIMING_SAMPLE = 16
+
+RULES_LOADED = Counter(
+    "rule_engine_rules_loaded_total", "Active rules parsed into rule engines"
+)
+RULE_ENGINE_LOAD = Histogram(
+    "rule_engine_load_seconds", "Time to load and parse a user's rules"
+)
+RULE_ENGINE_CACHE = Counter(
+    "rule_engine_cache_total", "get_rule_engine lookups by outcome", ("result",)
+)
+TRANSACTIONS_EVALUATED = Counter(
+    "rule_engine_transactions_evaluated_total", "Transactions run through the rules"
+)
+RULE_EVALUATION = Histogram(
+    "rule_engine_evaluation_seconds", "Time of one apply_rules call"
+)
+
+
+class RuleStats:
+    """Matches per rule and an estimate of the time spent in each, over ``apply_rules`` calls."""
+
+    def __init__(self, rules: list[Rule]):
+        self.rules = rules
+        self.matches = [0] * len(rules)
+        self.sampled_seconds = [0.0] * len(rules)
+        self.evaluated = 0  # transactions
+        self.sampled = 0  # transactions that were timed
+        self.matched = 0  # transactions at least one rule matched
+
+    def slowest(self, limit: int = 5) -> list[dict]:
+        scale = self.evaluated / self.sampled if self.sampled else 0
+        ranked = sorted(
+            range(len(self.rules)),
+            key=lambda idx: self.sampled_seconds[idx],
+            reverse=True,
+        )
+        return [
+            {
+                "rule": str(self.rules[idx]),
+                "seconds": round(self.sampled_seconds[idx] * scale, 4),
+                "matches": self.matches[idx],
+            }
+            for idx in ranked[:limit]
+        ]
+
 
 class RuleEngine:
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, db: DB | None = None):
         self._user_id = user_id  # stored as string externally
-        self._rules: list[Rule] = self._load_rules()
+        self._rules: list[Rule] = self._load_rules(db or DB.get_instance())
+
+    @property
+    def rule_count(self) -> int:
+        return len(self._rules)
 
-    def _load_rules(self) -> list[Rule]:
-        docs = db.get_rules(self._user_id)
-        if not docs:
-            return []
+    def new_stats(self) -> RuleStats:
+        return RuleStats(self._rules)
 
-        rules = [parse_rule(r.rule) for r in docs if r.active]
+    def _load_rules(self, db: DB) -> list[Rule]:
+        with RULE_ENGINE_LOAD.time():
+            docs = db.get_rules(self._user_id)
+            if not docs:
+                return []
+
+            rules = [parse_rule(r.rule) for r in docs if r.active]
+        RULES_LOADED.inc(amount=len(rules))
         return rules
 
-    def apply_rules(self, transactions: list[Transaction]) -> list[Transaction]:
+    def apply_rules(
+        self, transactions: list[Transaction], stats: RuleStats | None = None
+    ) -> list[Transaction]:
+        start = time.perf_counter()
         modified_transactions = []
-        for transaction in transactions:
-            for rule in self._rules:
-                if rule.evaluate(transaction):
-                    modified_transactions.append(transaction)
+        if stats is not None:
+            self._apply_counted(transactions, stats, modified_transactions)
+        else:
+            for transaction in transactions:
+                for rule in self._rules:
+                    if rule.evaluate(transaction):
+                        modified_transactions.append(transaction)
 
+        # Once per call; the loop above is the hot path
+        RULE_EVALUATION.observe(value=time.perf_counter() - start)
+        TRANSACTIONS_EVALUATED.inc(amount=len(transactions))
         return modified_transactions
+
+    def _apply_counted(
+        self,
+        transactions: list[Transaction],
+        stats: RuleStats,
+        modified: list[Transaction],
+    ) -> None:
+        matches = stats.matches
+        for transaction in transactions:
+            before = len(modified)
+            if stats.evaluated % RULE_TIMING_SAMPLE == 0:
+                stats.sampled += 1
+                for idx, rule in enumerate(self._rules):
+                    rule_start = time.perf_counter()
+                    matched = rule.evaluate(transaction)
+                    stats.sampled_seconds[idx] += time.perf_counter() - rule_start
+                    if matched:
+                        matches[idx] += 1
+                        modified.append(transaction)
+            else:
+                for idx, rule in enumerate(self._rules):
+                    if rule.evaluate(transaction):
+                        matches[idx] += 1
+                        modified.append(transaction)
+            stats.evaluated += 1
+            if len(modified) > before:
+                stats.matched += 1
+
+
+# user id -> (data version the rules were loaded at, engine), least recently used first
+_engines: OrderedDict[str, tuple[int, RuleEngine]] = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def get_rule_engine(user_id: str, db: DB | None = None) -> RuleEngine:
+    """Shared engine for the user's active rules.
+
+    The engine is reused until the user's data version changes. The version also moves on
+    transaction writes, so an import causes one extra reload, but a changed rule is never missed.
+    """
+    db = db or DB.get_instance()
+    version = db.get_data_version(user_id)
+    with _engines_lock:
+        cached = _engines.get(user_id)
+        if cached is not None and cached[0] == version:
+            _engines.move_to_end(user_id)
+            RULE_ENGINE_CACHE.inc("hit")
+            return cached[1]
+
+    RULE_ENGINE_CACHE.inc("miss")
+    engine = RuleEngine(user_id, db)
+    with _engines_lock:
+        _engines[user_id] = (version, engine)
+        _engines.move_to_end(user_id)
+        while len(_engines) > RULE_ENGINE_CACHE_SIZE:
+            _engines.popitem(last=False)
+    return engine
@@ -1,31 +1,31 @@
-"""Import textual rules for a user into single UserRules document.
+"""Import textual rules for a user.
 
 Usage examples:
-    python -m app.scripts.import_rules --user-email user@example.com --file rules.txt
-    python -m app.scripts.import_rules --user-email user@example.com --rule 'merchant contains Coffee -> @coffee #caffeinated'
-    cat rules.txt | python -m app.scripts.import_rules --user-email user@example.com --append
+    python -m app.scripts.import_rules --user alice --file rules.txt
+    cat rules.txt | python -m app.scripts.import_rules --user alice --dry-run
+    python -m app.scripts.import_rules --user alice --file rules.txt --profile import_rules.collapsed
 
 Behavior:
-  * Reads rules from --rule flags, a file, stdin, or any combination.
-  * Validates each rule using Filter.parse.
-  * Stores/updates a single document in collection 'user_rules':
-        { user_id: <ObjectId>, rules: [ {rule: <string>, name: <optional>, active: true}, ... ] }
-  * By default replaces existing rules. Pass --append to extend instead.
-  * --dry-run shows the resulting document without writing.
+  * Reads rules from --file, or from stdin without it.
+  * Validates each rule with the rule parser; an invalid rule aborts before anything is stored.
+  * Adds every rule as an active rule of the user.
+  * --dry-run prints the parsed rules without writing.
+  * --profile writes a sampling profile of the run (collapsed stacks, see app.profiling).
 
 Lines beginning with '#' or blank lines are ignored when reading from file/stdin.
 """
 
 import argparse
+import sys
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Iterable
 
+from app import profiling
 from app.db import DB
 from app.rules.parser import parse_rule
 from app.rules.rule import Rule
-from app.models import User, RuleDB
-
-db = DB.get_instance()
+from app.models import RuleDB
 
 
 def read_rules_from_file(file_path: Path) -> list[str]:
@@ -49,12 +49,11 @@ def validate_rules(raw_lines: Iterable[str]) -> list[Rule]:
     return parsed
 
 
-def import_user_rules(user: str, rules: list[Rule], dry_run: bool):
+def import_user_rules(db: DB, user: str, rules: list[Rule], dry_run: bool):
     try:
-        user_doc = db.get_user_id(user)
+        user = db.get_user(user)
     except ValueError:
         raise SystemExit(f"User '{user}' not found")
-    user = User.model_validate(user_doc)
 
     if dry_run:
         print("Dry run - would insert the following rules:")
@@ -65,18 +64,21 @@ def import_user_rules(user: str, rules: list[Rule], dry_run: bool):
     for r in rules:
         rule_doc = RuleDB(user_id=user.id, rule=str(r), active=True)
         db.add_rule(user.id, rule_doc, priority=0)
-    print(f"Inserted {len(rules)} rules for user {user}")
+    print(f"Inserted {len(rules)} rules for user {user.username}")
 
 
 def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="Import textual rules for a user")
     parser.add_argument("--user", required=True)
-    parser.add_argument("--file", type=Path, help="File containing rule lines (defaults to stdin if piped)")
+    parser.add_argument("--file", type=Path, help="File containing rule lines (defaults to stdin)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the parsed rules without storing them")
+    parser.add_argument("--profile", type=Path, help="Write a sampling profile (collapsed stacks) to this file")
     args = parser.parse_args(argv)
 
-    raw_lines = read_rules_from_file(args.file)
-    parsed_rules = validate_rules(raw_lines)
-    import_user_rules(args.user, parsed_rules, dry_run=args.dry_run)
+    with profiling.profile_to(args.profile) if args.profile else nullcontext():
+        raw_lines = read_rules_from_file(args.file) if args.file else sys.stdin.readlines()
+        parsed_rules = validate_rules(raw_lines)
+        import_user_rules(DB.get_instance(), args.user, parsed_rules, dry_run=args.dry_run)
 
 
 if __name__ == "__main__":  # pragma: no cover
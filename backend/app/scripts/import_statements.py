@@ -1,25 +1,188 @@
+"""Import bank statement files, in parallel.
+
+Usage examples:
+    python -m app.scripts.import_statements --username alice statements/2024-08.csv
+    python -m app.scripts.import_statements --username alice 'exports/**/*.csv' --workers 4
+    python -m app.scripts.import_statements exports/          # exports/<username>/*.csv
+
+Behavior:
+  * Paths may be files, directories (searched recursively for *.csv) or glob patterns.
+  * Without --username every file is imported for the user named after its parent directory.
+  * Files are imported by a pool of --workers processes (0 imports in this process).
+    Each worker loads a user's rules once and reuses them for all of that user's files;
+    transactions are inserted in batches by the streaming importer. Rows of an account
+    that earlier imports already covered are skipped without being parsed.
+  * A failing file is reported in the summary and does not stop the others; the exit
+    status is 1 if any file failed. Batches inserted before the failure are kept and
+    skipped as duplicates when the file is imported again.
+  * --profile PATH writes a sampling profile of the run (collapsed stacks, see app.profiling).
+    Only this process is sampled, so profiled runs import inline.
+"""
+
 import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from multiprocessing import get_context
 from pathlib import Path
 
+from app import profiling
 from app.db import DB
-from app.importers.importer import Importer
+from app.importers.importer import Importer, ProgressCallback
+from app.rules.rule_engine import RuleEngine
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@dataclass
+class FileSummary:
+    path: str
+    username: str
+    inserted: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return self.inserted + self.duplicates
+
+
+# Per worker process: rule engines keyed by user id, loaded on first use
+_rule_engines: dict[str, RuleEngine] = {}
+
+
+def print_progress(processed: int, total: int | None) -> None:
+    print(f"\r{processed} rows processed", end="", file=sys.stderr, flush=True)
+
+
+def import_file(path: str, username: str, user_id: str, progress: ProgressCallback | None = None) -> FileSummary:
+    """Import one file; runs inside a pool worker (or inline) and never raises."""
+    summary = FileSummary(path=path, username=username)
+    start = time.perf_counter()
+    try:
+        if user_id not in _rule_engines:
+            _rule_engines[user_id] = RuleEngine(user_id=user_id)
+        with open(path, "r", encoding="utf-8") as file:
+            result = Importer(user_id, rule_engine=_rule_engines[user_id]).import_from_stream(file, progress)
+        summary.inserted, summary.duplicates = result.inserted, result.skipped
+        summary.warnings = result.warnings
+    except Exception as exc:  # noqa: BLE001 - reported per file, the run goes on
+        summary.error = f"{type(exc).__name__}: {exc}"
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+def expand_paths(patterns: list[str]) -> tuple[list[Path], list[str]]:
+    """Return matching files (deduplicated, in order) and the patterns that matched nothing."""
+    files: dict[Path, None] = {}
+    unmatched = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(p for p in path.rglob("*.csv") if p.is_file())
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+        if not matches:
+            unmatched.append(pattern)
+        files.update(dict.fromkeys(matches))
+    return list(files), unmatched
+
+
+def resolve_users(files: list[Path], username: str | None) -> dict[str, str | None]:
+    """Map every username involved to its user id (None when the user does not exist)."""
+    db = DB.get_instance()
+    user_ids: dict[str, str | None] = {}
+    for name in {username or file.parent.name for file in files}:
+        try:
+            user_ids[name] = db.get_user(name).id
+        except ValueError:
+            user_ids[name] = None
+    return user_ids
+
+
+def run_imports(files: list[Path], username: str | None, workers: int) -> list[FileSummary]:
+    user_ids = resolve_users(files, username)
+    summaries: list[FileSummary | None] = [None] * len(files)
+    tasks: list[tuple[int, str, str, str]] = []
+    for idx, file in enumerate(files):
+        name = username or file.parent.name
+        if user_ids[name] is None:
+            summaries[idx] = FileSummary(path=str(file), username=name, error=f"User '{name}' not found")
+        else:
+            tasks.append((idx, str(file), name, user_ids[name]))
+
+    if workers <= 0:
+        for idx, path, name, user_id in tasks:
+            summaries[idx] = import_file(path, name, user_id, progress=print_progress)
+            print(file=sys.stderr)
+    else:
+        # spawn: every worker opens its own DB connection on first use instead of inheriting the parent's
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures: dict[int, Future] = {
+                idx: pool.submit(import_file, path, name, user_id) for idx, path, name, user_id in tasks
+            }
+            for idx, path, name, _ in tasks:
+                try:
+                    summaries[idx] = futures[idx].result()
+                except Exception as exc:  # noqa: BLE001 - e.g. a worker process died
+                    summaries[idx] = FileSummary(path=path, username=name, error=f"{type(exc).__name__}: {exc}")
+    return [summary for summary in summaries if summary is not None]
 
-db = DB.get_instance()
 
+def print_summary(summaries: list[FileSummary], elapsed: float) -> None:
+    width = max([len(s.path) for s in summaries] + [4])
+    columns = "{:<{width}}  {:<16}{:>8}{:>10}{:>12}{:>9}  {}"
+    print(columns.format("file", "user", "rows", "inserted", "duplicates", "seconds", "status", width=width))
+    for s in summaries:
+        status = f"FAILED {s.error}" if s.error else ("ok" if s.rows else "no transactions")
+        print(
+            columns.format(
+                s.path, s.username, s.rows, s.inserted, s.duplicates, f"{s.seconds:.2f}", status, width=width
+            )
+        )
+    for s in summaries:
+        for warning in s.warnings:
+            print(f"warning: {s.path}: {warning}")
+    failed = sum(1 for s in summaries if s.error)
+    print(
+        f"\n{len(summaries)} files, {sum(s.rows for s in summaries)} rows, "
+        f"{sum(s.inserted for s in summaries)} inserted, {sum(s.duplicates for s in summaries)} duplicates, "
+        f"{failed} failed in {elapsed:.2f}s"
+    )
 
-def main():  # pragma: no cover - utility script
-    parser = argparse.ArgumentParser(description="Import bank statements into MongoDB")
-    parser.add_argument("--username", required=True, help="User to associate transactions with")
-    parser.add_argument("--file", type=Path, required=True, help="Statement file path (CSV export)")
-    args = parser.parse_args()
 
-    user = db.get_user(args.username)
-    importer = Importer(user.id)
-    transaction_count = importer.import_from_file(args.file)
+def main(argv: list[str] | None = None):  # pragma: no cover - utility script
+    parser = argparse.ArgumentParser(description="Import bank statements")
+    parser.add_argument("paths", nargs="*", help="Statement files, directories or glob patterns")
+    parser.add_argument("--file", action="append", default=[], help="Statement file (same as a positional path)")
+    parser.add_argument("--username", help="User for all files (default: name of each file's parent directory)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes, 0 runs inline")
+    parser.add_argument("--profile", type=Path, help="Write a sampling profile (collapsed stacks) to this file")
+    args = parser.parse_args(argv)
+    if args.profile and args.workers > 0:
+        print("--profile: importing in this process (--workers 0)", file=sys.stderr)
+        args.workers = 0
 
-    print(f"Imported {transaction_count} transactions for user {args.username}")
+    files, unmatched = expand_paths(args.paths + args.file)
+    for pattern in unmatched:
+        print(f"No statement files match '{pattern}'", file=sys.stderr)
+    if not files:
+        raise SystemExit(1)
 
-    # Placeholder: additional post-import processing could go here
+    start = time.perf_counter()
+    with profiling.profile_to(args.profile) if args.profile else nullcontext():
+        summaries = run_imports(files, args.username, args.workers)
+    print_summary(summaries, time.perf_counter() - start)
+    if unmatched or any(s.error for s in summaries):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,10 @@
+from app.db import DB
+
+
+def main():  # pragma: no cover - utility script
+    count = DB.get_instance().reindex_search()
+    print(f"Rebuilt search tokens of {count} transactions")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,40 @@
+"""Token normalization for transaction search.
+
+Both storage backends keep a per-transaction list of normalized tokens built from
+the counterparty name, description, note and ``details.location``. Queries are
+tokenized the same way; every query token must prefix-match a stored token.
+Results where every query token is a whole stored word rank first, prefix-only
+matches after them, newest first within each group.
+"""
+
+import re
+import unicodedata
+
+from app.models import Transaction
+
+_TOKEN_RE = re.compile(r"\w+")
+# Longer queries do not narrow results meaningfully and only cost index lookups
+MAX_QUERY_TOKENS = 8
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Split text into casefolded, diacritic-free word tokens ("Alexovič" -> "alexovic")."""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(stripped.casefold())
+
+
+def transaction_tokens(tx: Transaction) -> list[str]:
+    """Sorted distinct search tokens of a transaction."""
+    location = tx.details.location if tx.details else None
+    tokens: set[str] = set()
+    for text in (tx.counterparty_name, tx.description, tx.note, location):
+        tokens.update(tokenize(text))
+    return sorted(tokens)
+
+
+def query_tokens(query: str) -> list[str]:
+    """Distinct query tokens in input order, capped at ``MAX_QUERY_TOKENS``."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
@@ -0,0 +1 @@
+"""Storage backends implementing the ``app.db.DB`` interface."""
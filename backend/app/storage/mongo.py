@@ -0,0 +1,523 @@
+"""MongoDB storage backend (also used with mongomock in tests)."""
+
+import logging
+import re
+import threading
+from collections.abc import Iterator
+from datetime import UTC, datetime
+
+from pymongo import ASCENDING, MongoClient, ReturnDocument, monitoring
+from pymongo.errors import BulkWriteError
+
+from app.db import DB, TransactionFilter, to_oid
+from app.logging import RateLimitedLog
+from app.metrics import Counter, Histogram
+from app.models import ImportMark, Job, JobStatus, RuleDB, Transaction, User
+from app.search import transaction_tokens
+from app.storage.slow_queries import SlowQueryLog
+
+logger = logging.getLogger(__name__)
+# update_transaction runs once per transaction when rules are applied
+_transaction_log = RateLimitedLog(logger)
+
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command round trips",
+    ("collection", "command"),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command")
+)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command the client sends, by collection and command name."""
+
+    def __init__(self):
+        # request id -> collection; the finished events do not carry the command any more
+        self._collections: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # {"find": "rules", ...}; getMore names its collection separately, admin commands none
+        target = event.command.get(event.command_name)
+        collection = (
+            target if isinstance(target, str) else event.command.get("collection", "")
+        )
+        with self._lock:
+            self._collections[event.request_id] = collection
+
+    def _collection(self, event) -> str:
+        with self._lock:
+            return self._collections.pop(event.request_id, "")
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGO_COMMAND_DURATION.observe(
+            self._collection(event),
+            event.command_name,
+            value=event.duration_micros / 1_000_000,
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection = self._collection(event)
+        MONGO_COMMAND_DURATION.observe(
+            collection, event.command_name, value=event.duration_micros / 1_000_000
+        )
+        MONGO_COMMAND_FAILURES.inc(collection, event.command_name)
+
+
+def get_mongo_client(mongo_uri: str):
+    # For tests we optionally allow an in-memory mongomock fallback
+    # (triggered by MONGO_URI starting with "mongomock://").
+    if mongo_uri.startswith("mongomock://"):
+        # Lazy import so production deployments do not require mongomock.
+        import mongomock  # type: ignore
+
+        logger.info("Using mongomock MongoDB client for testing")
+        return mongomock.MongoClient()
+    else:
+        logger.info("Connected to MongoDB at %s", mongo_uri)
+        slow_queries = SlowQueryLog.get_instance()
+        client = MongoClient(
+            mongo_uri, event_listeners=[CommandMetrics(), slow_queries]
+        )
+        slow_queries.attach(client)
+        return client
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _projection(fields: list[str] | None) -> dict:
+    if fields is None:
+        # Search tokens are an index detail, never part of the API document; older versions of
+        # update_transaction also stored a copy of the id under "id"
+        return {"search_tokens": False, "id": False}
+    return {field: True for field in fields}
+
+
+def _range(low, high) -> dict:
+    bounds = {}
+    if low is not None:
+        bounds["$gte"] = low
+    if high is not None:
+        bounds["$lte"] = high
+    return bounds
+
+
+def _filter_query(filters: TransactionFilter) -> dict:
+    query: dict = {}
+    if dates := _range(filters.date_from, filters.date_to):
+        query["date"] = dates
+    if amounts := _range(filters.amount_min, filters.amount_max):
+        query["amount"] = amounts
+    if filters.category is not None:
+        query["category"] = filters.category
+    if filters.tags:
+        query["tags"] = {"$all": filters.tags}
+    return query
+
+
+def _stringify_ids(doc: dict) -> dict:
+    doc["_id"] = str(doc["_id"])
+    if "user_id" in doc:
+        doc["user_id"] = str(doc["user_id"])
+    return doc
+
+
+class MongoDB(DB):
+    def __init__(self, mongo_uri: str, db_name: str):
+        mongo_client = get_mongo_client(mongo_uri)
+        self._db = mongo_client[db_name]
+        # Private collections
+        self._users_collection = self._db["users"]
+        self._transactions_collection = self._db["transactions"]
+        self._rules_collection = self._db["rules"]
+        self._jobs_collection = self._db["jobs"]
+        self._import_marks_collection = self._db["import_marks"]
+        self._data_versions_collection = self._db["data_versions"]
+        self._ensure_indexes()
+        logger.info("Database initialized: %s", self._db.name)
+
+    def _ensure_indexes(self):
+        # Imported transactions carry a fingerprint; manually inserted ones may not,
+        # so uniqueness is only enforced where the field is present.
+        self._transactions_collection.create_index(
+            [("user_id", ASCENDING), ("fingerprint", ASCENDING)],
+            name="user_fingerprint_unique",
+            unique=True,
+            partialFilterExpression={"fingerprint": {"$type": "string"}},
+        )
+        # Date ordered reads (exports) and date range filters
+        self._transactions_collection.create_index(
+            [("user_id", ASCENDING), ("date", ASCENDING)], name="user_date"
+        )
+        # Multikey index: anchored prefix regexes on search_tokens become index range scans
+        self._transactions_collection.create_index(
+            [("user_id", ASCENDING), ("search_tokens", ASCENDING)],
+            name="user_search_tokens",
+        )
+        self._import_marks_collection.create_index(
+            [("user_id", ASCENDING), ("iban", ASCENDING)],
+            name="user_iban_unique",
+            unique=True,
+        )
+
+    def get_data_version(self, user_id: str) -> int:
+        doc = self._data_versions_collection.find_one({"_id": to_oid(user_id)})
+        return doc["version"] if doc else 0
+
+    def _bump_data_version(self, user_oid) -> None:
+        self._data_versions_collection.update_one(
+            {"_id": user_oid}, {"$inc": {"version": 1}}, upsert=True
+        )
+
+    def get_user(self, username: str) -> User:
+        user_doc = self._users_collection.find_one({"username": username})
+        if not user_doc:
+            raise ValueError(f"User '{username}' not found")
+        return User.model_validate(user_doc)
+
+    def create_user(self, user: User) -> str:
+        res = self._users_collection.insert_one(user.model_dump(exclude_none=True))
+        return str(res.inserted_id)
+
+    def update_user(self, user_id: str, update_data: dict) -> bool:
+        res = self._users_collection.update_one(
+            {"_id": to_oid(user_id)}, {"$set": update_data}
+        )
+        return res.modified_count > 0
+
+    def get_rules(self, user_id: str) -> list[RuleDB]:
+        # Return all rule documents for a user
+        docs = self._rules_collection.find({"user_id": to_oid(user_id)})
+        rules = [RuleDB.model_validate(doc) for doc in docs]
+        return rules
+
+    def add_rule(self, user_id: str, rule, priority: int = 0):
+        if hasattr(rule, "model_dump"):
+            doc = rule.model_dump(exclude_none=True)
+        elif isinstance(rule, dict):
+            doc = dict(rule)
+        else:
+            raise ValueError("rule must be RuleDB or dict")
+
+        # ensure user_id stored as ObjectId
+        doc["user_id"] = to_oid(user_id)
+        res = self._rules_collection.insert_one(doc)
+        self._bump_data_version(doc["user_id"])
+        return str(res.inserted_id)
+
+    def get_rule(self, rule_id: str) -> RuleDB | None:
+        doc = self._rules_collection.find_one({"_id": to_oid(rule_id)})
+        if not doc:
+            return None
+        return RuleDB.model_validate(doc)
+
+    def update_rule(self, rule_id: str, update_data: dict) -> bool:
+        # Convert user-provided id fields if present
+        if "user_id" in update_data:
+            update_data["user_id"] = to_oid(update_data["user_id"])
+        res = self._rules_collection.update_one(
+            {"_id": to_oid(rule_id)}, {"$set": update_data}
+        )
+        if res.modified_count:
+            doc = self._rules_collection.find_one(
+                {"_id": to_oid(rule_id)}, {"user_id": True}
+            )
+            self._bump_data_version(doc["user_id"])
+        return res.modified_count > 0
+
+    def delete_rule(self, rule_id: str) -> bool:
+        doc = self._rules_collection.find_one_and_delete(
+            {"_id": to_oid(rule_id)}, projection={"user_id": True}
+        )
+        if doc:
+            self._bump_data_version(doc["user_id"])
+        return doc is not None
+
+    def get_transaction(self, tx_id: str) -> Transaction | None:
+        doc = self._transactions_collection.find_one({"_id": to_oid(tx_id)})
+        if not doc:
+            return None
+        return Transaction.model_validate(doc)
+
+    def get_categories(self, user: str) -> list[str]:
+        docs = self._transactions_collection.distinct(
+            "category", {"user_id": to_oid(user)}
+        )
+        # Filter out empty/null and ensure strings
+        cats: list[str] = []
+        for c in docs:
+            if c is None:
+                continue
+            s = str(c).strip()
+            if s:
+                cats.append(s)
+        return sorted(set(cats))
+
+    def get_tags(self, user: str) -> list[str]:
+        # Use aggregation to unwind tags array and get distinct values in case of nested arrays
+        pipeline = [
+            {"$match": {"user_id": to_oid(user)}},
+            {"$unwind": {"path": "$tags", "preserveNullAndEmptyArrays": False}},
+            {"$group": {"_id": None, "tags": {"$addToSet": "$tags"}}},
+        ]
+        res = list(self._transactions_collection.aggregate(pipeline))
+        if not res:
+            return []
+        tags = res[0].get("tags", []) or []
+        # normalize to strings, strip and filter empties
+        normalized = [str(t).strip() for t in tags if t is not None and str(t).strip()]
+        return sorted(set(normalized))
+
+    def insert_transactions(self, transactions: list[Transaction]) -> list[str]:
+        docs = []
+        for tx in transactions:
+            doc = tx.model_dump(exclude_none=True)
+            doc["user_id"] = to_oid(tx.user_id)
+            doc["search_tokens"] = transaction_tokens(tx)
+            docs.append(doc)
+
+        if not docs:
+            return []
+        logger.info("Inserting %d transactions", len(docs))
+        # Unordered so one duplicate fingerprint does not stop the rest of the batch;
+        # insert_many assigns _id to every doc in place before sending.
+        try:
+            self._transactions_collection.insert_many(docs, ordered=False)
+            failed: set[int] = set()
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            failed = {err["index"] for err in errors}
+        inserted = [
+            str(doc["_id"]) for idx, doc in enumerate(docs) if idx not in failed
+        ]
+        for user_oid in {
+            doc["user_id"] for idx, doc in enumerate(docs) if idx not in failed
+        }:
+            self._bump_data_version(user_oid)
+        logger.info(
+            "Inserted %d transactions, skipped %d duplicates",
+            len(inserted),
+            len(failed),
+        )
+        return inserted
+
+    def update_transaction(self, tx_id: str, transaction: Transaction) -> bool:
+        _transaction_log.debug(
+            "Updating transaction %s with data: %s", tx_id, transaction
+        )
+        tx_doc = transaction.model_dump(exclude_none=True, exclude={"id"})
+        tx_doc["user_id"] = to_oid(transaction.user_id)
+        tx_doc["search_tokens"] = transaction_tokens(transaction)
+
+        res = self._transactions_collection.update_one(
+            {"_id": to_oid(tx_id)}, {"$set": tx_doc}
+        )
+        if res.modified_count:
+            self._bump_data_version(tx_doc["user_id"])
+            _transaction_log.debug("Updated transaction %s", tx_id)
+        return res.modified_count > 0
+
+    def get_transactions(self, user: str) -> list[Transaction]:
+        docs = self._transactions_collection.find({"user_id": to_oid(user)})
+        return [Transaction.model_validate(doc) for doc in docs]
+
+    def find_transactions(
+        self,
+        user: str,
+        fields: list[str] | None = None,
+        skip: int = 0,
+        limit: int | None = None,
+    ) -> list[dict]:
+        docs = (
+            self._transactions_collection.find(
+                {"user_id": to_oid(user)}, _projection(fields)
+            )
+            .sort("_id", ASCENDING)
+            .skip(skip)
+            .limit(limit or 0)  # 0: no limit
+        )
+        return [_stringify_ids(doc) for doc in docs]
+
+    def iter_transactions(
+        self,
+        user: str,
+        filters: TransactionFilter | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[list[dict]]:
+        query = {
+            "user_id": to_oid(user),
+            **_filter_query(filters or TransactionFilter()),
+        }
+        cursor = (
+            self._transactions_collection.find(query, _projection(None))
+            .sort([("date", ASCENDING), ("_id", ASCENDING)])
+            .batch_size(batch_size)
+        )
+        batch: list[dict] = []
+        for doc in cursor:
+            batch.append(_stringify_ids(doc))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def search_transactions(
+        self,
+        user: str,
+        tokens: list[str],
+        fields: list[str] | None = None,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> list[dict]:
+        if not tokens:
+            return []
+        match = {
+            "user_id": to_oid(user),
+            "$and": [
+                {"search_tokens": {"$regex": f"^{re.escape(token)}"}}
+                for token in tokens
+            ],
+        }
+        # Prefix matches qualify a document; whole-word matches of every token rank first
+        score = {
+            "$cond": [
+                {"$and": [{"$in": [token, "$search_tokens"]} for token in tokens]},
+                1,
+                0,
+            ]
+        }
+        project = _projection(fields)
+        if fields is None:
+            project["_score"] = False
+        pipeline = [
+            {"$match": match},
+            {"$addFields": {"_score": score}},
+            {"$sort": {"_score": -1, "date": -1, "_id": -1}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$project": project},
+        ]
+        return [
+            _stringify_ids(doc)
+            for doc in self._transactions_collection.aggregate(pipeline)
+        ]
+
+    def reindex_search(self) -> int:
+        count = 0
+        users = set()
+        for doc in self._transactions_collection.find({}, {"search_tokens": False}):
+            tx = Transaction.model_validate(doc)
+            self._transactions_collection.update_one(
+                {"_id": doc["_id"]}, {"$set": {"search_tokens": transaction_tokens(tx)}}
+            )
+            users.add(doc["user_id"])
+            count += 1
+        # Search results may have changed, so cached search responses must revalidate
+        for user_oid in users:
+            self._bump_data_version(user_oid)
+        logger.info("Reindexed search tokens of %d transactions", count)
+        return count
+
+    def find_transaction(
+        self, tx_id: str, fields: list[str] | None = None
+    ) -> dict | None:
+        doc = self._transactions_collection.find_one(
+            {"_id": to_oid(tx_id)}, _projection(fields)
+        )
+        if not doc:
+            return None
+        return _stringify_ids(doc)
+
+    def get_import_mark(self, user_id: str, iban: str) -> ImportMark | None:
+        doc = self._import_marks_collection.find_one(
+            {"user_id": to_oid(user_id), "iban": iban}, {"_id": False}
+        )
+        if not doc:
+            return None
+        return ImportMark.model_validate(doc)
+
+    def set_import_mark(self, mark: ImportMark) -> None:
+        doc = mark.model_dump()
+        doc["user_id"] = to_oid(mark.user_id)
+        self._import_marks_collection.replace_one(
+            {"user_id": doc["user_id"], "iban": mark.iban}, doc, upsert=True
+        )
+
+    def create_job(self, job: Job) -> str:
+        doc = job.model_dump(exclude_none=True)
+        doc["user_id"] = to_oid(job.user_id)
+        res = self._jobs_collection.insert_one(doc)
+        return str(res.inserted_id)
+
+    def get_job(self, job_id: str) -> Job | None:
+        doc = self._jobs_collection.find_one({"_id": to_oid(job_id)})
+        if not doc:
+            return None
+        return Job.model_validate(doc)
+
+    def update_job(self, job_id: str, update_data: dict) -> bool:
+        res = self._jobs_collection.update_one(
+            {"_id": to_oid(job_id)}, {"$set": update_data}
+        )
+        return res.modified_count > 0
+
+    def start_job(self, job_id: str) -> bool:
+        res = self._jobs_collection.update_one(
+            {"_id": to_oid(job_id), "status": str(JobStatus.PENDING)},
+            {
+                "$set": {
+                    "status": str(JobStatus.RUNNING),
+                    "started_at": datetime.now(UTC),
+                }
+            },
+        )
+        return res.modified_count > 0
+
+    def report_job_progress(
+        self, job_id: str, processed: int, total: int | None = None
+    ) -> bool:
+        update: dict = {"processed": processed}
+        if total is not None:
+            update["total"] = total
+        doc = self._jobs_collection.find_one_and_update(
+            {"_id": to_oid(job_id)},
+            {"$set": update},
+            projection={"cancel_requested": True},
+            return_document=ReturnDocument.AFTER,
+        )
+        return bool(doc and doc.get("cancel_requested"))
+
+    def cancel_job(self, job_id: str) -> bool:
+        res = self._jobs_collection.update_one(
+            {"_id": to_oid(job_id), "status": str(JobStatus.PENDING)},
+            {
+                "$set": {
+                    "status": str(JobStatus.CANCELLED),
+                    "finished_at": datetime.now(UTC),
+                }
+            },
+        )
+        if res.modified_count:
+            return True
+        res = self._jobs_collection.update_one(
+            {"_id": to_oid(job_id), "status": str(JobStatus.RUNNING)},
+            {"$set": {"cancel_requested": True}},
+        )
+        return res.modified_count > 0
+
+    def clear(self) -> None:
+        for collection in (
+            self._users_collection,
+            self._transactions_collection,
+            self._rules_collection,
+            self._jobs_collection,
+            self._import_marks_collection,
+            self._data_versions_collection,
+        ):
+            collection.delete_many({})
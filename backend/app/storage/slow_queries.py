@@ -0,0 +1,266 @@
+"""Slow MongoDB query log with explain plans.
+
+``SlowQueryLog`` is a pymongo command listener. Commands on the collections in
+``SLOW_QUERY_COLLECTIONS`` that take ``SLOW_QUERY_MS`` or longer are logged
+with their query shape: the filter (or pipeline) with every value replaced by
+``"?"``, so no user data ends up in the log and all queries that differ only
+in their values are grouped together.
+
+The first time a shape is slow, its command is explained (``queryPlanner``
+verbosity, no execution) on a background thread. The stages of the winning
+plan are stored with the shape, and a plan that scans the whole collection is
+logged as ``COLLSCAN``. ``top()`` returns the shapes that cost the most time
+in total, for ``GET /admin/slow-queries``.
+
+Fast commands cost one dict insert and one dict pop; shapes are only built
+for commands over the threshold.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_COLLECTIONS = frozenset(
+    os.getenv("SLOW_QUERY_COLLECTIONS", "transactions,rules,users").split(",")
+)
+# Distinct shapes remembered; the least recently slow one is dropped beyond it
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "200"))
+
+# Where each command keeps its filter
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+}
+_EXPLAINABLE = {*_FILTER_FIELDS, "update", "delete"}
+# Sent by the driver with every command; explain takes the command without them
+_DRIVER_FIELDS = {
+    "$db",
+    "lsid",
+    "$clusterTime",
+    "$readPreference",
+    "txnNumber",
+    "autocommit",
+    "startTransaction",
+}
+
+ExplainFunc = Callable[[str, dict], dict]
+
+
+def query_shape(value):
+    """``value`` with operators, field names and ``$field`` references kept and all values redacted."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # {"$in": [a, b, c]} and {"$in": [a]} have the same shape
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+
+def command_filter(command_name: str, command: dict):
+    if command_name in ("update", "delete"):
+        # Write batches: statements in "updates"/"deletes", each filter under "q"
+        return [statement.get("q") for statement in command.get(f"{command_name}s", ())]
+    return command.get(_FILTER_FIELDS.get(command_name, ""), {})
+
+
+def plan_stages(explain: dict) -> list[str]:
+    """Stages of every winning plan in explain output, root first, e.g. ``["FETCH", "IXSCAN user_date"]``."""
+    stages: list[str] = []
+
+    def walk(node, in_plan: bool) -> None:
+        if isinstance(node, dict):
+            if in_plan and isinstance(node.get("stage"), str):
+                index = node.get("indexName")
+                stages.append(f"{node['stage']} {index}" if index else node["stage"])
+            for key, item in node.items():
+                walk(item, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+@dataclass
+class SlowQuery:
+    collection: str
+    command: str
+    shape: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_seen: datetime | None = None
+    plan: list[str] | None = None  # winning plan stages, once explained
+    collscan: bool | None = None
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    _instance: "SlowQueryLog | None" = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "SlowQueryLog":
+        if SlowQueryLog._instance is None:
+            # First use may come from several request threads at once
+            with SlowQueryLog._instance_lock:
+                if SlowQueryLog._instance is None:
+                    SlowQueryLog._instance = SlowQueryLog(
+                        SLOW_QUERY_MS, SLOW_QUERY_COLLECTIONS, SLOW_QUERY_MAX_SHAPES
+                    )
+        return SlowQueryLog._instance
+
+    def __init__(
+        self, threshold_ms: float, collections: frozenset[str], max_shapes: int
+    ):
+        self.threshold_ms = threshold_ms
+        self.collections = collections
+        self.max_shapes = max_shapes
+        # Runs ``explain`` for (database, command); set by ``attach``
+        self.explain: ExplainFunc | None = None
+        self._lock = threading.Lock()
+        self._running: dict[
+            int, tuple[str, dict]
+        ] = {}  # request id -> (collection, command)
+        self._queries: OrderedDict[tuple[str, str, str], SlowQuery] = OrderedDict()
+        self._explainer: ThreadPoolExecutor | None = None
+
+    def attach(self, client) -> None:
+        """Explain slow queries through ``client``, the client this listener is registered with."""
+
+        def explain(database: str, command: dict) -> dict:
+            return client[database].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+
+        self.explain = explain
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        if isinstance(collection, str) and collection in self.collections:
+            with self._lock:
+                self._running[event.request_id] = (collection, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event)
+
+    def _finished(self, event) -> None:
+        with self._lock:
+            running = self._running.pop(event.request_id, None)
+        millis = event.duration_micros / 1000
+        if running is None or millis < self.threshold_ms:
+            return
+        collection, command = running
+        self.record(
+            event.database_name, collection, event.command_name, command, millis
+        )
+
+    def record(
+        self,
+        database: str,
+        collection: str,
+        command_name: str,
+        command: dict,
+        millis: float,
+    ) -> None:
+        shape = json.dumps(
+            query_shape(command_filter(command_name, command)),
+            sort_keys=True,
+            default=str,
+        )
+        key = (collection, command_name, shape)
+        with self._lock:
+            query = self._queries.pop(key, None)
+            first = query is None
+            if first:
+                query = SlowQuery(
+                    collection=collection, command=command_name, shape=shape
+                )
+            self._queries[key] = query
+            while len(self._queries) > self.max_shapes:
+                self._queries.popitem(last=False)
+            query.count += 1
+            query.total_ms += millis
+            query.max_ms = max(query.max_ms, millis)
+            query.last_seen = datetime.now(UTC)
+            plan = query.plan
+
+        logger.warning(
+            "Slow query: %s.%s %.0f ms, filter %s%s",
+            collection,
+            command_name,
+            millis,
+            shape,
+            f", plan {' > '.join(plan)}" if plan else "",
+        )
+        if first and self.explain is not None and command_name in _EXPLAINABLE:
+            command = {
+                name: value
+                for name, value in command.items()
+                if name not in _DRIVER_FIELDS
+            }
+            self._get_explainer().submit(self._explain, key, database, command)
+
+    def _get_explainer(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._explainer is None:
+                self._explainer = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="explain"
+                )
+            return self._explainer
+
+    def _explain(self, key: tuple[str, str, str], database: str, command: dict) -> None:
+        try:
+            stages = plan_stages(self.explain(database, command))
+        except Exception:
+            logger.exception("Could not explain slow %s.%s", key[0], key[1])
+            return
+        collscan = any(stage.startswith("COLLSCAN") for stage in stages)
+        with self._lock:
+            query = self._queries.get(key)
+            if query is not None:
+                query.plan = stages
+                query.collscan = collscan
+        if collscan:
+            logger.warning(
+                "Slow query %s.%s scans the whole collection (COLLSCAN): %s",
+                key[0],
+                key[1],
+                key[2],
+            )
+
+    def top(self, limit: int = 20) -> list[SlowQuery]:
+        """Copies of the shapes with the most slow time in total."""
+        with self._lock:
+            queries = [replace(query) for query in self._queries.values()]
+        return sorted(queries, key=lambda query: query.total_ms, reverse=True)[:limit]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._explainer is not None:
+                self._explainer.shutdown(wait=False, cancel_futures=True)
+                self._explainer = None
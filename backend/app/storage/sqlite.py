@@ -0,0 +1,713 @@
+"""Embedded SQLite storage backend.
+
+Meant for single-user deployments and fast tests: no server process, a single
+file (or ``:memory:``). Fields that are filtered, sorted or grouped on live in
+their own indexed columns; nested models (asset, counterparty, details) and
+lists are stored in JSON columns.
+
+Ids are generated as ObjectId hex strings so they stay interchangeable with the
+Mongo backend (``to_oid`` validation in callers keeps working).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from enum import Enum
+
+from bson import ObjectId
+
+from app.db import DB, TransactionFilter, to_oid
+from app.logging import RateLimitedLog
+from app.models import ImportMark, Job, JobStatus, RuleDB, Transaction, User
+from app.search import transaction_tokens
+
+logger = logging.getLogger(__name__)
+# update_transaction runs once per transaction when rules are applied
+_transaction_log = RateLimitedLog(logger)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    hashed_password TEXT NOT NULL,
+    email TEXT
+);
+
+CREATE TABLE IF NOT EXISTS rules (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS rules_user ON rules (user_id);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    transaction_type TEXT,
+    description TEXT,
+    category TEXT,
+    note TEXT,
+    fingerprint TEXT,
+    asset TEXT NOT NULL,
+    counterparty TEXT,
+    details TEXT,
+    tags TEXT,
+    goods_services TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_user_date ON transactions (user_id, date);
+CREATE INDEX IF NOT EXISTS transactions_user_category ON transactions (user_id, category);
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_user_fingerprint
+    ON transactions (user_id, fingerprint) WHERE fingerprint IS NOT NULL;
+
+-- Per-user inverted index for search, see app.search
+CREATE TABLE IF NOT EXISTS transaction_tokens (
+    user_id TEXT NOT NULL,
+    token TEXT NOT NULL,
+    tx_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, token, tx_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS transaction_tokens_tx ON transaction_tokens (tx_id);
+
+CREATE TABLE IF NOT EXISTS import_marks (
+    user_id TEXT NOT NULL,
+    iban TEXT NOT NULL,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    last_balance REAL,
+    PRIMARY KEY (user_id, iban)
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+USER_COLUMNS = ("id", "username", "hashed_password", "email")
+RULE_COLUMNS = ("id", "user_id", "rule", "active")
+TRANSACTION_COLUMNS = (
+    "id",
+    "user_id",
+    "date",
+    "amount",
+    "transaction_type",
+    "description",
+    "category",
+    "note",
+    "fingerprint",
+    "asset",
+    "counterparty",
+    "details",
+    "tags",
+    "goods_services",
+)
+JOB_COLUMNS = (
+    "id",
+    "user_id",
+    "kind",
+    "status",
+    "processed",
+    "total",
+    "cancel_requested",
+    "result",
+    "error",
+    "created_at",
+    "started_at",
+    "finished_at",
+)
+IMPORT_MARK_COLUMNS = ("user_id", "iban", "first_date", "last_date", "last_balance")
+TABLES = (
+    "users",
+    "rules",
+    "transactions",
+    "transaction_tokens",
+    "import_marks",
+    "jobs",
+    "data_versions",
+)
+JSON_COLUMNS = {"asset", "counterparty", "details", "tags", "goods_services", "result"}
+BOOL_COLUMNS = {"active", "cancel_requested"}
+DATETIME_COLUMNS = {
+    "date",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "first_date",
+    "last_date",
+}
+# Upper bound for prefix ranges: token <= t < prefix + MAX_CHAR
+MAX_CHAR = chr(0x10FFFF)
+# Search tokens matching fewer rows than this drive the query from the inverted index;
+# when every token is more common, scanning by date and stopping at the page limit is cheaper
+SEARCH_SCAN_THRESHOLD = 2000
+
+
+def _new_id() -> str:
+    return str(ObjectId())
+
+
+def _to_sql(value):
+    if isinstance(value, datetime):
+        # Stored like Mongo does: naive UTC
+        if value.tzinfo is not None:
+            value = value.astimezone(UTC).replace(tzinfo=None)
+        return value.isoformat(timespec="microseconds")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _to_row(doc: dict, columns: tuple[str, ...]) -> dict:
+    unknown = set(doc) - set(columns)
+    if unknown:
+        raise ValueError(f"Unsupported fields: {', '.join(sorted(unknown))}")
+    return {key: _to_sql(value) for key, value in doc.items()}
+
+
+def _from_row(row: sqlite3.Row) -> dict:
+    doc = {}
+    for key in row.keys():  # noqa: SIM118 - iterating a sqlite3.Row yields values
+        value = row[key]
+        if value is None:
+            continue
+        if key in JSON_COLUMNS:
+            value = json.loads(value)
+        elif key in BOOL_COLUMNS:
+            value = bool(value)
+        elif key in DATETIME_COLUMNS:
+            value = datetime.fromisoformat(value)
+        doc["_id" if key == "id" else key] = value
+    return doc
+
+
+def _select_list(fields: list[str] | None, table: str = "") -> str:
+    prefix = f"{table}." if table else ""
+    if fields is None:
+        return f"{prefix}*"
+    unknown = set(fields) - set(TRANSACTION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unsupported fields: {', '.join(sorted(unknown))}")
+    # Column names come from the whitelist above, never from user input directly
+    return ", ".join(
+        f"{prefix}{field}"
+        for field in ["id", *(field for field in fields if field != "id")]
+    )
+
+
+def _filter_sql(filters: TransactionFilter, params: dict) -> str:
+    """Extra ``AND`` clauses on ``transactions`` for ``filters``; values are added to ``params``."""
+    clauses = []
+    for column, op, key, value in (
+        ("date", ">=", "date_from", filters.date_from),
+        ("date", "<=", "date_to", filters.date_to),
+        ("amount", ">=", "amount_min", filters.amount_min),
+        ("amount", "<=", "amount_max", filters.amount_max),
+        ("category", "=", "category", filters.category),
+    ):
+        if value is not None:
+            clauses.append(f"{column} {op} :{key}")
+            params[key] = _to_sql(value)
+    for i, tag in enumerate(filters.tags):
+        clauses.append(
+            f"EXISTS (SELECT 1 FROM json_each(transactions.tags) WHERE value = :tag{i})"
+        )
+        params[f"tag{i}"] = tag
+    return "".join(f" AND {clause}" for clause in clauses)
+
+
+def _token_condition(i: int, token: str, exact: bool, params: dict) -> str:
+    """SQL on ``transaction_tokens`` matching query token ``i`` exactly or as a prefix."""
+    params[f"t{i}"] = token
+    if exact:
+        return f"token = :t{i}"
+    params[f"t{i}_end"] = token + MAX_CHAR
+    return f"token >= :t{i} AND token < :t{i}_end"
+
+
+def _token_exists(condition: str) -> str:
+    return f"EXISTS (SELECT 1 FROM transaction_tokens WHERE user_id = :user_id AND tx_id = tx.id AND {condition})"
+
+
+class SqliteDB(DB):
+    def __init__(self, path: str):
+        # One shared connection guarded by a lock: FastAPI runs sync endpoints on
+        # a thread pool and ":memory:" databases are per-connection.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+        logger.info("SQLite database initialized: %s", path)
+
+    def _query(self, sql: str, params=()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _execute(self, sql: str, params=()) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def _insert(self, table: str, row: dict) -> None:
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{key}" for key in row)
+        self._execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", row)
+
+    def _update(
+        self,
+        table: str,
+        row_id: str,
+        row: dict,
+        where: str = "",
+        params: dict | None = None,
+    ) -> bool:
+        """``$set`` equivalent: only counts rows whose values actually changed."""
+        if not row:
+            return False
+        assignments = ", ".join(f"{key} = :{key}" for key in row)
+        changed = " OR ".join(f"{key} IS NOT :{key}" for key in row)
+        sql = f"UPDATE {table} SET {assignments} WHERE id = :_row_id AND ({changed}){where}"
+        return self._execute(sql, {**row, **(params or {}), "_row_id": row_id}) > 0
+
+    def get_data_version(self, user_id: str) -> int:
+        rows = self._query(
+            "SELECT version FROM data_versions WHERE user_id = ?",
+            (str(to_oid(user_id)),),
+        )
+        return rows[0][0] if rows else 0
+
+    def _index_tokens(self, tx_id: str, user_id: str, transaction: Transaction) -> None:
+        """Replace the search tokens of one transaction; caller holds the lock and transaction."""
+        self._conn.execute("DELETE FROM transaction_tokens WHERE tx_id = ?", (tx_id,))
+        self._conn.executemany(
+            "INSERT INTO transaction_tokens (user_id, token, tx_id) VALUES (?, ?, ?)",
+            [(user_id, token, tx_id) for token in transaction_tokens(transaction)],
+        )
+
+    def _bump_data_version(self, user_id: str) -> None:
+        self._execute(
+            "INSERT INTO data_versions (user_id, version) VALUES (?, 1) "
+            "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+            (user_id,),
+        )
+
+    def get_user(self, username: str) -> User:
+        rows = self._query("SELECT * FROM users WHERE username = ?", (username,))
+        if not rows:
+            raise ValueError(f"User '{username}' not found")
+        return User.model_validate(_from_row(rows[0]))
+
+    def create_user(self, user: User) -> str:
+        row = _to_row(user.model_dump(exclude_none=True), USER_COLUMNS)
+        row["id"] = _new_id()
+        self._insert("users", row)
+        return row["id"]
+
+    def update_user(self, user_id: str, update_data: dict) -> bool:
+        return self._update(
+            "users", str(to_oid(user_id)), _to_row(update_data, USER_COLUMNS)
+        )
+
+    def get_rules(self, user_id: str) -> list[RuleDB]:
+        rows = self._query(
+            "SELECT * FROM rules WHERE user_id = ? ORDER BY rowid",
+            (str(to_oid(user_id)),),
+        )
+        return [RuleDB.model_validate(_from_row(row)) for row in rows]
+
+    def add_rule(self, user_id: str, rule, priority: int = 0):
+        if hasattr(rule, "model_dump"):
+            doc = rule.model_dump(exclude_none=True)
+        elif isinstance(rule, dict):
+            doc = dict(rule)
+        else:
+            raise ValueError("rule must be RuleDB or dict")
+
+        doc["user_id"] = str(to_oid(user_id))
+        doc["id"] = _new_id()
+        with self._lock:
+            self._insert("rules", _to_row(doc, RULE_COLUMNS))
+            self._bump_data_version(doc["user_id"])
+        return doc["id"]
+
+    def get_rule(self, rule_id: str) -> RuleDB | None:
+        rows = self._query("SELECT * FROM rules WHERE id = ?", (str(to_oid(rule_id)),))
+        if not rows:
+            return None
+        return RuleDB.model_validate(_from_row(rows[0]))
+
+    def update_rule(self, rule_id: str, update_data: dict) -> bool:
+        if "user_id" in update_data:
+            update_data["user_id"] = str(to_oid(update_data["user_id"]))
+        oid = str(to_oid(rule_id))
+        with self._lock:
+            if not self._update("rules", oid, _to_row(update_data, RULE_COLUMNS)):
+                return False
+            self._bump_data_version(
+                self._query("SELECT user_id FROM rules WHERE id = ?", (oid,))[0][0]
+            )
+        return True
+
+    def delete_rule(self, rule_id: str) -> bool:
+        oid = str(to_oid(rule_id))
+        with self._lock:
+            rows = self._query("SELECT user_id FROM rules WHERE id = ?", (oid,))
+            if not rows:
+                return False
+            self._execute("DELETE FROM rules WHERE id = ?", (oid,))
+            self._bump_data_version(rows[0][0])
+        return True
+
+    def get_transaction(self, tx_id: str) -> Transaction | None:
+        rows = self._query(
+            "SELECT * FROM transactions WHERE id = ?", (str(to_oid(tx_id)),)
+        )
+        if not rows:
+            return None
+        return Transaction.model_validate(_from_row(rows[0]))
+
+    def get_categories(self, user: str) -> list[str]:
+        rows = self._query(
+            "SELECT DISTINCT category FROM transactions WHERE user_id = ? AND category IS NOT NULL",
+            (str(to_oid(user)),),
+        )
+        return sorted({row[0].strip() for row in rows if str(row[0]).strip()})
+
+    def get_tags(self, user: str) -> list[str]:
+        rows = self._query(
+            "SELECT DISTINCT tag.value FROM transactions, json_each(transactions.tags) AS tag "
+            "WHERE transactions.user_id = ? AND transactions.tags IS NOT NULL",
+            (str(to_oid(user)),),
+        )
+        return sorted(
+            {
+                str(row[0]).strip()
+                for row in rows
+                if row[0] is not None and str(row[0]).strip()
+            }
+        )
+
+    def insert_transactions(self, transactions: list[Transaction]) -> list[str]:
+        if not transactions:
+            return []
+        logger.info("Inserting %d transactions", len(transactions))
+        inserted: list[str] = []
+        users: set[str] = set()
+        with self._lock, self._conn:
+            for tx in transactions:
+                row = _to_row(tx.model_dump(exclude_none=True), TRANSACTION_COLUMNS)
+                row["id"] = row.get("id") or _new_id()
+                row["user_id"] = str(to_oid(tx.user_id))
+                columns = ", ".join(row)
+                placeholders = ", ".join(f":{key}" for key in row)
+                # OR IGNORE: a duplicate (user_id, fingerprint) is skipped, like Mongo's E11000
+                cursor = self._conn.execute(
+                    f"INSERT OR IGNORE INTO transactions ({columns}) VALUES ({placeholders})",
+                    row,
+                )
+                if cursor.rowcount:
+                    inserted.append(row["id"])
+                    users.add(row["user_id"])
+                    self._index_tokens(row["id"], row["user_id"], tx)
+        for user_id in users:
+            self._bump_data_version(user_id)
+        logger.info(
+            "Inserted %d transactions, skipped %d duplicates",
+            len(inserted),
+            len(transactions) - len(inserted),
+        )
+        return inserted
+
+    def update_transaction(self, tx_id: str, transaction: Transaction) -> bool:
+        _transaction_log.debug(
+            "Updating transaction %s with data: %s", tx_id, transaction
+        )
+        row = _to_row(
+            transaction.model_dump(exclude_none=True, exclude={"id"}),
+            TRANSACTION_COLUMNS,
+        )
+        row["user_id"] = str(to_oid(transaction.user_id))
+        oid = str(to_oid(tx_id))
+        with self._lock:
+            ok = self._update("transactions", oid, row)
+            if ok:
+                with self._conn:
+                    self._index_tokens(oid, row["user_id"], transaction)
+                self._bump_data_version(row["user_id"])
+        if ok:
+            _transaction_log.debug("Updated transaction %s", tx_id)
+        return ok
+
+    def get_transactions(self, user: str) -> list[Transaction]:
+        rows = self._query(
+            "SELECT * FROM transactions WHERE user_id = ? ORDER BY rowid",
+            (str(to_oid(user)),),
+        )
+        return [Transaction.model_validate(_from_row(row)) for row in rows]
+
+    def find_transactions(
+        self,
+        user: str,
+        fields: list[str] | None = None,
+        skip: int = 0,
+        limit: int | None = None,
+    ) -> list[dict]:
+        rows = self._query(
+            f"SELECT {_select_list(fields)} FROM transactions WHERE user_id = ? ORDER BY rowid LIMIT ? OFFSET ?",
+            (str(to_oid(user)), -1 if limit is None else limit, skip),  # -1: no limit
+        )
+        return [_from_row(row) for row in rows]
+
+    def find_transaction(
+        self, tx_id: str, fields: list[str] | None = None
+    ) -> dict | None:
+        rows = self._query(
+            f"SELECT {_select_list(fields)} FROM transactions WHERE id = ?",
+            (str(to_oid(tx_id)),),
+        )
+        if not rows:
+            return None
+        return _from_row(rows[0])
+
+    def iter_transactions(
+        self,
+        user: str,
+        filters: TransactionFilter | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[list[dict]]:
+        params: dict = {"user_id": str(to_oid(user)), "limit": batch_size}
+        where = "user_id = :user_id" + _filter_sql(
+            filters or TransactionFilter(), params
+        )
+        keyset = ""
+        while True:
+            # Keyset pagination: every batch is its own short query, so the shared connection
+            # is never held by a half-consumed cursor while the client reads the stream
+            rows = self._query(
+                f"SELECT rowid AS _rowid, * FROM transactions WHERE {where}{keyset} ORDER BY date, rowid LIMIT :limit",
+                params,
+            )
+            if not rows:
+                return
+            yield [
+                {k: v for k, v in _from_row(row).items() if k != "_rowid"}
+                for row in rows
+            ]
+            if len(rows) < batch_size:
+                return
+            params["last_date"], params["last_rowid"] = (
+                rows[-1]["date"],
+                rows[-1]["_rowid"],
+            )
+            keyset = " AND (date, rowid) > (:last_date, :last_rowid)"
+
+    def _search_group(
+        self,
+        user_id: str,
+        tokens: list[str],
+        exact: bool,
+        fields: list[str] | None,
+        skip: int,
+        limit: int,
+    ) -> list[dict]:
+        """One ranking group, newest first: all tokens whole-word, or all prefix but not all whole-word."""
+        params: dict = {
+            "user_id": user_id,
+            "limit": limit,
+            "skip": skip,
+            "cap": SEARCH_SCAN_THRESHOLD,
+        }
+        conditions = [
+            _token_condition(i, token, exact, params) for i, token in enumerate(tokens)
+        ]
+        matches = " AND ".join(_token_exists(condition) for condition in conditions)
+        if not exact:
+            whole = [
+                _token_condition(i, token, True, params)
+                for i, token in enumerate(tokens)
+            ]
+            matches += f" AND NOT ({' AND '.join(_token_exists(condition) for condition in whole)})"
+
+        # Cheap bounded count of each token's index range picks the plan
+        sizes = [
+            self._query(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM transaction_tokens "
+                f"WHERE user_id = :user_id AND {condition} LIMIT :cap)",
+                params,
+            )[0][0]
+            for condition in conditions
+        ]
+        rarest = min(range(len(tokens)), key=sizes.__getitem__)
+        if sizes[rarest] < SEARCH_SCAN_THRESHOLD:
+            # Selective: candidates come from the rarest token's index range, the rest is verified per row
+            source = f"tx.id IN (SELECT tx_id FROM transaction_tokens WHERE user_id = :user_id AND {conditions[rarest]})"
+        else:
+            # Every token is common: walk the (user_id, date) index newest first and stop at the limit
+            source = "tx.user_id = :user_id"
+        sql = (
+            f"SELECT {_select_list(fields, 'tx')} FROM transactions AS tx "
+            f"WHERE {source} AND {matches} "
+            "ORDER BY tx.date DESC, tx.rowid DESC LIMIT :limit OFFSET :skip"
+        )
+        return [_from_row(row) for row in self._query(sql, params)]
+
+    def search_transactions(
+        self,
+        user: str,
+        tokens: list[str],
+        fields: list[str] | None = None,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> list[dict]:
+        if not tokens:
+            return []
+        user_id = str(to_oid(user))
+        with self._lock:
+            # The whole-word group is read from the start so its size is known for the offset into the next one
+            whole = self._search_group(user_id, tokens, True, fields, 0, skip + limit)
+            results = whole[skip:]
+            if len(results) < limit:
+                results += self._search_group(
+                    user_id,
+                    tokens,
+                    False,
+                    fields,
+                    max(0, skip - len(whole)),
+                    limit - len(results),
+                )
+        return results
+
+    def reindex_search(self) -> int:
+        with self._lock:
+            rows = self._query("SELECT * FROM transactions")
+            with self._conn:
+                self._conn.execute("DELETE FROM transaction_tokens")
+                for row in rows:
+                    tx = Transaction.model_validate(_from_row(row))
+                    self._index_tokens(row["id"], row["user_id"], tx)
+            # Search results may have changed, so cached search responses must revalidate
+            for user_id in {row["user_id"] for row in rows}:
+                self._bump_data_version(user_id)
+        logger.info("Reindexed search tokens of %d transactions", len(rows))
+        return len(rows)
+
+    def get_import_mark(self, user_id: str, iban: str) -> ImportMark | None:
+        rows = self._query(
+            "SELECT * FROM import_marks WHERE user_id = ? AND iban = ?",
+            (str(to_oid(user_id)), iban),
+        )
+        if not rows:
+            return None
+        return ImportMark.model_validate(_from_row(rows[0]))
+
+    def set_import_mark(self, mark: ImportMark) -> None:
+        row = _to_row(mark.model_dump(), IMPORT_MARK_COLUMNS)
+        row["user_id"] = str(to_oid(mark.user_id))
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{key}" for key in row)
+        self._execute(
+            f"INSERT OR REPLACE INTO import_marks ({columns}) VALUES ({placeholders})",
+            row,
+        )
+
+    def create_job(self, job: Job) -> str:
+        row = _to_row(job.model_dump(exclude_none=True), JOB_COLUMNS)
+        row["id"] = _new_id()
+        row["user_id"] = str(to_oid(job.user_id))
+        self._insert("jobs", row)
+        return row["id"]
+
+    def get_job(self, job_id: str) -> Job | None:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (str(to_oid(job_id)),))
+        if not rows:
+            return None
+        return Job.model_validate(_from_row(rows[0]))
+
+    def update_job(self, job_id: str, update_data: dict) -> bool:
+        return self._update(
+            "jobs", str(to_oid(job_id)), _to_row(update_data, JOB_COLUMNS)
+        )
+
+    def start_job(self, job_id: str) -> bool:
+        row = _to_row(
+            {"status": JobStatus.RUNNING, "started_at": datetime.now(UTC)},
+            JOB_COLUMNS,
+        )
+        return self._update(
+            "jobs",
+            str(to_oid(job_id)),
+            row,
+            " AND status = :_expected",
+            {"_expected": JobStatus.PENDING.value},
+        )
+
+    def report_job_progress(
+        self, job_id: str, processed: int, total: int | None = None
+    ) -> bool:
+        update: dict = {"processed": processed}
+        if total is not None:
+            update["total"] = total
+        with self._lock:
+            self._update("jobs", str(to_oid(job_id)), update)
+            rows = self._query(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (str(to_oid(job_id)),)
+            )
+        return bool(rows and rows[0][0])
+
+    def cancel_job(self, job_id: str) -> bool:
+        oid = str(to_oid(job_id))
+        with self._lock:
+            row = _to_row(
+                {
+                    "status": JobStatus.CANCELLED,
+                    "finished_at": datetime.now(UTC),
+                },
+                JOB_COLUMNS,
+            )
+            if self._update(
+                "jobs",
+                oid,
+                row,
+                " AND status = :_expected",
+                {"_expected": JobStatus.PENDING.value},
+            ):
+                return True
+            return self._update(
+                "jobs",
+                oid,
+                {"cancel_requested": 1},
+                " AND status = :_expected",
+                {"_expected": JobStatus.RUNNING.value},
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            for table in TABLES:
+                self._conn.execute(f"DELETE FROM {table}")
@@ -0,0 +1,93 @@
+"""Per-stage timing reports for imports and rule application.
+
+A ``TimingReport`` collects wall time and item counts per stage (load rules,
+fetch, validate, evaluate, write, ...) plus operation specific totals. It is
+returned with the operation's result and logged as one line of JSON, so runs
+can be compared without a profiler::
+
+    apply_rules timings {"operation": "apply_rules", "seconds": 1.92, "stages": {...}, ...}
+
+Stages of the streaming importer run concurrently; their seconds add up to
+more than the operation's wall time.
+"""
+
+import json
+import logging
+import time
+from collections.abc import Iterable, Iterator, Sized
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageTiming:
+    seconds: float = 0.0
+    count: int = 0
+
+
+class TimingReport:
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.stages: dict[str, StageTiming] = {}
+        self.totals: dict[str, object] = {}
+        self._start = time.perf_counter()
+        self._seconds: float | None = None
+
+    def stage_timing(self, name: str) -> StageTiming:
+        return self.stages.setdefault(name, StageTiming())
+
+    @contextmanager
+    def stage(self, name: str, count: int = 0) -> Iterator[StageTiming]:
+        """Time a block; ``count`` (or the yielded timing's ``count``) is the number of items handled."""
+        timing = self.stage_timing(name)
+        timing.count += count
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing.seconds += time.perf_counter() - start
+
+    def timed(self, name: str, batches: Iterable[T]) -> Iterator[T]:
+        """Pass ``batches`` through, charging the time spent producing them to stage ``name``."""
+        timing = self.stage_timing(name)
+        iterator = iter(batches)
+        while True:
+            start = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                timing.seconds += time.perf_counter() - start
+                return
+            timing.seconds += time.perf_counter() - start
+            timing.count += len(batch) if isinstance(batch, Sized) else 1
+            yield batch
+
+    def finish(self) -> "TimingReport":
+        self._seconds = time.perf_counter() - self._start
+        return self
+
+    def as_dict(self) -> dict:
+        seconds = (
+            self._seconds
+            if self._seconds is not None
+            else time.perf_counter() - self._start
+        )
+        return {
+            "operation": self.operation,
+            "seconds": round(seconds, 4),
+            "stages": {
+                name: {"seconds": round(timing.seconds, 4), "count": timing.count}
+                for name, timing in self.stages.items()
+            },
+            **self.totals,
+        }
+
+    def log(self, logger: logging.Logger) -> None:
+        logger.info(
+            "%s timings %s",
+            self.operation,
+            json.dumps(self.as_dict(), separators=(",", ":"), default=str),
+        )
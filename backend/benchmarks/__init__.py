@@ -0,0 +1 @@
+"""Performance benchmarks (not collected by pytest). Run modules with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,108 @@
+"""Benchmark mBank statement import end to end: rows/sec and peak memory.
+
+Generates a statement with ``--rows`` transaction rows
+(``benchmarks.synthetic.mbank_statement_lines``) and measures:
+
+* ``mbank.parse``: the statement text in memory, parsed into a list
+* ``mbank.parse_lines``: the statement file streamed line by line
+* ``Importer.import_from_file``: detection, parsing, rule evaluation with
+  ``--rules`` rules and inserts into the database (``MONGO_URI``, an
+  in-memory SQLite database by default); every run imports for a new user
+
+Rows/sec is the best of ``--runs`` runs. Peak memory is measured in a
+separate run under ``tracemalloc``, which slows Python down severalfold, and
+counts what the case allocated beyond what was allocated before it started
+(the statement text for ``mbank.parse``).
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_importer --rows 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+# Before app.db picks the backend
+os.environ.setdefault("MONGO_URI", "sqlite://:memory:")
+
+from app.db import DB
+from app.importers import mbank
+from app.importers.importer import Importer
+from app.models import User
+from benchmarks.synthetic import make_rulebook, write_mbank_statement
+
+
+def new_user(db: DB, rules: list[str]) -> str:
+    user_id = db.create_user(
+        User(username=f"bench-import-{time.time_ns()}", hashed_password="-")
+    )
+    for rule in rules:
+        db.add_rule(user_id, {"user_id": user_id, "rule": rule, "active": True})
+    return user_id
+
+
+def measure(case: Callable[[], int], runs: int) -> tuple[float, int, int]:
+    """Best rows/sec over ``runs`` runs, the row count and the peak bytes allocated in one more run."""
+    best = float("inf")
+    count = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        count = case()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return count / best, count, peak - before
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, default=100_000, help="Transaction rows in the statement"
+    )
+    parser.add_argument(
+        "--rules", type=int, default=92, help="Rules of the importing user"
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Runs per case (best is reported)"
+    )
+    args = parser.parse_args(argv)
+
+    db = DB.get_instance()
+    rules = make_rulebook(args.rules)
+    with tempfile.TemporaryDirectory(prefix="bench-importer-") as tmp:
+        path = write_mbank_statement(Path(tmp) / "statement.csv", args.rows)
+        data = path.read_text(encoding="utf-8")
+
+        def parse_lines() -> int:
+            with path.open(encoding="utf-8") as file:
+                return sum(1 for _ in mbank.parse_lines(file, "bench-user"))
+
+        cases: dict[str, Callable[[], int]] = {
+            "mbank.parse": lambda: len(mbank.parse(data, "bench-user")),
+            "mbank.parse_lines (file)": parse_lines,
+            "Importer.import_from_file": lambda: (
+                Importer(new_user(db, rules)).import_from_file(path).inserted
+            ),
+        }
+
+        print(
+            f"{args.rows} rows, {path.stat().st_size / 1e6:.1f} MB statement, {args.rules} rules\n"
+        )
+        print(f"{'case':<28}{'rows':>10}{'rows/sec':>12}{'peak MB':>10}")
+        for name, case in cases.items():
+            rate, count, peak = measure(case, args.runs)
+            print(f"{name:<28}{count:>10}{rate:>12,.0f}{peak / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark mBank statement parsing throughput (rows/sec).
+
+The input is the sample statement from the test data with its transaction rows
+repeated ``--repeat`` times. ``--baseline REV`` additionally loads
+``app/importers/mbank.py`` as it was at git revision ``REV`` and runs the same
+input through it. To compare against the two-pass parser that the streaming
+parser replaced, pass the commit before the streaming parser (``REV`` is any
+git revision, e.g. ``<commit>^`` for the parent of the commit that introduced it)::
+
+    python -m benchmarks.bench_mbank_parser --baseline <commit-before-streaming-parser>
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_mbank_parser --repeat 100
+"""
+
+import argparse
+import subprocess
+import time
+import types
+from collections.abc import Callable
+from pathlib import Path
+
+from app.importers import mbank
+
+SAMPLE = (
+    Path(__file__).resolve().parents[1]
+    / "tests"
+    / "data"
+    / "mbank"
+    / "01924152_240801_241031.csv"
+)
+MODULE_PATH = "backend/app/importers/mbank.py"
+
+
+def make_statement(repeat: int) -> str:
+    lines = SAMPLE.read_text(encoding="utf-8").splitlines()
+    header_idx = next(
+        i for i, line in enumerate(lines) if line.startswith(mbank.HEADER_MARKER)
+    )
+    rows = [line for line in lines[header_idx + 1 :] if line.count(";") >= 10]
+    return "\n".join(lines[: header_idx + 1] + rows * repeat) + "\n"
+
+
+def load_baseline(rev: str) -> types.ModuleType:
+    source = subprocess.run(
+        ["git", "show", f"{rev}:{MODULE_PATH}"],
+        check=True,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    ).stdout
+    module = types.ModuleType(f"mbank_{rev}")
+    # Our own source at another revision, not untrusted input
+    exec(compile(source, f"{rev}:{MODULE_PATH}", "exec"), module.__dict__)  # noqa: S102
+    return module
+
+
+def rows_per_sec(parse: Callable[[], int], runs: int) -> tuple[float, int]:
+    best = float("inf")
+    count = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        count = parse()
+        best = min(best, time.perf_counter() - start)
+    return count / best, count
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=100,
+        help="Copies of the sample rows in the statement",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Runs per parser (best is reported)"
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="REV",
+        help="Also benchmark mbank.py from this git revision",
+    )
+    args = parser.parse_args(argv)
+
+    data = make_statement(args.repeat)
+    parsers: dict[str, Callable[[], int]] = {
+        "parse (list)": lambda: len(mbank.parse(data, "bench-user")),
+        "parse_lines (generator)": lambda: sum(
+            1 for _ in mbank.parse_lines(iter(data.splitlines()), "bench-user")
+        ),
+    }
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        parsers[f"baseline {args.baseline}"] = lambda: len(
+            baseline.parse(data, "bench-user")
+        )
+
+    print(f"{len(data) / 1e6:.1f} MB statement\n")
+    print(f"{'parser':<28}{'rows':>10}{'rows/sec':>12}")
+    for name, parse in parsers.items():
+        rate, count = rows_per_sec(parse, args.runs)
+        print(f"{name:<28}{count:>10}{rate:>12,.0f}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
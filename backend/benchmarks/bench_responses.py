@@ -0,0 +1,149 @@
+"""Benchmark JSON serialization and compression of large transaction responses.
+
+Compares the CPU time to turn N transaction documents into response bytes:
+
+* ``jsonable_encoder`` + ``json.dumps`` (FastAPI's generic path)
+* response-model validation + pydantic ``dump_json`` (FastAPI fast path)
+* ``FastJSONResponse`` on the raw projected documents (what ``GET /transactions`` does)
+
+and the bytes on the wire for identity, gzip and brotli (when installed).
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_responses --count 10000
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.compression import BROTLI_QUALITY, GZIP_LEVEL
+from app.responses import FastJSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MERCHANTS = [
+    "LIDL SK",
+    "TESCO BZENOV",
+    "COOP PO PJ 063",
+    "SHELL 1234",
+    "BOLT.EU",
+    "DM DROGERIE",
+    "IKEA BRATISLAVA",
+]
+
+
+def make_documents(count: int, full: bool) -> list[dict]:
+    rng = random.Random(42)
+    start = datetime(2020, 1, 1)
+    docs = []
+    for i in range(count):
+        merchant = rng.choice(MERCHANTS)
+        doc = {
+            "_id": str(ObjectId()),
+            "date": start + timedelta(hours=i * 7),
+            "amount": round(-rng.uniform(1, 150), 2),
+            "transaction_type": "card_payment",
+            "counterparty": {"merchant": {"name": merchant}},
+            "category": rng.choice(["groceries", "fuel", "transport", None]),
+            "tags": rng.sample(["food", "weekly", "car", "family"], k=2),
+            "description": f"{merchant} /BRATISLAVA DÁTUM VYKONANIA TRANSAKCIE: 2024-08-08",
+        }
+        if full:
+            doc["asset"] = {
+                "bank": {
+                    "account_name": "MKONTO",
+                    "iban": "SK9283605207004201924152",
+                    "bic": "BREXSKBX",
+                }
+            }
+            doc["details"] = {
+                "balance": round(rng.uniform(0, 5000), 2),
+                "currency": "EUR",
+                "operation_type": "PLATBA KARTOU",
+                "location": "BRATISLAVA",
+                "symbols": {"ks": "", "vs": "", "ss": ""},
+            }
+        docs.append({k: v for k, v in doc.items() if v is not None})
+    return docs
+
+
+def cpu_ms(func: Callable[[], bytes], repeat: int) -> tuple[float, bytes]:
+    best = float("inf")
+    body = b""
+    for _ in range(repeat):
+        start = time.process_time()
+        body = func()
+        best = min(best, time.process_time() - start)
+    return best * 1000, body
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--count", type=int, default=10_000, help="Transactions per response"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per measurement (best is reported)"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Serialize full documents instead of the list field set",
+    )
+    args = parser.parse_args(argv)
+
+    # Imported here: the router module pulls in the DB layer
+    from app.routers.transactions import TransactionView
+
+    docs = make_documents(args.count, args.full)
+    adapter = TypeAdapter(list[TransactionView])
+
+    serializers = {
+        "jsonable_encoder+json.dumps": lambda: json.dumps(
+            jsonable_encoder(docs)
+        ).encode("utf-8"),
+        "response_model+dump_json": lambda: adapter.dump_json(
+            adapter.validate_python(docs), by_alias=True, exclude_unset=True
+        ),
+        "FastJSONResponse (raw docs)": lambda: FastJSONResponse(docs).body,
+    }
+
+    print(f"{args.count} transactions ({'full' if args.full else 'list'} field set)\n")
+    print(f"{'serializer':<32}{'cpu ms':>10}{'bytes':>12}")
+    body = b""
+    for name, func in serializers.items():
+        ms, body = cpu_ms(func, args.repeat)
+        print(f"{name:<32}{ms:>10.1f}{len(body):>12}")
+
+    encoders = {
+        "identity": lambda: body,
+        f"gzip (level {GZIP_LEVEL})": lambda: gzip.compress(
+            body, compresslevel=GZIP_LEVEL
+        ),
+    }
+    if brotli is not None:
+        encoders[f"brotli (quality {BROTLI_QUALITY})"] = lambda: brotli.compress(
+            body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY
+        )
+    else:
+        print("\nbrotli not installed; skipping brotli")
+
+    print(f"\n{'encoding':<32}{'cpu ms':>10}{'bytes':>12}")
+    for name, func in encoders.items():
+        ms, encoded = cpu_ms(func, args.repeat)
+        print(f"{name:<32}{ms:>10.1f}{len(encoded):>12}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,241 @@
+"""Benchmark rule parsing, RuleEngine construction and apply_rules as rulebooks grow.
+
+Runs on synthetic data (``benchmarks.synthetic``) over a grid of rulebook sizes
+and transaction counts:
+
+* ``parse_rule/<rules>``: parsing every rule text of the rulebook
+* ``engine/<rules>``: ``RuleEngine(user_id)``, i.e. reading the user's rules
+  from the database (``MONGO_URI``, an in-memory SQLite database by default)
+  and parsing them
+* ``apply_rules/<rules>x<transactions>``: ``apply_rules`` over the
+  transactions in batches of ``APPLY_BATCH_SIZE``, as the apply job does
+
+Each case runs ``--runs`` times and the best time is kept. Cells with more
+than ``--max-evaluations`` rule evaluations are skipped; the full grid of
+5,000 rules against 1M transactions takes hours. Transactions beyond
+``POOL_SIZE`` reuse the pool from the start, so a million of them do not
+have to fit in memory.
+
+``--output`` writes the results as JSON with the commit they were measured
+at; ``--compare`` checks them against an earlier file and exits with status 1
+when a case got slower by more than ``--threshold``::
+
+    python -m benchmarks.bench_rule_engine --output base.json
+    git checkout my-branch
+    python -m benchmarks.bench_rule_engine --output new.json --compare base.json
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_rule_engine --rules 10 100 --transactions 1000 10000
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from functools import partial
+from pathlib import Path
+from typing import TypeVar
+
+# Before app.db picks the backend
+os.environ.setdefault("MONGO_URI", "sqlite://:memory:")
+
+from app.db import DB
+from app.jobs import APPLY_BATCH_SIZE
+from app.models import Transaction, User
+from app.rules.parser import parse_rule
+from app.rules.rule_engine import RuleEngine
+from benchmarks.synthetic import make_rulebook, make_transactions
+
+RULE_COUNTS = (10, 100, 1000, 5000)
+TRANSACTION_COUNTS = (1_000, 10_000, 100_000, 1_000_000)
+POOL_SIZE = 100_000
+
+T = TypeVar("T")
+
+
+def best_of(runs: int, func: Callable[[], T]) -> tuple[float, T]:
+    """Fastest of ``runs`` calls of ``func`` in seconds, and what the last call returned."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def parse_all(rules: list[str]) -> list:
+    return [parse_rule(rule) for rule in rules]
+
+
+def seed_rules(db: DB, rules: list[str]) -> str:
+    user_id = db.create_user(
+        User(username=f"bench-{len(rules)}-{time.time_ns()}", hashed_password="-")
+    )
+    for rule in rules:
+        db.add_rule(user_id, {"user_id": user_id, "rule": rule, "active": True})
+    return user_id
+
+
+def apply_all(engine: RuleEngine, pool: list[Transaction], count: int) -> int:
+    """Run ``count`` transactions from ``pool`` through ``engine``; returns the number of matches."""
+    matched = 0
+    for start in range(0, count, APPLY_BATCH_SIZE):
+        offset = start % len(pool)
+        matched += len(
+            engine.apply_rules(
+                pool[offset : offset + min(APPLY_BATCH_SIZE, count - start)]
+            )
+        )
+    return matched
+
+
+def run(
+    rule_counts: list[int],
+    transaction_counts: list[int],
+    runs: int,
+    max_evaluations: int,
+) -> dict:
+    db = DB.get_instance()
+    pool = make_transactions(min(max(transaction_counts), POOL_SIZE))
+    results: dict[str, dict] = {}
+
+    def record(name: str, seconds: float, items: int, matched: int | str = "") -> None:
+        results[name] = {"seconds": seconds, "items": items}
+        if matched != "":
+            results[name]["matched"] = matched
+        print(
+            f"{name:<28}{seconds:>12.4f}{seconds / items * 1e6:>12.2f}us{matched:>10}"
+        )
+
+    print(f"{'case':<28}{'seconds':>12}{'per item':>14}{'matched':>10}")
+    for rule_count in rule_counts:
+        rules = make_rulebook(rule_count)
+        # partial binds this iteration's values, unlike a closure over the loop variables
+        seconds, _ = best_of(runs, partial(parse_all, rules))
+        record(f"parse_rule/{rule_count}", seconds, rule_count)
+
+        user_id = seed_rules(db, rules)
+        seconds, _ = best_of(runs, partial(RuleEngine, user_id))
+        record(f"engine/{rule_count}", seconds, rule_count)
+
+        engine = RuleEngine(user_id)
+        for transaction_count in transaction_counts:
+            name = f"apply_rules/{rule_count}x{transaction_count}"
+            if rule_count * transaction_count > max_evaluations:
+                results[name] = {"skipped": True}
+                print(f"{name:<28}{'skipped':>12}")
+                continue
+            seconds, matched = best_of(
+                runs, partial(apply_all, engine, pool, transaction_count)
+            )
+            record(name, seconds, transaction_count, matched)
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Print the change of every case measured in both runs; returns the cases slower by more than ``threshold``."""
+    regressions = []
+    print(
+        f"\nAgainst {baseline.get('commit') or 'baseline'} (threshold {threshold:.0%}):"
+    )
+    print(f"{'case':<28}{'before':>12}{'after':>12}{'change':>9}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if result.get("skipped") or not before or before.get("skipped"):
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(
+            f"{name:<28}{before['seconds']:>12.4f}{result['seconds']:>12.4f}{change:>+9.1%}{flag}"
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rules", type=int, nargs="+", default=RULE_COUNTS, help="Rulebook sizes"
+    )
+    parser.add_argument(
+        "--transactions",
+        type=int,
+        nargs="+",
+        default=TRANSACTION_COUNTS,
+        help="Transaction counts",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Runs per case (best is reported)"
+    )
+    parser.add_argument(
+        "--max-evaluations",
+        type=int,
+        default=20_000_000,
+        help="Skip cells with more rules x transactions",
+    )
+    parser.add_argument(
+        "--output", type=Path, help="Write the results to this JSON file"
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        metavar="BASELINE",
+        help="Compare with results from an earlier run",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Slowdown that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(
+        sorted(args.rules), sorted(args.transactions), args.runs, args.max_evaluations
+    )
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": args.runs,
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if args.compare:
+        regressions = compare(
+            json.loads(args.compare.read_text(encoding="utf-8")), report, args.threshold
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
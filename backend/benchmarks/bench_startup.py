@@ -0,0 +1,88 @@
+"""Benchmark import time of the app and of the rule parser.
+
+Each module is imported in ``--runs`` fresh interpreters under
+``python -X importtime``; the best cumulative time is reported together with
+the slowest ``--top`` imports of that run, and the exit status is 1 when a
+module exceeds its ``IMPORT_TIME_BUDGET_MS``. ``tests/test_startup.py``
+checks the same budget under the opt-in ``perf`` marker
+(``pytest -m perf``).
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_startup --runs 3 --top 10
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+# Measured at about 500 ms and 5 ms; the margin absorbs slow machines, a regression such as an
+# eager import of pyarrow or pydantic in the rule parser does not fit
+IMPORT_TIME_BUDGET_MS = {"app.main": 1500, "app.rules.parser": 60}
+
+
+def import_times(module: str) -> list[tuple[float, str]]:
+    """Cumulative milliseconds of ``module`` and of every module it imported, ``module`` last."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    # "import time: self [us] | cumulative | imported package", nested imports indented below
+    # their importer. Walk back from ``module`` to the previous top-level import, which is
+    # interpreter startup (site) or a parent package.
+    times = []
+    for line in reversed(result.stderr.splitlines()):
+        _, cumulative, name = line.split("|")
+        if times and not name.startswith("  "):
+            break
+        times.append((int(cumulative) / 1000, name.strip()))
+    return times[::-1]
+
+
+def best_import_times(module: str, runs: int) -> list[tuple[float, str]]:
+    """``import_times`` of the fastest of ``runs`` fresh interpreters."""
+    return min(
+        (import_times(module) for _ in range(runs)), key=lambda times: times[-1][0]
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=list(IMPORT_TIME_BUDGET_MS),
+        help="Modules to import",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Fresh interpreters per module (best is reported)",
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Slowest imports to list per module"
+    )
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for module in args.modules:
+        times = best_import_times(module, args.runs)
+        total, budget = times[-1][0], IMPORT_TIME_BUDGET_MS.get(module)
+        status = ""
+        if budget is not None:
+            over_budget |= total >= budget
+            status = f" (budget {budget} ms{', EXCEEDED' if total >= budget else ''})"
+        print(f"{module}: {total:.0f} ms{status}")
+        for ms, name in sorted(times[:-1], reverse=True)[: args.top]:
+            print(f"  {ms:>8.1f} ms  {name}")
+    if over_budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
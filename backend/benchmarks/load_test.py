@@ -0,0 +1,387 @@
+"""End-to-end API load test: seeded users driving the main endpoints concurrently.
+
+Seeds ``--users`` users with synthetic transactions and rules
+(``benchmarks.synthetic``) through the ``DB`` layer, starts the app with
+uvicorn on a free local port, and runs ``--concurrency`` virtual users for
+``--duration`` seconds. Each virtual user logs in as one of the seeded users
+and then picks requests at random by the weights in ``--mix``:
+
+* ``login``: ``POST /auth/login``
+* ``list``: ``GET /transactions``
+* ``patch``: ``PATCH /transactions/<id>`` with a new category and tags
+* ``categories`` / ``tags``: ``GET /categories`` and ``GET /tags``
+* ``apply``: ``POST /actions/apply_all_rules``
+
+Throughput and p50/p95/p99 latency are reported per endpoint; ``--output``
+also writes them as JSON with the settings, to compare worker counts and pool
+sizes between runs.
+
+The database is ``--mongo-uri``: a local ``mongod``
+(``mongodb://localhost:27017/?maxPoolSize=20`` sets the pool size) or, by
+default, an embedded SQLite file in a temporary directory. Server settings
+are passed with ``--env``, e.g. ``--env JOB_WORKERS=4``. Seeded users that
+already exist are reused, so a run against a persistent database seeds once.
+
+``--in-process`` skips uvicorn and calls the app through ``httpx.ASGITransport``
+in this process (any ``MONGO_URI``, mongomock included). It checks the
+harness and the endpoints; the numbers are not comparable with a served app.
+
+Usage (from ``backend/``):
+    python -m benchmarks.load_test --users 20 --concurrency 50 --workers 4 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from app.db import DB, create_db
+from app.models import User
+from app.passwords import PASSWORD_HASH_ROUNDS, crypt_context
+from benchmarks.synthetic import CATEGORIES, TAGS, make_rulebook, make_transactions
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PASSWORD = "load-test-password"
+DEFAULT_MIX = "login=1,list=10,patch=4,categories=3,tags=3,apply=1"
+STARTUP_TIMEOUT = 30
+
+
+def seed_users(db: DB, users: int, transactions: int, rules: int) -> list[str]:
+    """Usernames of ``users`` seeded users, creating the ones that do not exist yet."""
+    hashed_password = crypt_context(PASSWORD_HASH_ROUNDS).hash(PASSWORD)
+    rulebook = make_rulebook(rules)
+    usernames = []
+    for idx in range(users):
+        username = f"load-user-{idx:04d}"
+        usernames.append(username)
+        try:
+            db.get_user(username)
+            continue
+        except ValueError:
+            pass
+        user_id = db.create_user(
+            User(username=username, hashed_password=hashed_password)
+        )
+        db.insert_transactions(
+            make_transactions(transactions, user_id=user_id, seed=idx)
+        )
+        for rule in rulebook:
+            db.add_rule(user_id, {"user_id": user_id, "rule": rule, "active": True})
+    return usernames
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: dict[str, str]) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+    ]
+    command += ["--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"Server exited with status {server.returncode}")
+        try:
+            if (
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).status_code
+                == 200
+            ):
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    sys.exit(f"Server did not answer within {STARTUP_TIMEOUT}s")
+
+
+@dataclass
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def summary(self, seconds: float) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            # nearest rank, in milliseconds
+            return (
+                round(latencies[max(0, int(len(latencies) * p + 0.5) - 1)] * 1000, 2)
+                if latencies
+                else 0.0
+            )
+
+        return {
+            "requests": len(latencies),
+            "errors": dict(self.errors),
+            "per_second": round(len(latencies) / seconds, 1),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+
+class VirtualUser:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        username: str,
+        stats: dict[str, EndpointStats],
+        seed: int,
+    ):
+        self.client = client
+        self.username = username
+        self.stats = stats
+        self.rng = random.Random(seed)
+        self.headers: dict[str, str] = {}
+        self.transaction_ids: list[str] = []
+
+    async def request(
+        self, name: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=self.headers, **kwargs
+            )
+        except httpx.HTTPError as exc:
+            self.stats[name].errors[type(exc).__name__] += 1
+            return None
+        self.stats[name].latencies.append(time.perf_counter() - start)
+        if response.is_error:
+            self.stats[name].errors[str(response.status_code)] += 1
+            return None
+        return response
+
+    async def login(self) -> None:
+        form = {"username": self.username, "password": PASSWORD}
+        response = await self.request("login", "POST", "/auth/login", data=form)
+        if response is not None:
+            self.headers = {
+                "Authorization": f"Bearer {response.json()['access_token']}"
+            }
+
+    async def list_transactions(self) -> None:
+        response = await self.request("list", "GET", "/transactions")
+        if response is not None:
+            self.transaction_ids = [tx["_id"] for tx in response.json()]
+
+    async def patch_transaction(self) -> None:
+        if not self.transaction_ids:
+            await self.list_transactions()
+            return
+        body = {
+            "category": self.rng.choice(CATEGORIES),
+            "tags": self.rng.sample(TAGS, 2),
+        }
+        await self.request(
+            "patch",
+            "PATCH",
+            f"/transactions/{self.rng.choice(self.transaction_ids)}",
+            json=body,
+        )
+
+    async def list_categories(self) -> None:
+        await self.request("categories", "GET", "/categories")
+
+    async def list_tags(self) -> None:
+        await self.request("tags", "GET", "/tags")
+
+    async def apply_rules(self) -> None:
+        await self.request("apply", "POST", "/actions/apply_all_rules")
+
+    async def run(self, mix: dict[str, int], deadline: float) -> None:
+        await self.login()
+        names, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            await REQUESTS[self.rng.choices(names, weights)[0]](self)
+
+
+REQUESTS = {
+    "login": VirtualUser.login,
+    "list": VirtualUser.list_transactions,
+    "patch": VirtualUser.patch_transaction,
+    "categories": VirtualUser.list_categories,
+    "tags": VirtualUser.list_tags,
+    "apply": VirtualUser.apply_rules,
+}
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    usernames: list[str],
+    concurrency: int,
+    mix: dict,
+    duration: float,
+) -> dict:
+    stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    async with asyncio.TaskGroup() as group:
+        for idx in range(concurrency):
+            group.create_task(
+                VirtualUser(client, usernames[idx % len(usernames)], stats, idx).run(
+                    mix, deadline
+                )
+            )
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 2),
+        "endpoints": {name: stats[name].summary(seconds) for name in sorted(stats)},
+    }
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in REQUESTS:
+            raise argparse.ArgumentTypeError(f"Unknown request '{name}'")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"\n{report['seconds']}s, {report['concurrency']} virtual users, {report['workers']} worker(s)\n"
+    )
+    print(
+        f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    )
+    for name, result in report["endpoints"].items():
+        errors = sum(result["errors"].values())
+        print(
+            f"{name:<12}{result['requests']:>10}{errors:>8}{result['per_second']:>9}"
+            f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{result['max_ms']:>9}"
+        )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="Seeded users")
+    parser.add_argument(
+        "--transactions", type=int, default=2000, help="Transactions per seeded user"
+    )
+    parser.add_argument("--rules", type=int, default=100, help="Rules per seeded user")
+    parser.add_argument(
+        "--concurrency", type=int, default=20, help="Virtual users sending requests"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Seconds to send requests for"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help=f"Request weights (default {DEFAULT_MIX})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="uvicorn worker processes"
+    )
+    parser.add_argument(
+        "--mongo-uri", help="Database for the app (default: a temporary SQLite file)"
+    )
+    parser.add_argument(
+        "--mongo-db", default="load-test", help="Database name on a MongoDB server"
+    )
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Server environment setting",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Call the app in this process, without uvicorn",
+    )
+    parser.add_argument(
+        "--output", type=Path, help="Write the report to this JSON file"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="load-test-") as tmp:
+        env = dict(setting.split("=", 1) for setting in args.env)
+        env["MONGO_URI"] = args.mongo_uri or f"sqlite:///{tmp}/load-test.db"
+        env["MONGO_DB"] = args.mongo_db
+        print(f"Seeding {args.users} users into {env['MONGO_URI']}")
+        if args.in_process:
+            os.environ.update(
+                env
+            )  # read by the app modules when they are imported below
+            usernames = seed_users(
+                DB.get_instance(), args.users, args.transactions, args.rules
+            )
+            from app.main import app
+
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://load-test"
+            )
+            server = None
+        else:
+            db = create_db(env["MONGO_URI"], env["MONGO_DB"])
+            usernames = seed_users(db, args.users, args.transactions, args.rules)
+            port = free_port()
+            server = start_server(port, args.workers, env)
+            limits = httpx.Limits(max_connections=args.concurrency)
+            client = httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+            )
+
+        print(f"Running {args.concurrency} virtual users for {args.duration:g}s")
+        try:
+
+            async def run() -> dict:
+                async with client:
+                    return await drive(
+                        client, usernames, args.concurrency, args.mix, args.duration
+                    )
+
+            report = asyncio.run(run())
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = {
+        "concurrency": args.concurrency,
+        "workers": 0 if args.in_process else args.workers,
+        "users": args.users,
+        "transactions": args.transactions,
+        "rules": args.rules,
+        "mix": args.mix,
+        "database": args.mongo_uri or "temporary SQLite file",
+        "env": args.env,
+        **report,
+    }
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,400 @@
+"""Synthetic rulebooks and transactions for the benchmarks.
+
+Rulebooks start with the sample rules in ``tests/data/mbank/rules.txt`` and
+grow with generated rules of the same kinds: mostly ``merchant contains``,
+some exact merchant matches, amount ranges and two-condition ``AND``/``OR``
+rules. Transactions pay merchants the sample rules recognise, merchants of
+generated rules and merchants no rule knows, in fixed proportions, so the
+share of transactions a rulebook matches grows with the rulebook the way it
+does for a real user.
+
+``mbank_statement_lines`` writes the same kind of data as an mBank SK export
+(``app.importers.mbank``) of any length: the bank and account header, the
+transaction table with every operation type the parser handles, and the
+closing balance.
+
+Everything is seeded: the same arguments give the same data on every run.
+"""
+
+import random
+import re
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from app.models import (
+    Asset,
+    BankAccount,
+    Counterparty,
+    Details,
+    Merchant,
+    Transaction,
+    TransactionType,
+)
+
+SAMPLE_RULES = (
+    Path(__file__).resolve().parents[1] / "tests" / "data" / "mbank" / "rules.txt"
+)
+
+# Generated rules and transactions draw their merchants from this many numbered shops
+GENERATED_MERCHANTS = 5000
+
+CITIES = [
+    "BRATISLAVA",
+    "KOSICE",
+    "PRESOV",
+    "ZILINA",
+    "NITRA",
+    "POPRAD",
+    "TRNAVA",
+    "PRAHA",
+    "WIEN",
+]
+UNKNOWN_MERCHANTS = [
+    "TRAFIKA",
+    "KVETY",
+    "PEKAREN",
+    "OPRAVA OBUVI",
+    "ZMRZLINA",
+    "CUKRAREN",
+    "SALON",
+    "MASIAR",
+]
+CATEGORIES = [
+    "groceries",
+    "fuel",
+    "dining",
+    "clothing",
+    "electronics",
+    "health",
+    "books",
+    "transport",
+    "household",
+]
+TAGS = [
+    "food",
+    "transport",
+    "coffee",
+    "apparel",
+    "device",
+    "reading",
+    "health",
+    "family",
+    "work",
+    "gift",
+]
+
+_SAMPLE_RULE = re.compile(
+    r'^merchant contains (?:"(?P<quoted>[^"]+)"|(?P<plain>\S+)) -> (?P<action>.+)$'
+)
+
+
+@lru_cache(maxsize=1)
+def sample_rules() -> list[tuple[str, str]]:
+    """(merchant pattern, action) of every rule in the sample rulebook, in file order."""
+    rules = []
+    for line in SAMPLE_RULES.read_text(encoding="utf-8").splitlines():
+        match = _SAMPLE_RULE.match(line.strip())
+        if match:
+            rules.append((match["quoted"] or match["plain"], match["action"]))
+    return rules
+
+
+def generated_merchant(number: int) -> str:
+    return f"SHOP {number:05d}"
+
+
+def _action(rng: random.Random) -> str:
+    tags = rng.sample(TAGS, rng.choice((1, 1, 2)))
+    return " ".join([f"@{rng.choice(CATEGORIES)}", *(f"#{tag}" for tag in tags)])
+
+
+def make_rulebook(count: int, seed: int = 42) -> list[str]:
+    """``count`` rule texts: the sample rules first, then generated ones."""
+    rng = random.Random(seed)
+    rules = [
+        f'merchant contains "{pattern}" -> {action}'
+        for pattern, action in sample_rules()[:count]
+    ]
+    numbers = rng.sample(range(GENERATED_MERCHANTS), min(count, GENERATED_MERCHANTS))
+    while len(rules) < count:
+        merchant = generated_merchant(numbers[len(rules) % len(numbers)])
+        kind = rng.random()
+        if kind < 0.7:
+            rule = f'merchant contains "{merchant}"'
+        elif kind < 0.8:
+            rule = f'merchant == "{merchant} {rng.choice(CITIES)}"'
+        elif kind < 0.9:
+            low = rng.randint(1, 400)
+            rule = f"amount <= -{low} AND amount > -{low + rng.randint(1, 50)}"
+        elif kind < 0.95:
+            rule = f'merchant contains "{merchant}" AND amount < -{rng.randint(5, 200)}'
+        else:
+            rule = f'merchant contains "{merchant}" OR merchant contains "{rng.choice(UNKNOWN_MERCHANTS)} {len(rules)}"'
+        rules.append(f"{rule} -> {_action(rng)}")
+    return rules
+
+
+def merchant_name(rng: random.Random) -> str:
+    """A sample, generated or unknown shop."""
+    kind = rng.random()
+    if kind < 0.6:
+        return rng.choice(sample_rules())[0]
+    if kind < 0.8:
+        return generated_merchant(rng.randrange(GENERATED_MERCHANTS))
+    return rng.choice(UNKNOWN_MERCHANTS)
+
+
+def make_merchant(rng: random.Random) -> str:
+    """A merchant name as it appears on a card payment."""
+    return f"{merchant_name(rng)} {rng.choice(CITIES)}"
+
+
+def make_transactions(
+    count: int, user_id: str = "bench-user", seed: int = 42
+) -> list[Transaction]:
+    """``count`` transactions, four in five of them card payments, in date order."""
+    rng = random.Random(seed)
+    asset = Asset(
+        bank=BankAccount(
+            account_name="eKONTO", iban="SK3111000000001234567890", bic="BREXSKBX"
+        )
+    )
+    start = datetime(2020, 1, 1)
+    transactions = []
+    for idx in range(count):
+        date = start + timedelta(minutes=idx * 37)
+        if rng.random() < 0.8:
+            merchant = make_merchant(rng)
+            transaction = Transaction(
+                user_id=user_id,
+                asset=asset,
+                counterparty=Counterparty(merchant=Merchant(name=merchant)),
+                date=date,
+                amount=-round(rng.lognormvariate(3, 1.1), 2),
+                transaction_type=TransactionType.CARD_PAYMENT,
+                description=f"PLATBA KARTOU {merchant}",
+                details=Details(currency="EUR", operation_type="PLATBA KARTOU"),
+            )
+        else:
+            name = rng.choice(UNKNOWN_MERCHANTS + ["ATT GNS", "Najom", "ELEKTRINA"])
+            incoming = rng.random() < 0.3
+            transaction = Transaction(
+                user_id=user_id,
+                asset=asset,
+                counterparty=Counterparty(
+                    bank=BankAccount(
+                        account_name=name, iban=f"SK{rng.randrange(10**22):022d}"
+                    )
+                ),
+                date=date,
+                amount=round(
+                    rng.uniform(50, 3000) if incoming else -rng.uniform(5, 800), 2
+                ),
+                transaction_type=TransactionType.TRANSFER,
+                description=f"PRIJATÁ PLATBA {name}"
+                if incoming
+                else f"ODCHÁDZAJÚCA PLATBA {name}",
+                details=Details(currency="EUR", message_for_recipient=name),
+            )
+        transactions.append(transaction)
+    return transactions
+
+
+# Operation types of mBank SK statements, weighted as in the sample statement; every type
+# app.importers.mbank handles is here
+MBANK_OPERATIONS = {
+    "PLATBA KARTOU": 187,
+    "TRVALÁ PLATBA MEDZIBANKOVÁ": 57,
+    "PRIJATÁ PLATBA MEDZIBANKOVÁ": 18,
+    "MEDZIBANKOVÝ PREVOD": 18,
+    "VÝBER V BANKOMATE": 14,
+    "INKASO": 6,
+    "ZRÝCHLENÁ PLATBA TUZEMSKÁ": 3,
+    "TRVALÁ PLATBA DO MBANK": 3,
+    "POPL. ZA PREDEF. ZRÝCHLENÚ PLATBU": 2,
+    "POPLATOK ZA ZRÝCHLENÚ PLATBU": 1,
+    "STORNO DEBET.OPERÁCIE": 1,
+    "POS VRÁTENIE TOVARU": 1,
+}
+MBANK_IBAN = "SK9283605207004201924152"
+MBANK_OPENING_BALANCE = 2101.23
+_CARD_OPERATIONS = {"PLATBA KARTOU", "VÝBER V BANKOMATE", "POS VRÁTENIE TOVARU"}
+_PAYEES = [
+    ("BYTOVE DRUZSTVO PRESOV", "PREVOD PROSTRIEDKOV"),
+    ("MS PROFI", "INTERNET - ALEXOVIC"),
+]
+_PAYEES += [
+    ("UNION - POISŤOVŇA", "POISTENIE DOMU A DOMACNOSTI"),
+    ("DENNIK POSTOJ", "PREDPLATNE"),
+]
+_PAYEES += [("O2 Slovakia, s.r.o.", "DIRECT DEBIT"), ("ESS", "STRAVNE")]
+_PAYEES += [("ZUZANA ALEXOVIČOVÁ", "PREVOD PROSTRIEDKOV")]
+_PAYERS = [
+    ("AT-T GLOBAL NETWORK SERVICES", "ATT GNS"),
+    ("Ilenin Marek, Mgr.", "Najom"),
+    ("Rastislav Alexovic", "Dar"),
+]
+
+
+def _mbank_amount(value: float) -> str:
+    """``-1 234,56``: space as thousands separator, decimal comma."""
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",")
+
+
+def _mbank_iban(rng: random.Random) -> str:
+    return f"SK{rng.randrange(10**22):022d}"
+
+
+def _mbank_rows(
+    count: int, seed: int
+) -> Iterator[tuple[datetime, str, str, str, str, str, float]]:
+    """(posting date, operation, description, counterparty, account, symbols, amount) of each row."""
+    rng = random.Random(seed)
+    operations, weights = list(MBANK_OPERATIONS), list(MBANK_OPERATIONS.values())
+    date = datetime(2018, 1, 2)
+    balance = MBANK_OPENING_BALANCE
+    for idx in range(count):
+        # About 3.5 rows a day, as in the sample
+        if rng.random() < 0.28:
+            date += timedelta(days=1)
+        # Draw the rare types early, so short statements have every type as well
+        operation = (
+            operations[idx]
+            if idx < len(operations)
+            else rng.choices(operations, weights)[0]
+        )
+        salary = balance < 300 and idx >= len(operations)
+        if salary:
+            operation = "PRIJATÁ PLATBA MEDZIBANKOVÁ"
+        description, counterparty, account, symbols = "", "", "", ";;"
+        if operation in _CARD_OPERATIONS:
+            merchant = merchant_name(rng)[:18].replace("/", " ")
+            executed = date - timedelta(days=rng.choice((0, 1, 1, 2)))
+            location = rng.choice(CITIES).title()
+            description = f"{merchant:<19}/{location:<50}DÁTUM VYKONANIA TRANSAKCIE: {executed:%Y-%m-%d}"
+            if operation == "VÝBER V BANKOMATE":
+                amount = -float(rng.choice((20, 50, 100, 150, 200, 300)))
+            elif operation == "POS VRÁTENIE TOVARU":
+                amount = round(rng.uniform(5, 60), 2)
+            else:
+                amount = -round(rng.lognormvariate(3, 1.1), 2)
+        elif operation.startswith("POPL"):
+            amount = -0.2
+        elif operation == "STORNO DEBET.OPERÁCIE":
+            description = "ZRUŠENIE PREVODU"
+            amount = round(rng.uniform(5, 100), 2)
+        elif operation == "PRIJATÁ PLATBA MEDZIBANKOVÁ":
+            counterparty, description = _PAYERS[0] if salary else rng.choice(_PAYERS)
+            account = _mbank_iban(rng)
+            symbols = f";{rng.randrange(10**10):010d};"
+            amount = round(
+                rng.uniform(2000, 3500) if salary else rng.uniform(20, 500), 2
+            )
+        else:
+            counterparty, description = rng.choice(_PAYEES)
+            account = _mbank_iban(rng)
+            symbols = (
+                f"{rng.choice(('', '0138', '0558'))};{rng.randrange(10**10):010d};"
+            )
+            amount = -round(rng.uniform(10, 300), 2)
+        balance += amount
+        yield date, operation, description, counterparty, account, symbols, amount
+
+
+def mbank_statement_lines(count: int, seed: int = 42) -> Iterator[str]:
+    """Lines of an mBank SK statement export with ``count`` transaction rows, without line ends.
+
+    Rows are generated twice, once for the totals in the header, so any number of rows can
+    be written out without holding them in memory.
+    """
+    credit = debit = 0
+    credit_sum = debit_sum = 0.0
+    first = last = datetime(2018, 1, 2)
+    for date, _, _, _, _, _, amount in _mbank_rows(count, seed):
+        if amount > 0:
+            credit, credit_sum = credit + 1, credit_sum + amount
+        else:
+            debit, debit_sum = debit + 1, debit_sum - amount
+        last = date
+    closing = MBANK_OPENING_BALANCE + credit_sum - debit_sum
+
+    yield from [
+        "mBank S.A., pobočka zahraničnej banky;",
+        "Pribinova 10, 811 09 Bratislava;",
+        "www.mBank.sk;",
+        "mLinka: 0850 60 60 50;",
+        "",
+        "#Klient;",
+        "JANA TESTOVACIA;",
+        "HLAVNA 1;",
+        "080 01 PRESOV;",
+        "SLOVENSKO;",
+        "",
+        "PREHĽAD OPERÁCIÍ;",
+        "",
+        "#Za obdobie:;",
+        f"{first:%d.%m.%Y};{last:%d.%m.%Y};",
+        "#Vyhotovené;",
+        f"{last + timedelta(days=1):%d.%m.%Y};",
+        "#Spôsob zasielania:;",
+        "elektronicky;",
+        "",
+        "#Typ účtu:;",
+        "MKONTO;",
+        "#Mena účtu:;",
+        "EUR;",
+        "#Číslo účtu:;",
+        f"{MBANK_IBAN};",
+        "#IBAN:;",
+        f"{MBANK_IBAN};",
+        "#BIC:;",
+        "BREXSKBX;",
+        "",
+        "#Prehľad obratov na účte;#Počet operácií;#Suma;",
+        f"Kreditné položky;{credit};{_mbank_amount(credit_sum)} EUR;",
+        f"Debetné položky;{debit};{_mbank_amount(debit_sum)} EUR;",
+        f"Súčet;{credit + debit};{_mbank_amount(credit_sum - debit_sum)} EUR;",
+        "",
+        f";;;;;;#Počiatočný zostatok:;{_mbank_amount(MBANK_OPENING_BALANCE)} ;",
+        "",
+        (
+            "#Dátum zaúčtovania transakcie;#Dátum uskutočnenia transakcie;#Popis operácie;#Popis;#Platca/Príjemca;"
+            "#Číslo účtu platcu/príjemcu;#KS;#VS;#ŠS;#Suma transakcie;#Účtovný zostatok po transakcii;"
+        ),
+    ]
+    balance = MBANK_OPENING_BALANCE
+    for (
+        date,
+        operation,
+        description,
+        counterparty,
+        account,
+        symbols,
+        amount,
+    ) in _mbank_rows(count, seed):
+        balance = round(balance + amount, 2)
+        posted = f"{date:%d-%m-%Y}"
+        yield (
+            f'{posted};{posted};"{operation}";"{description}";"{counterparty}  ";\'{account}\';{symbols};'
+            f"{_mbank_amount(amount)};{_mbank_amount(balance)};"
+        )
+    yield from [
+        "",
+        "",
+        f";;;;;;#Konečný zostatok:;{_mbank_amount(closing)} ;",
+        "",
+        "Prosíme Vás o kontrolu uvedených údajov. V prípade akýchkoľvek nezrovnalostí nás kontaktujte.",
+    ]
+
+
+def make_mbank_statement(count: int, seed: int = 42) -> str:
+    return "\n".join(mbank_statement_lines(count, seed)) + "\n"
+
+
+def write_mbank_statement(path: Path, count: int, seed: int = 42) -> Path:
+    with path.open("w", encoding="utf-8") as file:
+        for line in mbank_statement_lines(count, seed):
+            file.write(line + "\n")
+    return path
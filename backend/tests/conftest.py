@@ -4,7 +4,6 @@ import time
 import pytest
 from pathlib import Path
 from fastapi.testclient import TestClient
-from mongomock import Collection
 from app.db import DB
 
 # Ensure backend root (directory containing 'app') is on sys.path even if pytest is launched oddly
@@ -18,7 +17,8 @@ def mongo_uri() -> str:
     """Provide Mongo URI; default to mongomock unless MONGO_URI provided externally.
 
     If a developer wants to point at a real Mongo instance they can export MONGO_URI
-    before running pytest, e.g. MONGO_URI='mongodb://localhost:27017/'.
+    before running pytest, e.g. MONGO_URI='mongodb://localhost:27017/'. Tests only
+    use the DB interface, so MONGO_URI='sqlite://:memory:' runs them on SQLite.
     """
     return os.getenv("MONGO_URI", "mongomock://localhost")
 
@@ -40,33 +40,22 @@ def app_client(mongo_uri: str, test_db_name: str) -> TestClient:
 
 
 @pytest.fixture()
-def users_collection() -> Collection:
-    return DB.get_instance()._users_collection
-
-
-@pytest.fixture()
-def rules_collection() -> Collection:
-    return DB.get_instance()._rules_collection
-
-
-@pytest.fixture()
-def transactions_collection() -> Collection:
-    return DB.get_instance()._transactions_collection
+def db(app_client) -> DB:
+    return DB.get_instance()
 
 
 @pytest.fixture(autouse=True)
-def init_db(
-    app_client, users_collection: Collection, rules_collection: Collection, transactions_collection: Collection
-):
-    users_collection.delete_many({})
-    rules_collection.delete_many({})
-    transactions_collection.delete_many({})
+def init_db(db: DB):
+    db.clear()
     yield
 
 
+AUTH_USERNAME = "tester@example.com"
+
+
 @pytest.fixture()
 def auth_token(app_client) -> str:
-    email = "tester@example.com"
+    email = AUTH_USERNAME
     password = "Secret123!"
     # Register (use username as primary identifier; keep email optional)
     r = app_client.post("/auth/register", json={"username": email, "email": email, "password": password})
@@ -80,3 +69,9 @@ def auth_token(app_client) -> str:
     assert r2.status_code == 200, r2.text
     token = r2.json()["access_token"]
     return token
+
+
+@pytest.fixture()
+def user_id(auth_token: str, db: DB) -> str:
+    """Id of the user ``auth_token`` was issued to."""
+    return db.get_user(AUTH_USERNAME).id
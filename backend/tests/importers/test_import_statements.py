@@ -0,0 +1,48 @@
+import shutil
+from pathlib import Path
+
+from app.db import DB
+from app.models import User
+from app.scripts import import_statements
+
+DATA_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "data"
+    / "mbank"
+    / "01924152_240801_241031.csv"
+)
+
+
+def test_import_directory_per_user_and_tolerate_failures(tmp_path, db: DB):
+    alice_id = db.create_user(User(username="alice", hashed_password="x"))
+    (tmp_path / "alice").mkdir()
+    (tmp_path / "bob").mkdir()
+    shutil.copy(DATA_PATH, tmp_path / "alice" / "2024-10.csv")
+    shutil.copy(DATA_PATH, tmp_path / "alice" / "2024-10-again.csv")
+    (tmp_path / "alice" / "broken.csv").write_text(
+        DATA_PATH.read_text(encoding="utf-8").replace("01-09-2024", "31-02-2024"),
+        encoding="utf-8",
+    )
+    (tmp_path / "bob" / "2024-10.csv").write_text("not a statement", encoding="utf-8")
+
+    files, unmatched = import_statements.expand_paths(
+        [str(tmp_path), str(tmp_path / "alice" / "*.csv"), "missing/*"]
+    )
+    assert [f.name for f in files] == [
+        "2024-10-again.csv",
+        "2024-10.csv",
+        "broken.csv",
+        "2024-10.csv",
+    ]
+    assert unmatched == ["missing/*"]
+
+    summaries = import_statements.run_imports(files, None, workers=0)
+
+    first, second, broken, bob = summaries
+    assert (
+        first.error is None
+        and first.inserted == len(db.find_transactions(alice_id)) > 50
+    )
+    assert (second.inserted, second.duplicates) == (0, first.inserted)
+    assert broken.error.startswith("ValueError")
+    assert bob.username == "bob" and bob.error == "User 'bob' not found"
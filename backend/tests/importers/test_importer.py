@@ -0,0 +1,173 @@
+import io
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.db import DB
+from app.importers import importer as importer_module
+from app.importers import mbank
+from app.importers.fingerprint import make_fingerprint
+from app.models import User
+
+DATA_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "data"
+    / "mbank"
+    / "01924152_240801_241031.csv"
+)
+
+
+def test_reimport_skips_duplicates(db: DB):
+    user_id = db.create_user(User(username="importer", hashed_password="x"))
+    importer = importer_module.Importer(user_id)
+
+    first = importer.import_from_file(DATA_PATH)
+    assert first.inserted > 50
+    assert first.skipped == 0
+
+    second = importer.import_from_file(DATA_PATH)
+    assert second.inserted == 0
+    assert second.skipped == first.inserted
+    assert len(db.find_transactions(user_id)) == first.inserted
+
+
+def test_pipeline_batches_and_reports_progress(db: DB, monkeypatch):
+    monkeypatch.setattr(importer_module, "IMPORT_BATCH_SIZE", 50)
+    user_id = db.create_user(User(username="pipeline", hashed_password="x"))
+    db.add_rule(user_id, {"rule": "amount < 0 -> #expense", "active": True})
+    calls = []
+
+    result = importer_module.Importer(user_id).import_from_file(
+        DATA_PATH, progress=lambda processed, total: calls.append(processed)
+    )
+
+    transactions = db.get_transactions(user_id)
+    assert result.inserted == len(transactions) > 50
+    assert calls == list(range(50, result.inserted, 50)) + [result.inserted]
+    # Every batch went through the rule engine before insertion
+    expenses = sum(tx.amount < 0 for tx in transactions)
+    assert all("expense" in tx.tags for tx in transactions if tx.amount < 0)
+
+    timings = result.timings
+    assert {stage: timing["count"] for stage, timing in timings["stages"].items()} == {
+        "load_rules": 1,
+        "parse": result.inserted,
+        "evaluate": result.inserted,
+        "write": result.inserted,
+    }
+    assert (timings["inserted"], timings["skipped"], timings["matched"]) == (
+        result.inserted,
+        0,
+        expenses,
+    )
+    assert timings["slowest_rules"][0]["matches"] == expenses
+
+
+def test_pipeline_propagates_stage_errors(db: DB):
+    user_id = db.create_user(User(username="broken", hashed_password="x"))
+    statement = DATA_PATH.read_text(encoding="utf-8").replace(
+        "01-09-2024", "31-02-2024"
+    )
+    with pytest.raises(ValueError):
+        importer_module.Importer(user_id).import_from_stream(io.StringIO(statement))
+
+
+def test_fingerprint_ignores_whitespace_and_case():
+    date = datetime(2024, 8, 1)
+    a = make_fingerprint("SK92", date, -10.0, 100.0, "PLATBA  Kartou")
+    b = make_fingerprint("SK92", date, -10.0, 100.0, "platba kartou ")
+    c = make_fingerprint("SK92", date, -10.0, 90.0, "platba kartou")
+    assert a == b
+    assert a != c
+
+
+def _statement_parts() -> tuple[list[str], list[str]]:
+    lines = DATA_PATH.read_text(encoding="utf-8").splitlines()
+    header = next(
+        i for i, line in enumerate(lines) if line.startswith(mbank.HEADER_MARKER)
+    )
+    rows = [line for line in lines[header + 1 :] if line.count(";") >= 10]
+    return lines[: header + 1], rows
+
+
+def _statement(head: list[str], rows: list[str]) -> str:
+    return "\n".join(head + rows) + "\n"
+
+
+def test_import_marks_skip_already_imported_rows(db: DB, monkeypatch):
+    head, rows = _statement_parts()
+    august = [row for row in rows if row[3:5] == "08"]
+    september = [row for row in rows if row[3:5] == "09"]
+    # Exported during September 1st: later rows of that day were not in it yet
+    partial = august + september[:1]
+    assert september[1].startswith(september[0][:10])
+
+    user_id = db.create_user(User(username="marks", hashed_password="x"))
+    importer = importer_module.Importer(user_id)
+    assert (
+        importer.import_from_stream(io.StringIO(_statement(head, partial))).warnings
+        == []
+    )
+    mark = db.get_import_mark(user_id, "SK9283605207004201924152")
+    assert (mark.first_date.day, mark.first_date.month) == (1, 8)
+    assert mark.last_date == datetime(2024, 9, int(september[0][:2]))
+
+    parsed = []
+    parse_row = mbank._parse_row
+    monkeypatch.setattr(
+        mbank,
+        "_parse_row",
+        lambda parts, *args: parsed.append(parts[0]) or parse_row(parts, *args),
+    )
+    result = importer.import_from_stream(io.StringIO(_statement(head, rows)))
+
+    # August was skipped except its first day (re-checked); the partly exported day is parsed again
+    first_day = [row for row in august if row.startswith(august[0][:10])]
+    assert parsed == [row.split(";")[0] for row in first_day + rows[len(august) :]]
+    assert result.warnings == []
+    assert result.inserted + result.skipped == len(
+        mbank.parse(_statement(head, rows), user_id)
+    )
+    assert len(db.find_transactions(user_id)) == result.inserted + len(
+        mbank.parse(_statement(head, partial), user_id)
+    )
+    assert db.get_import_mark(user_id, "SK9283605207004201924152").last_date.month == 10
+
+
+def test_import_marks_report_missing_rows(db: DB):
+    head, rows = _statement_parts()
+    user_id = db.create_user(User(username="gaps", hashed_password="x"))
+    importer = importer_module.Importer(user_id)
+    importer.import_from_stream(
+        io.StringIO(_statement(head, [row for row in rows if row[3:5] == "08"]))
+    )
+    september = importer.import_from_stream(
+        io.StringIO(_statement(head, [row for row in rows if row[3:5] == "09"]))
+    )
+    assert september.warnings == []
+
+    # Leaving out the first October rows opens a gap, which is reported
+    result = importer.import_from_stream(
+        io.StringIO(_statement(head, [row for row in rows if row[3:5] == "10"][5:]))
+    )
+    assert result.inserted > 0
+    assert len(result.warnings) == 1 and "missing" in result.warnings[0]
+    mark = db.get_import_mark(user_id, "SK9283605207004201924152")
+    assert mark.first_date.month == 10
+
+
+def test_import_marks_reimporting_an_older_slice(db: DB):
+    head, rows = _statement_parts()
+    user_id = db.create_user(User(username="slice", hashed_password="x"))
+    importer = importer_module.Importer(user_id)
+    first = importer.import_from_stream(io.StringIO(_statement(head, rows)))
+    assert first.warnings == []
+
+    # August ends before the mark's last date (in October): no balance to compare, nothing missing
+    august = importer.import_from_stream(
+        io.StringIO(_statement(head, [row for row in rows if row[3:5] == "08"]))
+    )
+    assert august.warnings == []
+    assert august.inserted == 0
+    assert db.get_import_mark(user_id, "SK9283605207004201924152").last_date.month == 10
@@ -1,6 +1,8 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 # Ensure backend root is importable
 _ROOT = Path(__file__).resolve().parents[2]
 if str(_ROOT) not in sys.path:
@@ -43,3 +45,28 @@ def test_mbank_match_and_parse():
             assert tx.counterparty is not None
             assert tx.counterparty.merchant is not None
             assert tx.counterparty.merchant.name != ""
+
+
+def test_mbank_parse_lines_streams_file():
+    data_path = Path(__file__).resolve().parents[1] / "data" / "mbank" / "01924152_240801_241031.csv"
+    expected = mbank.parse(data_path.read_text(encoding="utf-8"), "test-user-id")
+
+    with data_path.open(encoding="utf-8") as f:
+        stream = mbank.parse_lines(f, "test-user-id")
+        first = next(stream)  # rows are produced while the file is being read
+        transactions = [first, *stream]
+
+    assert transactions == expected
+    assert {tx.details.currency for tx in transactions} == {"EUR"}
+    assert transactions[0].asset.bank.iban == "SK9283605207004201924152"
+
+
+def test_mbank_parse_lines_requires_account():
+    lines = [
+        "#Mena účtu:",
+        "EUR",
+        mbank.HEADER_MARKER + ";#Popis",
+        "01-08-2024;01-08-2024;INKASO;x;y;z;;;;-1,00;10,00;",
+    ]
+    with pytest.raises(mbank.ParserError, match="Account name"):
+        list(mbank.parse_lines(lines, "test-user-id"))
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+
+from app import importers
+from app.db import DB
+from app.importers import ImporterPlugin, detect, mbank
+from app.importers.importer import Importer
+from app.models import User
+
+DATA_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "data"
+    / "mbank"
+    / "01924152_240801_241031.csv"
+)
+
+
+def test_detect_uses_only_the_head():
+    raw = DATA_PATH.read_text(encoding="utf-8")
+    assert (
+        detect(raw[: importers.SNIFF_SIZE])
+        is detect(raw)
+        is importers._plugins["mbank"]
+    )
+    assert detect("\ufeff" + raw[:1000]).name == "mbank"
+
+    # Markers past the sniffed head do not count
+    padded = "x" * importers.SNIFF_SIZE + raw
+    assert mbank.match(padded) is True
+    assert detect(padded) is None
+    assert detect("date,amount,merchant\n2024-01-01,1,Coffee\n") is None
+
+
+def test_register_another_format(monkeypatch):
+    monkeypatch.setattr(importers, "_plugins", dict(importers._plugins))
+    seen = []
+
+    def sniff(head: str) -> bool:
+        seen.append(len(head))
+        return head.startswith("OTHERBANK")
+
+    plugin = ImporterPlugin(
+        name="other", sniff=sniff, parse_lines=lambda lines, user_id: iter(())
+    )
+    importers.register(plugin)
+    with pytest.raises(ValueError):
+        importers.register(plugin)
+
+    assert detect("OTHERBANK;statement\n" + "row\n" * 10_000) is plugin
+    assert seen == [importers.SNIFF_SIZE]
+    assert detect(DATA_PATH.read_text(encoding="utf-8")).name == "mbank"
+
+
+def test_plugin_without_marks(db: DB):
+    # Written to the basic contract: no marks= parameter
+    def parse_lines(lines, user_id, on_error=None):
+        return mbank.parse_lines(lines, user_id, on_error)
+
+    plugin = ImporterPlugin(name="plain", sniff=mbank.sniff, parse_lines=parse_lines)
+    user_id = db.create_user(User(username="plain", hashed_password="x"))
+    importer = Importer(user_id, db=db)
+    lines = DATA_PATH.read_text(encoding="utf-8").splitlines()
+
+    first = importer.import_lines(plugin, lines)
+    assert first.inserted > 50
+    second = importer.import_lines(plugin, lines)
+    assert (second.inserted, second.skipped) == (0, first.inserted)
+    assert db.get_import_mark(user_id, "SK9283605207004201924152") is None
@@ -1,18 +1,18 @@
 from fastapi.testclient import TestClient
 
+from app.db import DB
 
-def test_register_and_login_flow(app_client: TestClient, test_collections) -> None:
+
+def test_register_and_login_flow(app_client: TestClient, db: DB) -> None:
     email = "user1@example.com"
     password = "Secret123!"
     # Register (use username as primary identifier)
     resp = app_client.post("/auth/register", json={"username": email, "email": email, "password": password})
     assert resp.status_code == 201, resp.text
     # DB state after create
-    user_docs = list(test_collections.users.find({}))
-    assert len(user_docs) == 1
-    assert user_docs[0]["email"] == email
-    assert "hashed_password" in user_docs[0]
-    assert "password" not in user_docs[0]
+    user = db.get_user(email)
+    assert user.email == email
+    assert user.hashed_password and user.hashed_password != password
     # Duplicate register should fail
     dup = app_client.post("/auth/register", json={"username": email, "email": email, "password": password})
     assert dup.status_code == 400
@@ -0,0 +1,137 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.db import DB
+from app.models import JobKind, JobStatus, Transaction
+
+
+def auth_header(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def wait_for_job(app_client: TestClient, token: str, job_id: str) -> dict:
+    for _ in range(100):
+        job = app_client.get(f"/jobs/{job_id}", headers=auth_header(token)).json()
+        if job["status"] not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_apply_all_rules_runs_as_job(
+    app_client: TestClient, auth_token: str, db: DB, user_id: str
+):
+    db.insert_transactions(
+        [
+            Transaction(
+                user_id=user_id,
+                asset={"bank": {"account_name": "MKONTO"}},
+                counterparty={"merchant": {"name": "LIDL SK"}},
+                date="2024-08-01T00:00:00",
+                amount=-12.5,
+            ),
+            Transaction(
+                user_id=user_id,
+                asset={"bank": {"account_name": "MKONTO"}},
+                counterparty={"merchant": {"name": "SHELL"}},
+                date="2024-08-02T00:00:00",
+                amount=-40.0,
+            ),
+        ]
+    )
+    app_client.post(
+        "/rules",
+        json={"rule": "merchant contains LIDL -> @groceries"},
+        headers=auth_header(auth_token),
+    )
+
+    resp = app_client.post("/actions/apply_all_rules", headers=auth_header(auth_token))
+    assert resp.status_code == 202, resp.text
+    job = wait_for_job(app_client, auth_token, resp.json()["job_id"])
+
+    assert job["status"] == JobStatus.SUCCEEDED
+    assert job["processed"] == job["total"] == 2
+    result = job["result"]
+    assert (result["transactions"], result["modified"]) == (2, 1)
+    timings = result["timings"]
+    assert list(timings["stages"]) == [
+        "load_rules",
+        "fetch",
+        "validate",
+        "evaluate",
+        "write",
+    ]
+    assert [timings["stages"][stage]["count"] for stage in timings["stages"]] == [
+        1,
+        2,
+        2,
+        2,
+        1,
+    ]
+    assert (timings["matched"], timings["modified"]) == (1, 1)
+    [slowest] = timings["slowest_rules"]
+    assert (slowest["rule"], slowest["matches"]) == (
+        "merchant contains LIDL -> @groceries",
+        1,
+    )
+    assert [
+        tx.merchant for tx in db.get_transactions(user_id) if tx.category == "groceries"
+    ] == ["LIDL SK"]
+
+
+def test_pending_jobs_are_coalesced_and_cancellable(
+    app_client: TestClient, db: DB, user_id: str
+):
+    from app.jobs import JobRunner
+
+    runner = JobRunner(workers=1)
+    release = threading.Event()
+    calls = []
+
+    def blocker(ctx):
+        release.wait(timeout=5)
+        return {}
+
+    def counted(ctx):
+        calls.append(ctx.job_id)
+        return {}
+
+    runner.submit(user_id, JobKind.APPLY_RULES, blocker)
+    first = runner.submit(user_id, JobKind.APPLY_RULES, counted, coalesce=True)
+    second = runner.submit(user_id, JobKind.APPLY_RULES, counted, coalesce=True)
+    assert first == second
+
+    # A job still waiting in the queue is cancelled immediately
+    other = runner.submit(user_id, JobKind.APPLY_RULES, counted)
+    assert db.cancel_job(other)
+
+    release.set()
+    runner._executor.shutdown(wait=True)
+    assert calls == [first]
+    assert db.get_job(other).status == JobStatus.CANCELLED
+
+
+def test_shutdown_cancels_unfinished_jobs(app_client: TestClient, db: DB, user_id: str):
+    from app.jobs import JobRunner
+
+    runner = JobRunner(workers=1)
+    started = threading.Event()
+
+    def looping(ctx):
+        started.set()
+        for _ in range(500):
+            ctx.progress(0)  # raises JobCancelled once cancellation was requested
+            time.sleep(0.01)
+        return {}
+
+    running = runner.submit(user_id, JobKind.APPLY_RULES, looping)
+    queued = runner.submit(user_id, JobKind.APPLY_RULES, looping)
+    assert started.wait(timeout=5)
+
+    runner.shutdown()
+    assert db.get_job(queued).status == JobStatus.CANCELLED
+    runner._executor.shutdown(wait=True)
+    assert db.get_job(running).status == JobStatus.CANCELLED
+    assert (runner.queued, runner.running) == (0, 0)
@@ -0,0 +1,84 @@
+import json
+import logging
+import queue
+
+import app.logging
+from app.logging import (
+    JsonFormatter,
+    RateLimitedLog,
+    _RenderingQueueHandler,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+def test_queued_records_are_rendered_when_logged() -> None:
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    logger = logging.getLogger("test.queued")
+    logger.propagate = False
+    logger.addHandler(_RenderingQueueHandler(log_queue))
+    try:
+        items = ["a"]
+        logger.warning("items %s", items, extra={"user_id": "u1"})
+        items.append("b")
+        try:
+            raise ValueError("bad row")
+        except ValueError:
+            logger.exception("failed")
+    finally:
+        logger.handlers.clear()
+        logger.propagate = True
+
+    first = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert (first["level"], first["logger"], first["message"], first["user_id"]) == (
+        "WARNING",
+        "test.queued",
+        "items ['a']",
+        "u1",
+    )
+    second = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert second["message"] == "failed"
+    assert "ValueError: bad row" in second["exception"]
+
+
+def test_rate_limited_log(caplog) -> None:
+    logger = logging.getLogger("test.rate_limited")
+    limited = RateLimitedLog(logger, per_second=0.001, burst=2)
+
+    with caplog.at_level(logging.INFO, logger="test.rate_limited"):
+        for idx in range(5):
+            limited.debug(
+                "debug %d", idx
+            )  # level disabled: not even counted as dropped
+            limited.info("tx %d", idx)
+        limited._tokens = 1.0
+        limited.info("tx %d", 5)
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "tx 0",
+        "tx 1",
+        "tx 5 (3 similar messages dropped)",
+    ]
+    assert caplog.records[0].funcName == "test_rate_limited_log"
+
+
+def test_shutdown_restores_the_root_logger(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(app.logging, "LOG_DIR", tmp_path)
+    monkeypatch.setattr(app.logging, "LOG_FILE", tmp_path / "app.log")
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    logger = logging.getLogger("test.restart")
+
+    for run in range(2):
+        setup_logging()
+        assert [h for h in root.handlers if isinstance(h, _RenderingQueueHandler)] != []
+        logger.warning("run %d", run)
+        shutdown_logging()
+        assert (root.handlers, root.level) == (handlers, level)
+        logger.warning("after shutdown %d", run)
+
+    lines = (tmp_path / "app.log").read_text(encoding="utf-8").splitlines()
+    assert [line.split("] ", 1)[1] for line in lines if "test.restart" in line] == [
+        "run 0",
+        "run 1",
+    ]
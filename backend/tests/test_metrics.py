@@ -0,0 +1,69 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.metrics import CONTENT_TYPE, CallbackGauge, Counter, Histogram, Registry
+
+
+def test_exposition_format() -> None:
+    registry = Registry()
+    requests = Counter("demo_requests_total", "Requests", ("path",), registry=registry)
+    latency = Histogram(
+        "demo_seconds", "Latency", buckets=(0.1, 1.0), registry=registry
+    )
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    latency.observe(value=0.05)
+    latency.observe(value=0.5)
+    latency.observe(value=5)
+    CallbackGauge("demo_queued", "Queued", lambda: 4, registry=registry)
+
+    assert registry.exposition().splitlines() == [
+        "# HELP demo_requests_total Requests",
+        "# TYPE demo_requests_total counter",
+        'demo_requests_total{path="/a\\"b"} 3',
+        "# HELP demo_seconds Latency",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1"} 2',
+        'demo_seconds_bucket{le="+Inf"} 3',
+        "demo_seconds_sum 5.55",
+        "demo_seconds_count 3",
+        "# HELP demo_queued Queued",
+        "# TYPE demo_queued gauge",
+        "demo_queued 4",
+    ]
+    with pytest.raises(ValueError):
+        requests.inc()
+    with pytest.raises(ValueError):
+        Counter("demo_requests_total", "Again", registry=registry)
+
+
+def test_metrics_endpoint(app_client: TestClient, auth_token: str) -> None:
+    from app.metrics import HTTP_REQUEST_DURATION
+
+    before = HTTP_REQUEST_DURATION.count("GET", "get_rule", 404)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    assert (
+        app_client.get("/rules/0123456789abcdef01234567", headers=headers).status_code
+        == 404
+    )
+    assert HTTP_REQUEST_DURATION.count("GET", "get_rule", 404) == before + 1
+
+    resp = app_client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == CONTENT_TYPE
+    text = resp.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",handler="get_rule",status="404"}'
+        in text
+    )
+    assert "# TYPE http_requests_in_flight gauge" in text
+    assert "http_requests_in_flight 1" in text  # the scrape itself
+    assert "# TYPE rule_engine_transactions_evaluated_total counter" in text
+    assert "# TYPE import_rows_total counter" in text
+    assert (
+        'password_hashes_total{outcome="completed"}' in text
+    )  # the login behind auth_token
+    assert "password_hash_queue_seconds_count" in text
+    for gauge in ("password_hashes_pending", "jobs_queued", "jobs_running"):
+        assert f"# TYPE {gauge} gauge" in text
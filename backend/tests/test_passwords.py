@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import DB
+from app.models import User
+from app.passwords import (
+    PASSWORD_HASH_ROUNDS,
+    HashingBusy,
+    PasswordHasher,
+    crypt_context,
+)
+
+
+def login(client: TestClient, username: str, password: str):
+    return client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+
+
+def test_login_upgrades_hash_cost(app_client: TestClient, db: DB) -> None:
+    old_hash = crypt_context(1000).hash("Secret123!")
+    db.create_user(User(username="legacy", hashed_password=old_hash))
+
+    assert login(app_client, "legacy", "wrong").status_code == 401
+    assert db.get_user("legacy").hashed_password == old_hash
+    assert login(app_client, "nobody", "Secret123!").status_code == 401
+
+    resp = login(app_client, "legacy", "Secret123!")
+    assert resp.status_code == 200, resp.text
+    upgraded = db.get_user("legacy").hashed_password
+    assert upgraded.startswith(f"$pbkdf2-sha256${PASSWORD_HASH_ROUNDS}$")
+    assert login(app_client, "legacy", "Secret123!").status_code == 200
+    assert db.get_user("legacy").hashed_password == upgraded  # already current
+
+
+def _wait(event: threading.Event, rounds: int, submitted: float) -> tuple[None, float]:
+    event.wait()
+    return None, 0.0
+
+
+def test_hasher_limits_pending_hashes() -> None:
+    hasher = PasswordHasher(workers=0, max_pending=1, rounds=1000)
+    release = threading.Event()
+    blocker = hasher._submit(_wait, release)
+    finished = threading.Event()
+    blocker.add_done_callback(
+        lambda _: finished.set()
+    )  # runs after the hasher's own callback
+
+    with pytest.raises(HashingBusy):
+        asyncio.run(hasher.hash("b"))
+    release.set()
+    finished.wait()
+
+    hashed = asyncio.run(hasher.hash("a"))
+    assert asyncio.run(hasher.verify("a", hashed)) == (True, None)
+    stats = hasher.stats
+    assert (stats.pending, stats.completed, stats.rejected) == (0, 3, 1)
+    assert stats.queue_seconds_max >= 0
+    hasher.shutdown()
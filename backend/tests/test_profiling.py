@@ -0,0 +1,51 @@
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import profiling
+
+
+def busy_loop(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profiler_collapses_stacks(tmp_path: Path) -> None:
+    with profiling.profile_to(tmp_path / "run.collapsed") as profiler:
+        busy_loop(0.2)
+
+    assert profiler.samples > 5
+    lines = (tmp_path / "run.collapsed").read_text().splitlines()
+    stack, count = next(line for line in lines if "busy_loop" in line).rsplit(" ", 1)
+    frames = stack.split(";")
+    assert frames[0] == "MainThread"
+    assert frames[-1].startswith("busy_loop (tests/test_profiling.py:")
+    assert int(count) > 5
+    # the sampler's own thread and idle threads are left out
+    assert not any("_sample (" in line for line in lines)
+
+
+def test_profiling_middleware(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware, token="s3cret")
+
+    @app.get("/slow")
+    def slow():
+        busy_loop(0.1)
+        return {}
+
+    client = TestClient(app)
+    assert "x-profile-id" not in client.get("/slow").headers
+    assert (
+        "x-profile-id"
+        not in client.get("/slow", headers={"X-Profile": "guess"}).headers
+    )
+
+    resp = client.get("/slow", headers={"X-Profile": "s3cret"})
+    report = tmp_path / f"{resp.headers['x-profile-id']}.collapsed"
+    assert "busy_loop (tests/test_profiling.py:" in report.read_text()
+    assert list(tmp_path.iterdir()) == [report]
@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app.compression import accepted_encodings
+from app.db import DB
+from app.models import Transaction, TransactionType
+from app.responses import dumps
+
+
+def auth_header(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_dumps_handles_db_types():
+    oid = ObjectId()
+    payload = {
+        "_id": oid,
+        "date": datetime(2024, 8, 1, 12, 30),
+        "type": TransactionType.CARD_PAYMENT,
+    }
+    assert json.loads(dumps(payload)) == {
+        "_id": str(oid),
+        "date": "2024-08-01T12:30:00",
+        "type": "card_payment",
+    }
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip;q=0.8") == {"gzip"}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_responses_are_compressed(
+    app_client: TestClient, auth_token: str, db: DB, user_id: str, encoding: str
+):
+    if encoding == "br":
+        pytest.importorskip("brotli")
+    db.insert_transactions(
+        [
+            Transaction(
+                user_id=user_id,
+                asset={"bank": {"account_name": "MKONTO"}},
+                counterparty={"merchant": {"name": f"MERCHANT {i}"}},
+                date=datetime(2024, 8, 1),
+                amount=-1.0 * i,
+            )
+            for i in range(200)
+        ]
+    )
+
+    resp = app_client.get(
+        "/transactions",
+        headers={**auth_header(auth_token), "Accept-Encoding": encoding},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == encoding
+    assert len(resp.json()) == 200
+
+    # Tiny payloads are not worth compressing
+    small = app_client.get(
+        "/tags", headers={**auth_header(auth_token), "Accept-Encoding": encoding}
+    )
+    assert "content-encoding" not in small.headers
@@ -1,5 +1,7 @@
 from fastapi.testclient import TestClient
 
+from app.db import DB
+
 
 def auth_header(token: str) -> dict[str, str]:
     return {"Authorization": f"Bearer {token}"}
@@ -8,7 +10,7 @@ def auth_header(token: str) -> dict[str, str]:
 def test_rules_crud(
     app_client: TestClient,
     auth_token: str,
-    test_collections,
+    db: DB,
 ) -> None:
     # Create text rule
     rule_payload = {
@@ -20,10 +22,10 @@ def test_rules_crud(
     created_body = create_resp.json()
     rule_id = created_body["id"]
     # DB assertion
-    db_rule = test_collections.rules.find_one({"_id": __import__("bson").ObjectId(rule_id)})
+    db_rule = db.get_rule(rule_id)
     assert db_rule is not None
-    assert db_rule["rule"] == "amount > 100 -> #big"
-    assert db_rule.get("active") is True
+    assert db_rule.rule == "amount > 100 -> #big"
+    assert db_rule.active is True
 
     # List
     list_resp = app_client.get("/rules", headers=auth_header(auth_token))
@@ -38,8 +40,7 @@ def test_rules_crud(
     update_resp = app_client.put(f"/rules/{rule_id}", json={"active": False}, headers=auth_header(auth_token))
     assert update_resp.status_code == 200
     # Verify update persisted
-    updated_rule = test_collections.rules.find_one({"_id": db_rule["_id"]})
-    assert updated_rule["active"] is False
+    assert db.get_rule(rule_id).active is False
 
     # Delete
     del_resp = app_client.delete(f"/rules/{rule_id}", headers=auth_header(auth_token))
@@ -48,4 +49,4 @@ def test_rules_crud(
     # Ensure deleted (API + DB)
     missing = app_client.get(f"/rules/{rule_id}", headers=auth_header(auth_token))
     assert missing.status_code == 404
-    assert test_collections.rules.find_one({"_id": db_rule["_id"]}) is None
+    assert db.get_rule(rule_id) is None
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.storage.slow_queries import SlowQueryLog, plan_stages, query_shape
+
+COLLSCAN_PLAN = {
+    "queryPlanner": {
+        "winningPlan": {"stage": "COLLSCAN", "filter": {"user_id": {"$eq": "x"}}}
+    }
+}
+INDEX_PLAN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "stage": "FETCH",
+            "inputStage": {"stage": "IXSCAN", "indexName": "user_date"},
+        },
+        "rejectedPlans": [{"stage": "COLLSCAN"}],
+    }
+}
+
+
+def run_command(
+    log: SlowQueryLog, request_id: int, command: dict, millis: float
+) -> None:
+    name = next(iter(command))
+    log.started(
+        SimpleNamespace(command=command, command_name=name, request_id=request_id)
+    )
+    log.succeeded(
+        SimpleNamespace(
+            command_name=name,
+            request_id=request_id,
+            database_name="db",
+            duration_micros=millis * 1000,
+        )
+    )
+
+
+def test_query_shape_redacts_values() -> None:
+    assert query_shape(
+        {"user_id": "65ab", "date": {"$gte": 1, "$lte": 2}, "tags": {"$in": ["a", "b"]}}
+    ) == {
+        "user_id": "?",
+        "date": {"$gte": "?", "$lte": "?"},
+        "tags": {"$in": ["?"]},
+    }
+    assert query_shape(
+        [{"$match": {"user_id": 1}}, {"$unwind": {"path": "$tags"}}]
+    ) == [
+        {"$match": {"user_id": "?"}},
+        {"$unwind": {"path": "$tags"}},
+    ]
+    assert plan_stages(INDEX_PLAN) == ["FETCH", "IXSCAN user_date"]
+
+
+def test_slow_query_log() -> None:
+    explained = []
+
+    def explain(database: str, command: dict) -> dict:
+        explained.append(command)
+        return COLLSCAN_PLAN if "rules" in command.values() else INDEX_PLAN
+
+    log = SlowQueryLog(
+        threshold_ms=50, collections=frozenset({"transactions", "rules"}), max_shapes=10
+    )
+    log.explain = explain
+    run_command(
+        log,
+        1,
+        {"find": "rules", "filter": {"user_id": "a"}, "lsid": {"id": 1}, "$db": "db"},
+        80,
+    )
+    run_command(log, 2, {"find": "rules", "filter": {"user_id": "b"}, "$db": "db"}, 120)
+    run_command(
+        log,
+        3,
+        {"find": "transactions", "filter": {"user_id": "a", "date": {"$gte": 1}}},
+        300,
+    )
+    run_command(
+        log, 4, {"find": "transactions", "filter": {"user_id": "a"}}, 10
+    )  # fast
+    run_command(
+        log, 5, {"find": "jobs", "filter": {"user_id": "a"}}, 900
+    )  # not watched
+    log._get_explainer().submit(
+        lambda: None
+    ).result()  # explains queued before it are done
+
+    top = log.top()
+    assert [(q.collection, q.count, q.total_ms) for q in top] == [
+        ("transactions", 1, 300),
+        ("rules", 2, 200),
+    ]
+    assert top[0].shape == '{"date": {"$gte": "?"}, "user_id": "?"}'
+    assert (top[0].plan, top[0].collscan) == (["FETCH", "IXSCAN user_date"], False)
+    assert (top[1].plan, top[1].collscan, top[1].max_ms) == (["COLLSCAN"], True, 120)
+    # explained once per shape, without the driver's session fields
+    assert explained[0] == {"find": "rules", "filter": {"user_id": "a"}}
+    assert len(explained) == 2
+    log.shutdown()
+
+
+def test_slow_queries_endpoint(
+    app_client: TestClient, auth_token: str, monkeypatch
+) -> None:
+    from app.auth import decode_access_token
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    assert app_client.get("/admin/slow-queries").status_code == 401
+    assert app_client.get("/admin/slow-queries", headers=headers).status_code == 403
+
+    monkeypatch.setattr(
+        "app.auth.ADMIN_USER_IDS", {decode_access_token(auth_token)["sub"]}
+    )
+    resp = app_client.get("/admin/slow-queries", headers=headers)
+    assert resp.status_code == 200
+    assert set(resp.json()) == {"threshold_ms", "queries"}
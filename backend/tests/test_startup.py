@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_startup import IMPORT_TIME_BUDGET_MS, best_import_times
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_importing_the_app_does_not_connect() -> None:
+    # A fresh interpreter: in this one the test client has long created the DB
+    script = textwrap.dedent(
+        """
+        import app.main, app.jobs, app.importers.importer, app.rules.rule_engine
+        import app.scripts.import_rules, app.scripts.import_statements, app.scripts.reindex_search
+        from fastapi.testclient import TestClient
+        from app.db import DB
+
+        assert DB._instance is None, "DB created at import time"
+        with TestClient(app.main.app):
+            assert DB._instance is not None, "DB not created at startup"
+        """
+    )
+    env = {
+        **os.environ,
+        "MONGO_URI": "mongomock://localhost",
+        "MONGO_DB": "test_startup",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,  # the assert shows stderr
+    )
+    assert result.returncode == 0, result.stderr
+
+
+# Loaded by the first request or job that needs them, never by starting the app
+DEFERRED_MODULES = ("passlib", "jose", "mongomock", "pymongo", "pyarrow")
+
+
+def test_heavy_dependencies_are_imported_on_first_use() -> None:
+    script = textwrap.dedent(
+        f"""
+        import sys
+        import app.rules.parser
+        assert "pydantic" not in sys.modules, "the rule parser imports pydantic"
+        import app.main, app.scripts.import_rules, app.scripts.import_statements
+        loaded = [name for name in {DEFERRED_MODULES!r} if name in sys.modules]
+        assert not loaded, f"imported at startup: {{loaded}}"
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=False,  # the assert shows stderr
+    )
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.perf
+def test_import_time_budget() -> None:
+    for module, budget in IMPORT_TIME_BUDGET_MS.items():
+        best = best_import_times(module, runs=3)[-1][0]
+        assert best < budget, (
+            f"importing {module} took {best:.0f} ms (budget {budget} ms)"
+        )
@@ -0,0 +1,269 @@
+"""Backend-level tests run against every storage implementation."""
+
+import uuid
+from datetime import UTC, datetime
+
+import pytest
+
+from app.db import TransactionFilter, create_db
+from app.models import (
+    Asset,
+    BankAccount,
+    Counterparty,
+    Details,
+    ImportMark,
+    Job,
+    JobKind,
+    JobStatus,
+    Merchant,
+    Transaction,
+    User,
+)
+
+
+@pytest.fixture(params=["mongomock://localhost", "sqlite://:memory:"])
+def storage(request):
+    return create_db(request.param, f"storage_{uuid.uuid4().hex}")
+
+
+def make_transaction(
+    user_id: str,
+    amount: float,
+    merchant: str,
+    fingerprint: str | None = None,
+    date=datetime(2024, 8, 1),
+    **kwargs,
+):
+    return Transaction(
+        user_id=user_id,
+        asset=Asset(bank=BankAccount(account_name="MKONTO", iban="SK92")),
+        counterparty=Counterparty(merchant=Merchant(name=merchant)),
+        date=date,
+        amount=amount,
+        details=Details(balance=100.0, location="BRATISLAVA"),
+        fingerprint=fingerprint,
+        **kwargs,
+    )
+
+
+def test_users_and_rules(storage):
+    user_id = storage.create_user(User(username="alice", hashed_password="hash"))
+    assert storage.get_user("alice").id == user_id
+    with pytest.raises(ValueError):
+        storage.get_user("bob")
+
+    rule_id = storage.add_rule(user_id, {"rule": "amount > 10 -> #big", "active": True})
+    assert [r.rule for r in storage.get_rules(user_id)] == ["amount > 10 -> #big"]
+    version = storage.get_data_version(user_id)
+    assert storage.update_rule(rule_id, {"active": False}) is True
+    assert storage.get_data_version(user_id) == version + 1
+    assert storage.update_rule(rule_id, {"active": False}) is False  # nothing changed
+    assert storage.get_rule(rule_id).active is False
+    assert storage.delete_rule(rule_id) is True
+    assert storage.get_rule(rule_id) is None
+
+
+def test_transactions_roundtrip_and_dedup(storage):
+    user_id = storage.create_user(User(username="alice", hashed_password="hash"))
+    inserted = storage.insert_transactions(
+        [
+            make_transaction(
+                user_id,
+                -5.0,
+                "LIDL",
+                "fp1",
+                category="groceries",
+                tags=["food", "weekly"],
+            ),
+            make_transaction(user_id, -7.0, "SHELL", "fp2", tags=["car", "food"]),
+            make_transaction(user_id, -1.0, "MANUAL"),
+            make_transaction(user_id, -1.0, "MANUAL"),
+        ]
+    )
+    assert len(inserted) == 4
+    version = storage.get_data_version(user_id)
+    assert version > 0
+    again = storage.insert_transactions(
+        [make_transaction(user_id, -5.0, "LIDL", "fp1")]
+    )
+    assert again == []
+    assert (
+        storage.get_data_version(user_id) == version
+    )  # nothing inserted, nothing changed
+
+    stored = storage.get_transactions(user_id)
+    assert len(stored) == 4
+    assert stored[0].merchant == "LIDL"
+    assert stored[0].details.location == "BRATISLAVA"
+    assert storage.get_categories(user_id) == ["groceries"]
+    assert storage.get_tags(user_id) == ["car", "food", "weekly"]
+
+    projected = storage.find_transactions(user_id, ["amount", "counterparty"])
+    assert projected[0] == {
+        "_id": inserted[0],
+        "amount": -5.0,
+        "counterparty": {"merchant": {"name": "LIDL"}},
+    }
+    assert storage.find_transaction(inserted[1], ["tags"]) == {
+        "_id": inserted[1],
+        "tags": ["car", "food"],
+    }
+
+    tx = storage.get_transaction(inserted[1])
+    tx.category = "fuel"
+    assert storage.update_transaction(tx.id, tx) is True
+    assert storage.get_transaction(inserted[1]).category == "fuel"
+
+
+def test_iter_transactions(storage):
+    user_id = storage.create_user(User(username="alice", hashed_password="hash"))
+    storage.insert_transactions(
+        [
+            make_transaction(
+                user_id,
+                -float(day),
+                f"SHOP {day}",
+                date=datetime(2024, 8, day),
+                tags=["food"] * (day % 2),
+            )
+            for day in (5, 1, 4, 2, 3)
+        ]
+    )
+
+    batches = list(storage.iter_transactions(user_id, batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    docs = [doc for batch in batches for doc in batch]
+    assert [doc["amount"] for doc in docs] == [
+        -1.0,
+        -2.0,
+        -3.0,
+        -4.0,
+        -5.0,
+    ]  # oldest first
+    assert (
+        docs[0]["details"]["location"] == "BRATISLAVA"
+        and "search_tokens" not in docs[0]
+    )
+
+    filters = TransactionFilter(
+        date_from=datetime(2024, 8, 2), amount_max=-3.0, tags=["food"]
+    )
+    filtered = [
+        doc["amount"]
+        for batch in storage.iter_transactions(user_id, filters)
+        for doc in batch
+    ]
+    assert filtered == [-3.0, -5.0]
+    assert (
+        list(storage.iter_transactions(user_id, TransactionFilter(category="none")))
+        == []
+    )
+
+
+def test_search_transactions(storage):
+    user_id = storage.create_user(User(username="alice", hashed_password="hash"))
+    other_id = storage.create_user(User(username="bob", hashed_password="hash"))
+    lidl, alexovic, alexovicova = storage.insert_transactions(
+        [
+            make_transaction(
+                user_id, -5.0, "LIDL SK", description="LIDL SK /Bratislava"
+            ),
+            make_transaction(
+                user_id, -50.0, "Rastislav Alexovič", date=datetime(2024, 8, 2)
+            ),
+            make_transaction(
+                user_id,
+                -20.0,
+                "Zuzana Alexovicova",
+                date=datetime(2024, 8, 3),
+                note="rent for august",
+            ),
+        ]
+    )
+    storage.insert_transactions([make_transaction(other_id, -1.0, "Alexovic")])
+
+    # Case and diacritics insensitive prefix match; whole-word matches rank before newer prefix matches
+    hits = storage.search_transactions(user_id, ["alexovic"])
+    assert [tx["_id"] for tx in hits] == [alexovic, alexovicova]
+    assert "search_tokens" not in hits[0]
+    assert [tx["_id"] for tx in storage.search_transactions(user_id, ["alex"])] == [
+        alexovicova,
+        alexovic,
+    ]
+    assert [
+        tx["_id"] for tx in storage.search_transactions(user_id, ["alex", "rent"])
+    ] == [alexovicova]
+    assert [
+        tx["_id"] for tx in storage.search_transactions(user_id, ["bratislava"])
+    ] == [
+        alexovicova,
+        alexovic,
+        lidl,
+    ]  # details.location of every test transaction
+    assert storage.search_transactions(
+        user_id, ["alex"], ["amount"], skip=1, limit=1
+    ) == [{"_id": alexovic, "amount": -50.0}]
+    assert storage.search_transactions(user_id, ["tesco"]) == []
+
+    # Updates re-index the document
+    tx = storage.get_transaction(lidl)
+    tx.note = "weekly shopping"
+    storage.update_transaction(lidl, tx)
+    assert [tx["_id"] for tx in storage.search_transactions(user_id, ["weekly"])] == [
+        lidl
+    ]
+
+    version = storage.get_data_version(user_id)
+    assert storage.reindex_search() == 4
+    assert storage.get_data_version(user_id) == version + 1
+    assert [tx["_id"] for tx in storage.search_transactions(user_id, ["shop"])] == [
+        lidl
+    ]
+
+
+def test_import_marks(storage):
+    user_id = storage.create_user(User(username="alice", hashed_password="hash"))
+    assert storage.get_import_mark(user_id, "SK92") is None
+
+    mark = ImportMark(
+        user_id=user_id,
+        iban="SK92",
+        first_date=datetime(2024, 8, 1),
+        last_date=datetime(2024, 8, 31),
+        last_balance=1.5,
+    )
+    storage.set_import_mark(mark)
+    storage.set_import_mark(mark.model_copy(update={"iban": "SK11"}))
+    assert storage.get_import_mark(user_id, "SK92") == mark
+
+    extended = mark.model_copy(
+        update={"last_date": datetime(2024, 9, 30), "last_balance": -2.0}
+    )
+    storage.set_import_mark(extended)
+    assert storage.get_import_mark(user_id, "SK92") == extended
+    assert storage.get_import_mark(user_id, "SK11").last_balance == 1.5
+
+
+def test_job_lifecycle(storage):
+    user_id = storage.create_user(User(username="alice", hashed_password="hash"))
+    job_id = storage.create_job(
+        Job(
+            user_id=user_id,
+            kind=JobKind.APPLY_RULES,
+            created_at=datetime.now(UTC),
+        )
+    )
+    assert storage.get_job(job_id).status == JobStatus.PENDING
+
+    assert storage.start_job(job_id) is True
+    assert storage.start_job(job_id) is False
+    assert storage.report_job_progress(job_id, 5, 10) is False
+    assert storage.cancel_job(job_id) is True
+    assert storage.report_job_progress(job_id, 6) is True
+
+    job = storage.get_job(job_id)
+    assert (job.status, job.processed, job.total) == (JobStatus.RUNNING, 6, 10)
+    storage.update_job(
+        job_id, {"status": str(JobStatus.SUCCEEDED), "result": {"inserted": 3}}
+    )
+    assert storage.get_job(job_id).result == {"inserted": 3}
@@ -1,34 +1,45 @@
+import csv
+import io
+from pathlib import Path
+
+import pytest
 from bson import json_util
 from fastapi.testclient import TestClient
-from mongomock import Collection
 
+from app.db import DB
 from app.models import Transaction
+from app.routers.transactions import TransactionView
+
+DATA_PATH = Path(__file__).resolve().parent / "data" / "transactions.json"
 
 
 def auth_header(token: str) -> dict[str, str]:
     return {"Authorization": f"Bearer {token}"}
 
 
-def test_transactions_flow(
-    app_client: TestClient, auth_token: str, users_collection: Collection, transactions_collection: Collection
-) -> None:
-    user = users_collection.find_one()
-    assert user is not None
-    user_id = user["_id"]
+def seed_transactions(db: DB, user_id: str) -> list[str]:
+    """Store the four transactions of ``data/transactions.json`` for ``user_id``; returns their ids."""
+    docs = json_util.loads(DATA_PATH.read_text(encoding="utf-8"))
+    for doc in docs:
+        doc["user_id"] = user_id
+        del doc["_id"]  # assigned by the backend
+    return db.insert_transactions([Transaction.model_validate(doc) for doc in docs])
+
 
+@pytest.fixture()
+def seeded_transactions(db: DB, user_id: str) -> list[str]:
+    return seed_transactions(db, user_id)
+
+
+def test_transactions_flow(app_client: TestClient, auth_token: str, db: DB, user_id: str) -> None:
     list_empty = app_client.get("/transactions", headers=auth_header(auth_token))
     assert list_empty.status_code == 200
     assert list_empty.json() == []
 
-    with open("backend/tests/data/transactions.json", "r", encoding="utf-8") as f:
-        transactions_arr = json_util.loads(f.read())
-        for tx in transactions_arr:
-            tx["user_id"] = user_id
-
-        transactions_collection.insert_many(transactions_arr)
+    seed_transactions(db, user_id)
 
     # List after insert
-    list_resp = app_client.get("/transactions", headers=auth_header(auth_token))
+    list_resp = app_client.get("/transactions", params={"fields": "detail"}, headers=auth_header(auth_token))
     assert list_resp.status_code == 200
     items = list_resp.json()
     assert len(items) == 4
@@ -59,3 +70,130 @@ def test_transactions_flow(
     assert get_one.status_code == 200
     first_transaction = Transaction.model_validate(get_one.json())
     assert first_transaction == transactions[0]
+
+
+def test_transactions_sparse_fields(app_client: TestClient, auth_token: str, seeded_transactions: list[str]) -> None:
+    # Default list view omits heavy nested fields
+    items = app_client.get("/transactions", headers=auth_header(auth_token)).json()
+    assert len(items) == 4
+    assert all("asset" not in tx and "details" not in tx for tx in items)
+    assert {"_id", "date", "amount", "counterparty"} <= set(items[0])
+
+    custom = app_client.get("/transactions", params={"fields": "amount,category"}, headers=auth_header(auth_token))
+    assert custom.status_code == 200
+    assert all(set(tx) <= {"_id", "amount", "category"} for tx in custom.json())
+
+    tx_id = items[0]["_id"]
+    detail = app_client.get(f"/transactions/{tx_id}", headers=auth_header(auth_token)).json()
+    assert detail["asset"]["bank"]["iban"] == "SK9283605207004201924152"
+    partial = app_client.get(f"/transactions/{tx_id}", params={"fields": "amount"}, headers=auth_header(auth_token))
+    assert set(partial.json()) == {"_id", "amount"}
+
+    bad = app_client.get("/transactions", params={"fields": "amount,password"}, headers=auth_header(auth_token))
+    assert bad.status_code == 400
+
+
+def test_list_pages_and_updated_documents(
+    app_client: TestClient, auth_token: str, db: DB, user_id: str, seeded_transactions: list[str]
+) -> None:
+    tx = db.get_transaction(seeded_transactions[0])
+    tx.category = "groceries"
+    assert db.update_transaction(tx.id, tx)
+
+    everything = app_client.get("/transactions", params={"fields": "detail"}, headers=auth_header(auth_token)).json()
+    assert [item["_id"] for item in everything] == seeded_transactions
+    assert everything[0]["category"] == "groceries"
+    view_fields = {field.alias or name for name, field in TransactionView.model_fields.items()}
+    assert all(set(item) <= view_fields for item in everything)  # no stray "id" from the update
+
+    params = {"limit": 3, "page": 2, "fields": "detail"}
+    assert app_client.get("/transactions", params=params, headers=auth_header(auth_token)).json() == everything[3:]
+    first_page = app_client.get("/transactions", params={"limit": 3}, headers=auth_header(auth_token)).json()
+    assert [item["_id"] for item in first_page] == seeded_transactions[:3]
+
+
+def test_etag_revalidation(app_client: TestClient, auth_token: str, seeded_transactions: list[str]) -> None:
+    first = app_client.get("/transactions", headers=auth_header(auth_token))
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    # Unchanged data -> 304 for every versioned read endpoint, each with its own tag
+    etags = {}
+    for path in ("/transactions", "/categories", "/tags", "/rules"):
+        etags[path] = app_client.get(path, headers=auth_header(auth_token)).headers["ETag"]
+        resp = app_client.get(path, headers={**auth_header(auth_token), "If-None-Match": etags[path]})
+        assert resp.status_code == 304, path
+        assert resp.content == b""
+    assert len(set(etags.values())) == len(etags)
+
+    # Other representations of the same data do not match
+    list_etag = app_client.get("/transactions", params={"fields": "list"}, headers=auth_header(auth_token))
+    detail = app_client.get(
+        "/transactions",
+        params={"fields": "detail"},
+        headers={**auth_header(auth_token), "If-None-Match": list_etag.headers["ETag"]},
+    )
+    assert detail.status_code == 200
+    assert detail.headers["ETag"] != list_etag.headers["ETag"]
+    search = [
+        app_client.get("/transactions/search", params={"q": q}, headers=auth_header(auth_token)).headers["ETag"]
+        for q in ("coop", "datum")
+    ]
+    assert search[0] != search[1]
+    # Parameter order does not matter
+    a = app_client.get("/transactions/search?q=coop&limit=5", headers=auth_header(auth_token)).headers["ETag"]
+    b = app_client.get("/transactions/search?limit=5&q=coop", headers=auth_header(auth_token)).headers["ETag"]
+    assert a == b
+
+    # Any write through the DB layer bumps the version
+    tx_id = first.json()[0]["_id"]
+    patch = app_client.patch(f"/transactions/{tx_id}", json={"notes": "lunch"}, headers=auth_header(auth_token))
+    assert patch.status_code == 200, patch.text
+    after = app_client.get("/transactions", headers={**auth_header(auth_token), "If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert any(tx.get("note") == "lunch" for tx in after.json())
+
+
+def test_search_transactions(app_client: TestClient, auth_token: str, seeded_transactions: list[str]) -> None:
+    resp = app_client.get("/transactions/search", params={"q": "ALEXOVIČ"}, headers=auth_header(auth_token))
+    assert resp.status_code == 200
+    assert [tx["counterparty"]["bank"]["account_name"] for tx in resp.json()] == ["Rastislav Alexovic "]
+
+    presov = app_client.get("/transactions/search", params={"q": "pres"}, headers=auth_header(auth_token)).json()
+    assert len(presov) == 1 and "asset" not in presov[0]
+    paged = app_client.get(
+        "/transactions/search", params={"q": "datum", "limit": 1, "page": 2}, headers=auth_header(auth_token)
+    )
+    assert [tx["counterparty"]["merchant"]["name"] for tx in paged.json()] == ["COOP PO PJ 063"]
+    assert app_client.get("/transactions/search", headers=auth_header(auth_token)).status_code == 422
+
+
+def test_export_transactions(app_client: TestClient, auth_token: str, seeded_transactions: list[str]) -> None:
+    resp = app_client.get("/transactions/export", headers=auth_header(auth_token))
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert "transactions.csv" in resp.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [row["date"][:10] for row in rows] == ["2024-08-08", "2024-08-09", "2024-08-09", "2024-08-12"]
+    coop = rows[0]
+    assert coop["counterparty_merchant"] == "COOP PO PJ 063"
+    assert coop["details_location"] == "Bzenov"
+    assert coop["asset_iban"] == "SK9283605207004201924152"
+
+    filtered = app_client.get(
+        "/transactions/export", params={"date_from": "2024-08-10T00:00:00"}, headers=auth_header(auth_token)
+    )
+    assert [row["description"] for row in csv.DictReader(io.StringIO(filtered.text))] == ["DIRECT DEBIT"]
+    bad = app_client.get("/transactions/export", params={"format": "xlsx"}, headers=auth_header(auth_token))
+    assert bad.status_code == 422
+
+
+def test_export_transactions_parquet(app_client: TestClient, auth_token: str, seeded_transactions: list[str]) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    resp = app_client.get("/transactions/export", params={"format": "parquet"}, headers=auth_header(auth_token))
+    assert resp.status_code == 200
+    table = pq.read_table(io.BytesIO(resp.content))
+    assert table.num_rows == 4
+    assert table.column("counterparty_iban").to_pylist()[1] == "CZ4120100000002200790544"
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.db import DB
+
+DATA_PATH = (
+    Path(__file__).resolve().parent / "data" / "mbank" / "01924152_240801_241031.csv"
+)
+
+
+def auth_header(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def upload(client: TestClient, token: str, content: bytes, field: str = "file"):
+    return client.post(
+        "/upload-statement",
+        files={field: ("statement.csv", content, "text/csv")},
+        data={"note": "ignored"},
+        headers=auth_header(token),
+    )
+
+
+def test_upload_statement(
+    app_client: TestClient, auth_token: str, db: DB, user_id: str
+) -> None:
+    content = DATA_PATH.read_bytes()
+
+    first = upload(app_client, auth_token, content)
+    assert first.status_code == 200, first.text
+    body = first.json()
+    assert body["format"] == "mbank"
+    assert body["inserted"] == len(db.find_transactions(user_id)) > 50
+    assert body["skipped"] == 0
+    assert body["error_count"] == 0 and body["errors"] == []
+
+    again = upload(app_client, auth_token, content)
+    assert again.json()["inserted"] == 0
+    assert again.json()["skipped"] == body["inserted"]
+
+
+def test_upload_reports_bad_rows(
+    app_client: TestClient, auth_token: str, db: DB, user_id: str
+) -> None:
+    lines = DATA_PATH.read_text(encoding="utf-8").splitlines(keepends=True)
+    # Line 123: an impossible posting date
+    lines[122] = lines[122].replace("01-09-2024", "31-02-2024", 1)
+
+    resp = upload(app_client, auth_token, "".join(lines).encode("utf-8"))
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["error_count"] == 1
+    assert body["errors"][0]["line"] == 123
+    assert body["inserted"] == len(db.find_transactions(user_id)) > 50
+
+
+def test_upload_rejects_unusable_files(app_client: TestClient, auth_token: str) -> None:
+    resp = upload(
+        app_client, auth_token, b"date,amount,merchant\n2024-01-01,1,Coffee\n"
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Unrecognized statement format"
+
+    resp = upload(app_client, auth_token, DATA_PATH.read_bytes(), field="statement")
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "No 'file' field in the upload"
+
+    resp = app_client.post(
+        "/upload-statement", content=b"x", headers=auth_header(auth_token)
+    )
+    assert resp.status_code == 400
+
+    assert (
+        app_client.post(
+            "/upload-statement", files={"file": ("a.csv", b"x")}
+        ).status_code
+        == 401
+    )
@@ -111,7 +111,23 @@ const Transactions: React.FC = () => {
     // Expanded rows tracked by id
     const [expandedIds, setExpandedIds] = useState<Record<string, boolean>>({});
 
+    // The list endpoint returns a sparse field set; load the full document when a row is expanded
+    const [detailsLoaded, setDetailsLoaded] = useState<Record<string, boolean>>({});
+
+    async function loadDetail(id: string) {
+        try {
+            const full = await api.get<Transaction>(`/transactions/${id}`);
+            setTransactions((prev) => prev.map((t) => ((t.id || t._id) === id ? { ...t, ...full } : t)));
+            setDetailsLoaded((prev) => ({ ...prev, [id]: true }));
+        } catch (e: any) {
+            setError(e.message);
+        }
+    }
+
     function toggleExpanded(id: string) {
+        if (!expandedIds[id] && !detailsLoaded[id]) {
+            loadDetail(id);
+        }
         setExpandedIds((prev) => ({ ...prev, [id]: !prev[id] }));
     }
 